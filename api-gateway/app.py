@@ -1,7 +1,23 @@
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import asyncio
+import hmac
 import httpx
+import json
 import os
+import time
+from decimal import Decimal
 from fastapi.middleware.cors import CORSMiddleware
+from upstream_pool import UpstreamConfig, UpstreamPool
+from auth import AuthenticationFailed, TokenAuthenticator, parse_token
+from cache_events import ProductEventListener
+from bff import decode_json, fan_out
+from compression import CompressionMiddleware, compress, encode_headers, is_compressible, negotiate
+from coalesce import BufferedResponse, SingleFlight
+from metrics import MetricsMiddleware, MetricsRegistry, timed_upstream
+from ratelimit import InMemoryBackend, RateLimited, RateLimiter, RateLimitRule
+from resilience import ResiliencePolicy, UpstreamUnavailable
+from response_cache import CachedResponse, CacheRule, CacheRules, ResponseCache, etag_matches, make_etag
 
 
 app = FastAPI(title="E-Commerce API Gateway")
@@ -20,41 +36,704 @@ CART_SERVICE = os.getenv("CART_SERVICE_URL", "http://cart-service:8000")
 ORDER_SERVICE = os.getenv("ORDER_SERVICE_URL", "http://order-service:8000")
 PAYMENT_SERVICE = os.getenv("PAYMENT_SERVICE_URL", "http://payment-service:8000")
 
+# (route prefix, settings prefix, base url)
+SERVICES = [
+    ("users", "USER_SERVICE", USER_SERVICE),
+    ("products", "PRODUCT_SERVICE", PRODUCT_SERVICE),
+    ("cart", "CART_SERVICE", CART_SERVICE),
+    ("orders", "ORDER_SERVICE", ORDER_SERVICE),
+    ("payments", "PAYMENT_SERVICE", PAYMENT_SERVICE),
+]
+
+# Connection pool per upstream. Each setting can be overridden per service
+# (e.g. PAYMENT_SERVICE_READ_TIMEOUT=30) or for all services (UPSTREAM_READ_TIMEOUT).
+upstreams = UpstreamPool([
+    UpstreamConfig.from_env(name, prefix, base_url) for name, prefix, base_url in SERVICES
+])
+
+# Bulkhead, circuit breaker and retry policy per upstream, so one slow service
+# (e.g. payments) cannot exhaust the gateway for the others. Same override scheme,
+# e.g. PAYMENT_SERVICE_MAX_CONCURRENT=20 or UPSTREAM_BREAKER_FAILURES=10.
+resilience = {
+    name: ResiliencePolicy.from_env(name, prefix) for name, prefix, _ in SERVICES
+}
+
+
+# Request counters and latency histograms, scraped from /metrics. Series are labelled
+# with these route templates (ids become {id}); other paths share "/<service>/*".
+METRIC_ROUTES = [
+    "/", "/metrics", "/_gateway/stats", "/_gateway/cache/purge",
+    "/bff/checkout-summary", "/bff/order-detail/{id}",
+    "/users/users/", "/users/users/{id}/", "/users/users/register/", "/users/users/login/", "/users/users/me/",
+    "/products/categories/", "/products/categories/{id}/",
+    "/products/products/", "/products/products/{id}/", "/products/products/by_category/",
+    "/products/products/batch/", "/products/products/search/", "/products/products/facets/",
+    "/products/products/replica/", "/products/products/cache_stats/", "/products/products/export/",
+    "/products/reservations/", "/products/reservations/{id}/",
+    "/products/reservations/{id}/commit/", "/products/reservations/{id}/release/",
+    "/products/product-imports/", "/products/product-imports/{id}/",
+    "/cart/carts/", "/cart/carts/{id}/", "/cart/carts/user/", "/cart/carts/clear_cart/",
+    "/cart/cart-items/", "/cart/cart-items/{id}/", "/cart/cart-items/bulk/",
+    "/orders/orders/", "/orders/orders/{id}/", "/orders/orders/user_orders/",
+    "/orders/orders/{id}/cancel/", "/orders/orders/{id}/mark_as_paid/",
+    "/payments/payments/", "/payments/payments/{id}/", "/payments/payments/user_payments/",
+    "/payments/payments/order_payment/", "/payments/payments/{id}/refund/",
+]
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+metrics = MetricsRegistry([name for name, _, _ in SERVICES], METRIC_ROUTES)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+
+# Negotiated gzip/brotli for responses over the threshold, streamed ones included
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "True") == "True"
+COMPRESSION_THRESHOLD = int(os.getenv("COMPRESSION_THRESHOLD", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, threshold=COMPRESSION_THRESHOLD, level=COMPRESSION_LEVEL)
+
+# Response cache for idempotent catalog reads on the products service.
+# Rules are (path regex, ttl seconds, stale-while-revalidate seconds); first match wins.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "5000")),
+    max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    max_entry_bytes=int(os.getenv("CACHE_MAX_ENTRY_BYTES", str(1024 * 1024))),
+)
+cache_rules = CacheRules("products", [
+    CacheRule(r"^categories/", ttl=300, stale_ttl=600),
+    CacheRule(r"^products/by_category/$", ttl=30, stale_ttl=60),
+    CacheRule(r"^products/\d+/$", ttl=60, stale_ttl=120),
+    CacheRule(r"^products/batch/$", ttl=30, stale_ttl=60),
+    CacheRule(r"^products/search/$", ttl=30, stale_ttl=60),
+    CacheRule(r"^products/facets/$", ttl=30, stale_ttl=60),
+    CacheRule(r"^products/$", ttl=30, stale_ttl=60),
+], read_only_posts=[r"^products/batch/$"], invalidations=[
+    # Creating a reservation or an import job does not change cached responses by itself;
+    # the products they later change (sold out, expired, imported) arrive as
+    # product.changed events, handled by invalidate_changed_products below.
+    (r"^reservations/", []),
+    (r"^product-imports/", []),
+    # One product changed: its detail plus every listing that may include it
+    (r"^products/(?P<id>\d+)/", [
+        "products/{id}/", "products/?", "products/by_category/", "products/search/",
+        "products/facets/", "products/batch/",
+    ]),
+    (r"^products/", ["products/?", "products/by_category/", "products/search/", "products/facets/"]),
+    # Product responses embed their category, so a category write affects them all
+    (r"^categories/", [""]),
+    (r"", [""]),
+])
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "True") == "True"
+# The purge hook is disabled unless a token is configured
+CACHE_PURGE_TOKEN = os.getenv("CACHE_PURGE_TOKEN", "")
+# Writes that bypass the gateway reach the cache through product.changed events
+CACHE_EVENTS_ENABLED = os.getenv("CACHE_EVENTS_ENABLED", "True") == "True"
+# Events naming more products than this (an import chunk) drop every product entry at once
+CACHE_EVENTS_MAX_IDS = int(os.getenv("CACHE_EVENTS_MAX_IDS", "50"))
+product_events = ProductEventListener(
+    host=os.getenv("RABBITMQ_HOST", "rabbitmq"),
+    port=int(os.getenv("RABBITMQ_PORT", "5672")),
+    user=os.getenv("RABBITMQ_USER", "guest"),
+    password=os.getenv("RABBITMQ_PASS", "guest"),
+    on_change=lambda product_ids: invalidate_changed_products(product_ids),
+)
+
+# Identical concurrent GETs share one upstream call. Headers that change the
+# upstream answer are part of the key so users never see each other's data.
+single_flight = SingleFlight()
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "True") == "True"
+COALESCE_VARY_HEADERS = ("authorization", "cookie", "accept", "accept-encoding", "accept-language")
+COALESCE_MAX_BODY_BYTES = int(os.getenv("COALESCE_MAX_BODY_BYTES", str(1024 * 1024)))
+
+# Tokens are validated here against a TTL cache; cache misses are batched into one
+# call to the user service. Downstream services get the resolved user as headers.
+AUTH_ENABLED = os.getenv("AUTH_ENABLED", "True") == "True"
+GATEWAY_SHARED_SECRET = os.getenv("GATEWAY_SHARED_SECRET", "")
+# Separate credential sent only on the gateway's own introspection call, so the
+# identity secret added to proxied requests cannot be used to look up tokens
+GATEWAY_INTROSPECTION_SECRET = os.getenv("GATEWAY_INTROSPECTION_SECRET", "")
+IDENTITY_HEADERS = ("x-user-id", "x-username", "x-gateway-secret", "x-introspection-secret")
+# Service-internal routes that the catch-all proxy never forwards for clients
+INTERNAL_ROUTES = {("users", "users/introspect")}
+
+# Token buckets. "ip" rules are charged per client IP before the token is checked,
+# so made-up tokens never get buckets of their own; "client" rules are charged per
+# authenticated user id, or per IP for anonymous calls. Every rule that matches a
+# request is charged; rates are tokens per second.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True") == "True"
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "False") == "True"
+rate_limiter = RateLimiter(
+    InMemoryBackend(max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))),
+    [
+        RateLimitRule(
+            "ip",
+            rate=float(os.getenv("RATE_LIMIT_IP_RATE", "100")),
+            burst=int(os.getenv("RATE_LIMIT_IP_BURST", "200")),
+            scope="ip",
+        ),
+        RateLimitRule(
+            "client",
+            rate=float(os.getenv("RATE_LIMIT_RATE", "20")),
+            burst=int(os.getenv("RATE_LIMIT_BURST", "40")),
+        ),
+        RateLimitRule(
+            "cache-purge",
+            rate=float(os.getenv("RATE_LIMIT_PURGE_RATE", "0.2")),
+            burst=int(os.getenv("RATE_LIMIT_PURGE_BURST", "5")),
+            pattern=r"^/_gateway/cache/purge$",
+            scope="ip",
+        ),
+        RateLimitRule(
+            "payments-write",
+            rate=float(os.getenv("RATE_LIMIT_PAYMENTS_RATE", "0.2")),
+            burst=int(os.getenv("RATE_LIMIT_PAYMENTS_BURST", "5")),
+            methods={"POST"},
+            pattern=r"^/payments/",
+        ),
+    ],
+)
+
+# Composite (backend-for-frontend) endpoints: timeout applied to each upstream leg
+BFF_LEG_TIMEOUT = float(os.getenv("BFF_LEG_TIMEOUT", "2.0"))
+BFF_FORWARD_HEADERS = ("authorization", "cookie", "accept-language")
+
+# Connection-level headers that must not be forwarded by a proxy (RFC 7230 6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+
+
+def forward_request_headers(request):
+    # Identity headers are only ever set by the gateway, never passed through from clients
+    headers = [
+        (key, value) for key, value in request.headers.items()
+        if key not in HOP_BY_HOP_HEADERS and key != "host" and key not in IDENTITY_HEADERS
+    ]
+    return headers + list(getattr(request.state, "identity", ()))
+
+
+def forward_response_headers(upstream_response):
+    # raw_headers keeps repeated headers such as Set-Cookie intact
+    return [
+        (key, value) for key, value in upstream_response.headers.raw
+        if key.lower().decode("latin-1") not in HOP_BY_HOP_HEADERS
+    ]
+
+
+def request_has_body(request):
+    return "content-length" in request.headers or "transfer-encoding" in request.headers
+
+
+async def stream_upstream_body(upstream_response):
+    # Relay raw chunks (still content-encoded) and always give the connection
+    # back to the pool, also when the client disconnects mid-stream.
+    try:
+        async for chunk in upstream_response.aiter_raw():
+            yield chunk
+    finally:
+        await upstream_response.aclose()
+
+
+def streaming_response(upstream_response):
+    response = StreamingResponse(
+        stream_upstream_body(upstream_response),
+        status_code=upstream_response.status_code,
+    )
+    response.raw_headers = forward_response_headers(upstream_response)
+    return response
+
+
+async def send_upstream(service, method, path, headers, params, content=None):
+    client = upstreams.client(service)
+
+    def send():
+        upstream_request = client.build_request(
+            method=method,
+            url=f"/{service}/{path}",
+            content=content,
+            headers=headers,
+            params=params
+        )
+        return client.send(upstream_request, stream=True)
+
+    # A streamed request body can only be sent once, so only body-less calls are retried
+    return await resilience[service].call(method, send, replayable=content is None)
+
+
+def client_response(result, if_none_match=None):
+    if isinstance(result, BufferedResponse):
+        return result.to_response(if_none_match)
+    return streaming_response(result)
+
+
+def without_conditional_headers(headers):
+    # The gateway answers If-None-Match itself from the full body it buffers,
+    # so a shared upstream call never returns a 304 meant for one client only
+    return [
+        (name, value) for name, value in headers
+        if name not in ("if-none-match", "if-modified-since")
+    ]
+
+
+async def fetch_buffered(service, path, headers, params):
+    upstream_response = await send_upstream(service, "GET", path, headers, params)
+    length = upstream_response.headers.get("content-length")
+    if length is None or not length.isdigit() or int(length) > COALESCE_MAX_BODY_BYTES:
+        # Unknown or large body: keep streaming it, it can only be consumed once
+        return upstream_response
+
+    try:
+        body = b"".join([chunk async for chunk in upstream_response.aiter_raw()])
+    finally:
+        await upstream_response.aclose()
+    return BufferedResponse(
+        upstream_response.status_code,
+        upstream_response.headers,
+        forward_response_headers(upstream_response),
+        body,
+    )
+
+
+async def coalesced_get(service, path, headers, params):
+    if not COALESCE_ENABLED:
+        with timed_upstream():
+            return await fetch_buffered(service, path, headers, params)
+
+    key = SingleFlight.make_key("GET", service, path, params, dict(headers), COALESCE_VARY_HEADERS)
+    with timed_upstream():
+        result, shared = await single_flight.do(key, lambda: fetch_buffered(service, path, headers, params))
+        if shared and not isinstance(result, BufferedResponse):
+            # The leader got a streamed body that only it can read; fetch our own
+            return await send_upstream(service, "GET", path, headers, params)
+    return result
+
+
+def gateway_secret_headers():
+    return [("x-gateway-secret", GATEWAY_SHARED_SECRET)] if GATEWAY_SHARED_SECRET else []
+
+
+async def introspect_tokens(tokens):
+    headers = [
+        ("content-type", "application/json"),
+        ("accept-encoding", "identity"),
+        ("x-introspection-secret", GATEWAY_INTROSPECTION_SECRET),
+    ]
+    upstream_response = await send_upstream(
+        "users", "POST", "users/introspect/", headers, httpx.QueryParams(),
+        content=json.dumps({"tokens": tokens}).encode(),
+    )
+    try:
+        body = await upstream_response.aread()
+    finally:
+        await upstream_response.aclose()
+    try:
+        if upstream_response.status_code != 200:
+            raise ValueError(upstream_response.status_code)
+        return json.loads(body)["users"]
+    except (ValueError, KeyError, TypeError):
+        raise UpstreamUnavailable("users", "token introspection failed", 5)
+
+
+authenticator = TokenAuthenticator(
+    introspect_tokens,
+    max_entries=int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("AUTH_CACHE_TTL", "60")),
+    negative_ttl=float(os.getenv("AUTH_CACHE_NEGATIVE_TTL", "10")),
+)
+
+
+def is_internal_route(service, path):
+    # Compare without empty segments so "users//introspect" cannot slip past
+    return (service, "/".join(segment for segment in path.split("/") if segment)) in INTERNAL_ROUTES
+
+
+def client_ip(request):
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if TRUST_FORWARDED_FOR and forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def enforce_rate_limit(request, scope, key):
+    if RATE_LIMIT_ENABLED:
+        await rate_limiter.check(key, request.method, request.url.path, scope)
+
+
+async def admit(request):
+    # The per-IP limit comes first: a client over its limit is turned away before
+    # its token costs an introspection call. Per-client buckets are keyed on the
+    # validated user, never on the raw Authorization header.
+    ip = client_ip(request)
+    await enforce_rate_limit(request, "ip", f"ip:{ip}")
+    await authenticate(request)
+    user_id = getattr(request.state, "user_id", None)
+    await enforce_rate_limit(request, "client", f"user:{user_id}" if user_id is not None else f"ip:{ip}")
+
+
+async def authenticate(request):
+    # Requests without a token stay anonymous (the catalog is public); the
+    # services decide what needs a user. An unknown token is rejected outright,
+    # the same as DRF TokenAuthentication does.
+    token = parse_token(request.headers.get("authorization"))
+    if token is None or not AUTH_ENABLED:
+        return
+    with timed_upstream():
+        user = await authenticator.resolve(token)
+    if user is None:
+        raise AuthenticationFailed("Invalid token.")
+    request.state.user_id = user["id"]
+    request.state.identity = [
+        ("x-user-id", str(user["id"])),
+        ("x-username", user["username"]),
+    ] + gateway_secret_headers()
+
+
+async def get_json(service, path, headers, params=None):
+    result = await coalesced_get(service, path, headers, httpx.QueryParams(params or {}))
+    if isinstance(result, BufferedResponse):
+        return decode_json(result.status_code, result.body)
+    try:
+        body = await result.aread()
+    finally:
+        await result.aclose()
+    return decode_json(result.status_code, body)
+
+
+def bff_headers(request):
+    # Identity-encoded JSON only, so the gateway can parse every leg itself
+    headers = [(name, request.headers[name]) for name in BFF_FORWARD_HEADERS if name in request.headers]
+    headers += list(getattr(request.state, "identity", ()))
+    return headers + [("accept", "application/json"), ("accept-encoding", "identity")]
+
+
+async def fetch_into_cache(service, path, headers, params, key, rule, encoding):
+    generation = response_cache.generation
+    result = await coalesced_get(service, path, headers, params)
+    if not isinstance(result, BufferedResponse) or not response_cache.accepts(result):
+        return None, result
+
+    # Validator of the identity body, shared by all encodings of this entry
+    etag = result.headers.get("etag") or make_etag(result.body)
+    raw_headers, body = result.raw_headers, result.body
+    if encoding and is_compressible(result.status_code, result.headers, COMPRESSION_THRESHOLD):
+        # Compress once at insert time instead of on every hit
+        body = compress(body, encoding, COMPRESSION_LEVEL)
+        raw_headers = encode_headers(list(raw_headers), encoding, len(body))
+        if not etag.startswith("W/"):
+            etag = "W/" + etag
+    entry = CachedResponse(result.status_code, raw_headers, body, rule, etag=etag)
+    response_cache.set(key, entry, generation)
+    return entry, result
+
+
+async def cached_proxy(service, path, request, rule):
+    encoding = negotiate(request.headers.get("accept-encoding")) if COMPRESSION_ENABLED else None
+    key = ResponseCache.make_key(service, path, request.query_params, encoding)
+    if_none_match = request.headers.get("if-none-match")
+    # Ask the upstream for the full identity body; conditionals and encoding are handled here
+    headers = [
+        (name, value) for name, value in without_conditional_headers(forward_request_headers(request))
+        if name != "accept-encoding"
+    ] + [("accept-encoding", "identity")]
+    params = request.query_params
+
+    entry = response_cache.get(key)
+    if entry is not None:
+        if entry.is_fresh(time.monotonic()):
+            response_cache.hits += 1
+            state = "HIT"
+        else:
+            response_cache.stale_hits += 1
+            state = "STALE"
+            response_cache.revalidate_in_background(
+                key, lambda: fetch_into_cache(service, path, headers, params, key, rule, encoding)
+            )
+        return entry.to_response(state, not_modified=etag_matches(if_none_match, entry.etag))
+
+    response_cache.misses += 1
+    entry, result = await fetch_into_cache(service, path, headers, params, key, rule, encoding)
+    if entry is None:
+        return client_response(result, if_none_match)
+    return entry.to_response("MISS", not_modified=etag_matches(if_none_match, entry.etag))
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable(request: Request, exc: UpstreamUnavailable):
+    return JSONResponse(
+        {"error": f"Service {exc.service} is unavailable", "reason": exc.reason},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(AuthenticationFailed)
+async def authentication_failed(request: Request, exc: AuthenticationFailed):
+    return JSONResponse({"detail": str(exc)}, status_code=401, headers={"WWW-Authenticate": "Token"})
+
+
+@app.exception_handler(RateLimited)
+async def rate_limited(request: Request, exc: RateLimited):
+    return JSONResponse(
+        {"error": "Too many requests", "limit": exc.rule.name},
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after), "X-RateLimit-Limit": str(exc.rule.burst)},
+    )
+
+
+@app.exception_handler(httpx.TimeoutException)
+async def upstream_timeout(request: Request, exc: httpx.TimeoutException):
+    return JSONResponse({"error": "Upstream service timed out"}, status_code=504)
+
+
+@app.exception_handler(httpx.TransportError)
+async def upstream_error(request: Request, exc: httpx.TransportError):
+    return JSONResponse({"error": "Upstream service unreachable"}, status_code=502)
+
+
+@app.on_event("startup")
+async def open_upstream_pools():
+    await upstreams.start()
+
+
+@app.on_event("startup")
+async def listen_for_product_events():
+    if CACHE_ENABLED and CACHE_EVENTS_ENABLED:
+        product_events.start(asyncio.get_running_loop())
+
+
+@app.on_event("shutdown")
+async def close_upstream_pools():
+    await upstreams.close()
+
+
+@app.on_event("shutdown")
+async def stop_product_events():
+    product_events.stop()
+
+
+def invalidate_cache(service, prefixes):
+    for prefix in prefixes:
+        response_cache.invalidate(f"{service}/{prefix}")
+        single_flight.forget(f"GET {service}/{prefix}")
+
+
+def invalidate_changed_products(product_ids):
+    # None: events may have been missed (listener just (re)connected)
+    service = cache_rules.service
+    if product_ids is None or len(product_ids) > CACHE_EVENTS_MAX_IDS:
+        invalidate_cache(service, ["products/"])
+        return
+    prefixes = []
+    for product_id in product_ids:
+        for prefix in cache_rules.stale_prefixes(service, "PUT", f"products/{product_id}/"):
+            if prefix not in prefixes:
+                prefixes.append(prefix)
+    invalidate_cache(service, prefixes)
+
 
 @app.get("/")
 async def root():
     return {"message": "E-Commerce API Gateway"}
 
 
-@app.api_route("/{service}/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
-async def proxy_request(service: str, path: str, request: Request):
-    service_map = {
-        "users": USER_SERVICE,
-        "products": PRODUCT_SERVICE,
-        "cart": CART_SERVICE,
-        "orders": ORDER_SERVICE,
-        "payments": PAYMENT_SERVICE
+@app.post("/_gateway/cache/purge")
+async def purge_cache(request: Request, prefix: str = ""):
+    # Manual purge hook (e.g. after editing categories in Django admin)
+    await enforce_rate_limit(request, "ip", f"ip:{client_ip(request)}")
+    if not CACHE_PURGE_TOKEN:
+        return JSONResponse({"error": "Cache purge is disabled"}, status_code=403)
+    if not hmac.compare_digest(request.headers.get("x-purge-token", "").encode(), CACHE_PURGE_TOKEN.encode()):
+        return JSONResponse({"error": "Invalid purge token"}, status_code=403)
+    purged = response_cache.invalidate(prefix)
+    return {"purged": purged, "cache": response_cache.stats()}
+
+
+def collect_connections():
+    return {
+        (("service", name), ("state", state)): stats[state]
+        for name, stats in upstreams.stats().items() for state in ("active", "idle")
+    }
+
+
+def collect_bulkheads():
+    return {
+        (("service", name), ("state", state)): getattr(policy.bulkhead, state)
+        for name, policy in resilience.items() for state in ("active", "waiting")
+    }
+
+
+def collect_circuits():
+    return {
+        (("service", name), ("state", state)): int(policy.breaker.state == state)
+        for name, policy in resilience.items() for state in ("closed", "open", "half_open")
+    }
+
+
+metrics.add_collector(
+    "gateway_upstream_connections", "Pooled upstream connections.", "gauge", collect_connections)
+metrics.add_collector(
+    "gateway_upstream_bulkhead_calls", "Calls holding or waiting for a bulkhead slot.", "gauge", collect_bulkheads)
+metrics.add_collector(
+    "gateway_upstream_shed_total", "Calls rejected by a full bulkhead.", "counter",
+    lambda: {(("service", name),): policy.bulkhead.rejected for name, policy in resilience.items()})
+metrics.add_collector(
+    "gateway_upstream_circuit_state", "Circuit breaker state (1 = current).", "gauge", collect_circuits)
+metrics.add_collector(
+    "gateway_cache_entries", "Responses held in the gateway cache.", "gauge",
+    lambda: {(): len(response_cache.entries)})
+metrics.add_collector(
+    "gateway_cache_bytes", "Bytes held in the gateway cache.", "gauge", lambda: {(): response_cache.size})
+metrics.add_collector(
+    "gateway_cache_lookups_total", "Cache lookups by result.", "counter",
+    lambda: {
+        (("result", "hit"),): response_cache.hits,
+        (("result", "stale"),): response_cache.stale_hits,
+        (("result", "miss"),): response_cache.misses,
+    })
+metrics.add_collector(
+    "gateway_single_flight_calls_total", "Coalescable GETs by outcome.", "counter",
+    lambda: {
+        (("result", "upstream"),): single_flight.upstream_calls,
+        (("result", "coalesced"),): single_flight.coalesced,
+    })
+metrics.add_collector(
+    "gateway_rate_limited_total", "Requests rejected with 429.", "counter",
+    lambda: {(): rate_limiter.rejected})
+metrics.add_collector(
+    "gateway_auth_lookups_total", "Token lookups by result.", "counter",
+    lambda: {(("result", "hit"),): authenticator.hits, (("result", "miss"),): authenticator.misses})
+metrics.add_collector(
+    "gateway_auth_introspections_total", "Batched introspection calls to the user service.", "counter",
+    lambda: {(): authenticator.introspections})
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/_gateway/stats")
+async def gateway_stats():
+    return {
+        "cache": response_cache.stats(),
+        "cache_events": product_events.stats(),
+        "single_flight": single_flight.stats(),
+        "auth": authenticator.stats(),
+        "rate_limit": {"tracked_keys": len(rate_limiter.backend.buckets), "rejected": rate_limiter.rejected},
+        "connections": upstreams.stats(),
+        "upstreams": {name: policy.stats() for name, policy in resilience.items()},
     }
 
-    if service not in service_map:
+
+@app.get("/bff/checkout-summary")
+async def checkout_summary(request: Request, user_id: int):
+    await admit(request)
+    headers = bff_headers(request)
+    data, errors = await fan_out({
+        "user": get_json("users", f"users/{user_id}/", headers),
+        "cart": get_json("cart", "carts/user/", headers, {"user_id": user_id}),
+    }, BFF_LEG_TIMEOUT)
+
+    cart = data["cart"]
+    if cart is None:
+        return JSONResponse({"error": "Could not load cart", "errors": errors}, status_code=502)
+
+    # Items whose product the cart service could not embed are fetched here, all at once
+    items = cart.get("items") or []
+    missing = {item["product_id"] for item in items if not item.get("product")}
+    if missing:
+        products, product_errors = await fan_out({
+            f"product:{product_id}": get_json("products", f"products/{product_id}/", headers)
+            for product_id in missing
+        }, BFF_LEG_TIMEOUT)
+        errors.update(product_errors)
+        for item in items:
+            if not item.get("product"):
+                item["product"] = products[f"product:{item['product_id']}"]
+
+    total = sum(Decimal(str(item["price"])) * item["quantity"] for item in items)
+    return {
+        "user": data["user"],
+        "cart": cart,
+        "item_count": sum(item["quantity"] for item in items),
+        "total": str(total),
+        "partial": bool(errors),
+        "errors": errors,
+    }
+
+
+@app.get("/bff/order-detail/{order_id}")
+async def order_detail(request: Request, order_id: int):
+    await admit(request)
+    headers = bff_headers(request)
+    data, errors = await fan_out({
+        "order": get_json("orders", f"orders/{order_id}/", headers),
+    }, BFF_LEG_TIMEOUT)
+    order = data["order"]
+    if order is None:
+        status_code = 404 if errors.get("order") == "HTTP 404" else 502
+        return JSONResponse({"error": "Could not load order", "errors": errors}, status_code=status_code)
+
+    # Payments are keyed by the order UUID, so they can only be asked for once the
+    # order is known; everything that depends on it then goes out concurrently.
+    product_ids = {item["product_id"] for item in order.get("items") or []}
+    legs = {
+        "payment": get_json("payments", "payments/order_payment/", headers, {"order_id": order["order_id"]}),
+        "user": get_json("users", f"users/{order['user_id']}/", headers),
+    }
+    legs.update({
+        f"product:{product_id}": get_json("products", f"products/{product_id}/", headers)
+        for product_id in product_ids
+    })
+    related, related_errors = await fan_out(legs, BFF_LEG_TIMEOUT)
+    # An order without a payment yet is a normal state, not a failure
+    if related_errors.get("payment") == "HTTP 404":
+        del related_errors["payment"]
+    errors.update(related_errors)
+
+    for item in order.get("items") or []:
+        item["product"] = related[f"product:{item['product_id']}"]
+    return {
+        "order": order,
+        "payment": related["payment"],
+        "user": related["user"],
+        "partial": bool(errors),
+        "errors": errors,
+    }
+
+
+@app.api_route("/{service}/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+async def proxy_request(service: str, path: str, request: Request):
+    if service not in upstreams:
         return {"error": "Service not found"}
+    if is_internal_route(service, path):
+        return JSONResponse({"error": "Not found"}, status_code=404)
 
-    target_url = f"{service_map[service]}/{service}/{path}"
+    await admit(request)
 
-    # Get the request body if any
-    body = await request.body()
+    if request.method == "GET" and CACHE_ENABLED:
+        rule = cache_rules.match(service, path)
+        if rule is not None:
+            return await cached_proxy(service, path, request, rule)
 
-    # Get request headers
-    headers = dict(request.headers)
-    headers.pop('host', None)  # Remove host header
+    if request.method == "GET" and not request_has_body(request):
+        headers = without_conditional_headers(forward_request_headers(request))
+        result = await coalesced_get(service, path, headers, request.query_params)
+        return client_response(result, request.headers.get("if-none-match"))
 
-    async with httpx.AsyncClient() as client:
-        response = await client.request(
-            method=request.method,
-            url=target_url,
-            data=body,
-            headers=headers,
-            params=request.query_params
+    with timed_upstream():
+        upstream_response = await send_upstream(
+            service,
+            request.method,
+            path,
+            forward_request_headers(request),
+            request.query_params,
+            # Pipe the client body through chunk by chunk instead of buffering it
+            content=request.stream() if request_has_body(request) else None,
         )
 
-        return response.json()
\ No newline at end of file
+    # A successful catalog write makes the entries that may show the change stale
+    if upstream_response.status_code < 400:
+        invalidate_cache(service, cache_rules.stale_prefixes(service, request.method, path))
+
+    return streaming_response(upstream_response)
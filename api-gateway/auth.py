@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class AuthenticationFailed(Exception):
+    pass
+
+
+def parse_token(authorization):
+    # Same scheme the user service uses (DRF TokenAuthentication): "Token <key>"
+    if not authorization:
+        return None
+    parts = authorization.split()
+    if len(parts) != 2 or parts[0].lower() != "token":
+        return None
+    return parts[1]
+
+
+class TokenCache:
+    """Bounded LRU of token -> user (or None for unknown tokens) with expiry."""
+
+    def __init__(self, max_entries, ttl, negative_ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = OrderedDict()
+
+    def get(self, token):
+        """Return (found, user)."""
+        entry = self.entries.get(token)
+        if entry is None:
+            return False, None
+        user, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self.entries[token]
+            return False, None
+        self.entries.move_to_end(token)
+        return True, user
+
+    def set(self, token, user):
+        ttl = self.ttl if user is not None else self.negative_ttl
+        self.entries[token] = (user, time.monotonic() + ttl)
+        self.entries.move_to_end(token)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class TokenAuthenticator:
+    """Resolves API tokens to users from the cache; misses are batched into one introspection call.
+
+    `introspect(tokens)` must return {token: user_dict} for the valid tokens only.
+    """
+
+    def __init__(self, introspect, max_entries=10000, ttl=60.0, negative_ttl=10.0,
+                 batch_window=0.005, max_batch=100):
+        self.introspect = introspect
+        self.cache = TokenCache(max_entries, ttl, negative_ttl)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.pending = {}
+        self.flush_handle = None
+        self.flushes = set()
+        self.hits = 0
+        self.misses = 0
+        self.introspections = 0
+
+    async def resolve(self, token):
+        found, user = self.cache.get(token)
+        if found:
+            self.hits += 1
+            return user
+
+        self.misses += 1
+        future = self.pending.get(token)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self.pending[token] = loop.create_future()
+            if len(self.pending) >= self.max_batch:
+                self._flush()
+            elif self.flush_handle is None:
+                self.flush_handle = loop.call_later(self.batch_window, self._flush)
+        # Shielded: one waiter giving up must not cancel the lookup for the others
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, {}
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._introspect(batch))
+            self.flushes.add(task)
+            task.add_done_callback(self.flushes.discard)
+
+    async def _introspect(self, batch):
+        self.introspections += 1
+        try:
+            users = await self.introspect(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Retrieved here in case every waiter has already gone away
+                    future.exception()
+            return
+        for token, future in batch.items():
+            user = users.get(token)
+            self.cache.set(token, user)
+            if not future.done():
+                future.set_result(user)
+
+    def stats(self):
+        return {
+            "cached_tokens": len(self.cache.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "introspections": self.introspections,
+        }
@@ -0,0 +1,70 @@
+"""Bytes saved and CPU cost of gateway response compression on a product listing.
+
+    python benchmarks/bench_compression.py --products 100
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import compress, supported_encodings  # noqa: E402
+
+WORDS = (
+    "quality design modern product customer value premium durable lightweight compact "
+    "performance reliable comfort style everyday portable classic essential smart "
+    "versatile advanced natural elegant practical innovative sturdy efficient"
+).split()
+
+
+def paragraph(rng):
+    sentences = []
+    for _ in range(rng.randint(3, 6)):
+        words = rng.choices(WORDS, k=rng.randint(8, 16))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def product_listing(count, seed=42):
+    # Same shape as ProductSerializer output, with three-paragraph descriptions
+    rng = random.Random(seed)
+    return json.dumps([
+        {
+            "id": i,
+            "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}",
+            "description": "\n".join(paragraph(rng) for _ in range(3)),
+            "price": f"{rng.uniform(10, 1000):.2f}",
+            "stock": rng.randint(0, 100),
+            "category": {"id": i % 7 + 1, "name": "Electronics", "description": paragraph(rng)},
+            "image": f"/media/products/product-{i}.jpg",
+            "created_at": "2024-01-01T00:00:00Z",
+            "updated_at": "2024-01-01T00:00:00Z",
+        }
+        for i in range(count)
+    ]).encode()
+
+
+def main(args):
+    body = product_listing(args.products)
+    print(f"identity: {len(body)} bytes ({args.products} products)")
+    for encoding in supported_encodings():
+        levels = (1, 4, 6, 9) if encoding == "gzip" else (1, 4, 6, 11)
+        for level in levels:
+            started = time.perf_counter()
+            for _ in range(args.rounds):
+                data = compress(body, encoding, level)
+            elapsed = (time.perf_counter() - started) / args.rounds
+            print(f"{encoding:>4} level {level:>2}: {len(data):>8} bytes "
+                  f"({100 * (1 - len(data) / len(body)):5.1f}% saved) "
+                  f"{elapsed * 1000:7.2f} ms/response "
+                  f"{len(body) / elapsed / 1e6:7.1f} MB/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=20)
+    main(parser.parse_args())
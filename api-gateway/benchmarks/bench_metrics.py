@@ -0,0 +1,69 @@
+"""Measure the cost of the gateway instrumentation.
+
+    python benchmarks/bench_metrics.py --iterations 200000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsMiddleware, MetricsRegistry  # noqa: E402
+
+SERVICES = ["users", "products", "cart", "orders", "payments"]
+ROUTES = ["/products/products/{id}/"]
+
+
+async def plain_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def drive(app, iterations):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    paths = [f"/products/products/{i % 500}/" for i in range(1000)]
+    started = time.perf_counter()
+    for i in range(iterations):
+        scope = {"type": "http", "method": "GET", "path": paths[i % 1000]}
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / iterations
+
+
+def bench_record(iterations):
+    registry = MetricsRegistry(SERVICES, ROUTES)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        registry.request_started("products")
+        registry.request_finished("products", "/products/products/{id}/", "GET", 200, 0.012, 0.010)
+        registry.request_completed("products")
+    return (time.perf_counter() - started) / iterations
+
+
+def main(args):
+    record = bench_record(args.iterations)
+    bare = asyncio.run(drive(plain_app, args.iterations))
+    registry = MetricsRegistry(SERVICES, ROUTES)
+    instrumented = asyncio.run(drive(MetricsMiddleware(plain_app, registry), args.iterations))
+
+    started = time.perf_counter()
+    text = registry.render()
+    render = time.perf_counter() - started
+
+    print(f"request started+finished {record * 1e9:8.0f} ns/op")
+    print(f"ASGI call, bare          {bare * 1e6:8.2f} us/request")
+    print(f"ASGI call, instrumented  {instrumented * 1e6:8.2f} us/request")
+    print(f"middleware overhead      {(instrumented - bare) * 1e6:8.2f} us/request")
+    print(f"/metrics render          {render * 1e3:8.2f} ms ({len(text)} bytes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200000)
+    main(parser.parse_args())
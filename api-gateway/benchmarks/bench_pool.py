@@ -0,0 +1,75 @@
+"""Compare a fresh AsyncClient per request (old proxy_request) with the shared pool.
+
+    python benchmarks/bench_pool.py --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from benchmarks.stub_upstream import start_stub  # noqa: E402
+from upstream_pool import UpstreamConfig, UpstreamPool  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(label, call, total, concurrency):
+    latencies = []
+    queue = iter(range(total))
+
+    async def worker():
+        for _ in queue:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{label:<22} p50={percentile(latencies, 50) * 1000:7.2f}ms "
+          f"p99={percentile(latencies, 99) * 1000:7.2f}ms "
+          f"mean={statistics.mean(latencies) * 1000:7.2f}ms "
+          f"rps={total / elapsed:9.1f}")
+
+
+async def main(args):
+    base_url, stop = start_stub()
+    path = "/products/products/1/"
+
+    async def client_per_request():
+        async with httpx.AsyncClient() as client:
+            response = await client.get(base_url + path)
+            response.json()
+
+    pool = UpstreamPool([UpstreamConfig("products", base_url,
+                                        max_connections=args.concurrency,
+                                        max_keepalive_connections=args.concurrency)])
+    await pool.start()
+
+    async def shared_pool():
+        response = await pool.client("products").get(path)
+        response.json()
+
+    try:
+        await run("before: client/request", client_per_request, args.requests, args.concurrency)
+        await run("after: shared pool", shared_pool, args.requests, args.concurrency)
+    finally:
+        await pool.close()
+        stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,81 @@
+"""Minimal HTTP/1.1 keep-alive upstream used by the gateway benchmarks.
+
+Run standalone with ``python benchmarks/stub_upstream.py --port 9000`` or start it
+in-process with ``start_stub()``.
+"""
+import argparse
+import asyncio
+import json
+import threading
+
+DEFAULT_BODY = json.dumps({"id": 1, "name": "Stub product", "price": "10.00"}).encode()
+
+
+def make_handler(body=DEFAULT_BODY, delay=0.0, content_type=b"application/json"):
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: " + content_type + b"\r\n"
+                    b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                    b"\r\n" + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+def start_stub(port=0, body=DEFAULT_BODY, delay=0.0):
+    """Start the stub on a background thread; returns (base_url, stop)."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state = {}
+
+    async def serve():
+        server = await asyncio.start_server(make_handler(body, delay), "127.0.0.1", port)
+        state["port"] = server.sockets[0].getsockname()[1]
+        state["server"] = server
+        ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=lambda: loop.run_until_complete(serve()), daemon=True)
+    thread.start()
+    ready.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(state["server"].close)
+
+    return f"http://127.0.0.1:{state['port']}", stop
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    async def main():
+        server = await asyncio.start_server(make_handler(delay=args.delay), "127.0.0.1", args.port)
+        print(f"Stub upstream listening on http://127.0.0.1:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import httpx
+
+from resilience import UpstreamUnavailable
+
+
+class LegError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def describe_failure(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return "timed out"
+    if isinstance(error, UpstreamUnavailable):
+        return error.reason
+    if isinstance(error, LegError):
+        return str(error)
+    if isinstance(error, httpx.TransportError):
+        return "unreachable"
+    return "failed"
+
+
+def decode_json(status_code, body):
+    if status_code >= 400:
+        raise LegError(status_code)
+    return json.loads(body) if body else None
+
+
+async def fan_out(legs, timeout):
+    """Await every leg concurrently, each with its own timeout.
+
+    Returns (data, errors): a failed leg is None in data and described in errors,
+    so callers decide which legs are required and which may be missing.
+    """
+    names = list(legs)
+    results = await asyncio.gather(
+        *(asyncio.wait_for(legs[name], timeout) for name in names),
+        return_exceptions=True,
+    )
+    data, errors = {}, {}
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            data[name] = None
+            errors[name] = describe_failure(result)
+        else:
+            data[name] = result
+    return data, errors
@@ -0,0 +1,85 @@
+import json
+import logging
+import threading
+import time
+
+import pika
+
+logger = logging.getLogger(__name__)
+
+# Published by the product service for every catalog change, including writes that
+# never pass through the gateway (import jobs, reservation expiry, Django admin)
+EXCHANGE = "product_events"
+ROUTING_KEY = "product.changed"
+
+
+def changed_product_ids(message):
+    return [row["id"] for row in message.get("products", [])] + [row["id"] for row in message.get("deleted", [])]
+
+
+class ProductEventListener:
+    """Consumes product.changed events on a background thread and reports changed ids.
+
+    Every gateway process binds its own exclusive queue, because each one holds its
+    own in-memory cache. Events sent while disconnected are lost, so `on_change` is
+    called with None after every (re)connect to mean "anything may have changed".
+    """
+
+    def __init__(self, host, port, user, password, on_change, retry_interval=5.0):
+        self.parameters = pika.ConnectionParameters(
+            host=host, port=port, credentials=pika.PlainCredentials(user, password), heartbeat=600,
+        )
+        self.on_change = on_change
+        self.retry_interval = retry_interval
+        self.connection = None
+        self.stopping = False
+        self.thread = None
+        self.received = 0
+
+    def start(self, loop):
+        # on_change runs on the event loop: the cache is not thread safe
+        self.loop = loop
+        self.thread = threading.Thread(target=self.run, name="product-events", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping = True
+        connection = self.connection
+        if connection is not None and connection.is_open:
+            connection.add_callback_threadsafe(connection.close)
+
+    def run(self):
+        while not self.stopping:
+            try:
+                self.consume()
+            except Exception as e:  # noqa: BLE001 - RabbitMQ not reachable yet: retry
+                if not self.stopping:
+                    logger.warning(f"Product event listener error: {e}; retrying in {self.retry_interval}s")
+                    time.sleep(self.retry_interval)
+
+    def consume(self):
+        self.connection = pika.BlockingConnection(self.parameters)
+        try:
+            channel = self.connection.channel()
+            channel.exchange_declare(exchange=EXCHANGE, exchange_type="topic", durable=True)
+            queue = channel.queue_declare(queue="", exclusive=True).method.queue
+            channel.queue_bind(exchange=EXCHANGE, queue=queue, routing_key=ROUTING_KEY)
+            channel.basic_consume(queue=queue, on_message_callback=self.handle, auto_ack=True)
+            self.loop.call_soon_threadsafe(self.on_change, None)
+            logger.info("Listening for product.changed events")
+            channel.start_consuming()
+        finally:
+            if self.connection.is_open:
+                self.connection.close()
+
+    def handle(self, channel, method, properties, body):
+        try:
+            product_ids = changed_product_ids(json.loads(body))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.error(f"Dropping malformed product event: {e}")
+            return
+        self.received += 1
+        self.loop.call_soon_threadsafe(self.on_change, product_ids)
+
+    def stats(self):
+        return {"received": self.received, "connected": bool(self.connection and self.connection.is_open)}
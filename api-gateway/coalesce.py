@@ -0,0 +1,83 @@
+import asyncio
+
+from fastapi.responses import Response
+
+from response_cache import etag_matches, make_etag
+
+
+class BufferedResponse:
+    """Upstream response read fully into memory so it can be handed to several callers."""
+
+    def __init__(self, status_code, headers, raw_headers, body):
+        self.status_code = status_code
+        self.headers = headers
+        self.raw_headers = raw_headers
+        self.body = body
+
+    def to_response(self, if_none_match=None):
+        if self.status_code != 200:
+            response = Response(content=self.body, status_code=self.status_code)
+            response.raw_headers = list(self.raw_headers)
+            return response
+
+        # The body is in memory anyway, so it can be validated for free
+        etag = self.headers.get("etag") or make_etag(self.body)
+        if etag_matches(if_none_match, etag):
+            response = Response(status_code=304)
+            response.raw_headers = [(b"etag", etag.encode("latin-1"))]
+            return response
+        response = Response(content=self.body, status_code=self.status_code)
+        response.raw_headers = [
+            (key, value) for key, value in self.raw_headers if key.lower() != b"etag"
+        ] + [(b"etag", etag.encode("latin-1"))]
+        return response
+
+
+class SingleFlight:
+    """Collapse identical concurrent calls into one; waiters share the result."""
+
+    def __init__(self):
+        self.calls = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(method, service, path, query_params, headers, vary):
+        query = "&".join(f"{k}={v}" for k, v in sorted(query_params.multi_items()))
+        varying = "|".join(headers.get(name, "") for name in vary)
+        return f"{method} {service}/{path}?{query}|{varying}"
+
+    async def do(self, key, fn):
+        """Return (result, shared); shared is True when another caller made the call."""
+        task = self.calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        self.upstream_calls += 1
+        # Run the call in its own task so a cancelled leader (client went away)
+        # does not cancel it for everyone else waiting on the same key.
+        task = asyncio.get_running_loop().create_task(fn())
+        self.calls[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task), False
+
+    def forget(self, prefix):
+        # Later callers start a fresh call instead of joining one that began
+        # before a write; the in-flight calls still complete for their waiters.
+        for key in [key for key in self.calls if key.startswith(prefix)]:
+            del self.calls[key]
+
+    def _finished(self, key, task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter was cancelled
+            task.exception()
+
+    def stats(self):
+        return {
+            "in_flight": len(self.calls),
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+        }
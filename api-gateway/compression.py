@@ -0,0 +1,190 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding):
+    """Pick the best supported encoding from an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    best = None
+    for encoding in supported_encodings():  # server preference order
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0 and (best is None or quality > accepted.get(best, accepted.get("*", 0.0))):
+            best = encoding
+    return best
+
+
+def is_compressible(status_code, headers, threshold):
+    """headers: a case-insensitive mapping of the response headers."""
+    if status_code != 200 or "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    if not content_type.startswith(COMPRESSIBLE_TYPES):
+        return False
+    length = headers.get("content-length")
+    return length is None or not length.isdigit() or int(length) >= threshold
+
+
+class StreamCompressor:
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=min(level, 11))
+        else:
+            # wbits=31: gzip container
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == "br":
+            return self.compressor.process(data)
+        return self.compressor.compress(data)
+
+    def flush(self):
+        if self.encoding == "br":
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def compress(body, encoding, level):
+    compressor = StreamCompressor(encoding, level)
+    return compressor.compress(body) + compressor.flush()
+
+
+def add_vary(raw_headers):
+    for index, (key, value) in enumerate(raw_headers):
+        if key.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                raw_headers[index] = (key, value + b", Accept-Encoding")
+            return raw_headers
+    raw_headers.append((b"vary", b"Accept-Encoding"))
+    return raw_headers
+
+
+def encode_headers(raw_headers, encoding, length=None):
+    """Headers of a response re-encoded with `encoding` (length None = streamed)."""
+    headers = []
+    for key, value in raw_headers:
+        name = key.lower()
+        if name in (b"content-length", b"content-encoding"):
+            continue
+        if name == b"etag" and not value.startswith(b"W/"):
+            # The bytes change, so only a weak validator still holds
+            value = b"W/" + value
+        headers.append((key, value))
+    headers.append((b"content-encoding", encoding.encode()))
+    if length is not None:
+        headers.append((b"content-length", str(length).encode()))
+    return add_vary(headers)
+
+
+class RawHeaders:
+    """Minimal case-insensitive view over ASGI raw headers."""
+
+    def __init__(self, raw_headers):
+        self.values = {key.lower().decode("latin-1"): value.decode("latin-1") for key, value in raw_headers}
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+
+class CompressionMiddleware:
+    """Compress eligible responses, buffered or streamed, chunk by chunk.
+
+    Responses that already carry Content-Encoding (e.g. pre-compressed cache
+    entries) pass through untouched.
+    """
+
+    def __init__(self, app, threshold=1024, level=6):
+        self.app = app
+        self.threshold = threshold
+        self.level = level
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = None
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if not is_compressible(message["status"], RawHeaders(message.get("headers", [])), self.threshold):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the headers until the first body chunk shows whether it is worth it
+                    start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.threshold:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = StreamCompressor(encoding, self.level)
+                length = None
+                if not more_body:
+                    data = compress(body, encoding, self.level)
+                    length = len(data)
+                start_message["headers"] = encode_headers(list(start_message.get("headers", [])), encoding, length)
+                await send(start_message)
+                if not more_body:
+                    self.bytes_in += len(body)
+                    self.bytes_out += len(data)
+                    await send({"type": "http.response.body", "body": data, "more_body": False})
+                    return
+
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.flush()
+            self.bytes_in += len(body)
+            self.bytes_out += len(data)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,196 @@
+import re
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+# Seconds; Prometheus "le" upper bounds (+Inf is implicit)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ID_SEGMENT = re.compile(r"/(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F-]{27})(?=/|$)")
+MAX_CACHED_PATHS = 10000
+
+# Per-request accumulator for time spent waiting on upstreams. Tasks spawned while
+# serving the request (single-flight calls) copy the context and share the object.
+current_timing = ContextVar("current_timing", default=None)
+
+
+class RequestTiming:
+    __slots__ = ("upstream",)
+
+    def __init__(self):
+        self.upstream = 0.0
+
+
+def record_upstream_time(seconds):
+    timing = current_timing.get()
+    if timing is not None:
+        timing.upstream += seconds
+
+
+class timed_upstream:
+    """Context manager adding the elapsed time to the current request's upstream total."""
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_upstream_time(time.perf_counter() - self.started)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def escape_label(value):
+    # Exposition format: only backslash, double quote and newline need escaping
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    return ",".join(f'{key}="{escape_label(value)}"' for key, value in labels)
+
+
+class MetricsRegistry:
+    def __init__(self, services, routes=()):
+        self.services = set(services)
+        # Route templates ("/products/products/{id}/") known to the gateway; any other
+        # path is labelled "/<service>/*" so clients cannot create new series
+        self.routes = {route.rstrip("/"): route for route in routes}
+        self.requests = {}
+        self.latency = {}
+        self.upstream_latency = {}
+        self.overhead = {}
+        self.in_flight = {}
+        self.route_cache = {}
+        # name -> callable returning {labels tuple: value}; evaluated on scrape only
+        self.collectors = []
+
+    def route_labels(self, path):
+        labels = self.route_cache.get(path)
+        if labels is None:
+            segments = path.split("/", 2)
+            service = segments[1] if len(segments) > 2 and segments[1] in self.services else "gateway"
+            route = self.routes.get(ID_SEGMENT.sub("/{id}", path).rstrip("/"))
+            if route is None:
+                route = f"/{service}/*" if service != "gateway" else "other"
+            labels = (service, route)
+            if len(self.route_cache) < MAX_CACHED_PATHS:
+                self.route_cache[path] = labels
+        return labels
+
+    def request_started(self, service):
+        self.in_flight[service] = self.in_flight.get(service, 0) + 1
+
+    def request_completed(self, service):
+        self.in_flight[service] -= 1
+
+    def request_finished(self, service, route, method, status, total, upstream):
+        key = (service, route, method, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+        labels = (service, route)
+        histogram = self.latency.get(labels)
+        if histogram is None:
+            histogram = self.latency[labels] = Histogram()
+            self.upstream_latency[labels] = Histogram()
+            self.overhead[labels] = Histogram()
+        histogram.observe(total)
+        if upstream:
+            self.upstream_latency[labels].observe(upstream)
+        self.overhead[labels].observe(max(0.0, total - upstream))
+
+    def add_collector(self, name, help_text, metric_type, collect):
+        self.collectors.append((name, help_text, metric_type, collect))
+
+    def render(self):
+        lines = [
+            "# HELP gateway_requests_total Requests handled by the gateway.",
+            "# TYPE gateway_requests_total counter",
+        ]
+        for (service, route, method, status), value in self.requests.items():
+            labels = format_labels((("service", service), ("route", route), ("method", method), ("status", status)))
+            lines.append(f"gateway_requests_total{{{labels}}} {value}")
+
+        lines += [
+            "# HELP gateway_requests_in_flight Requests currently being handled.",
+            "# TYPE gateway_requests_in_flight gauge",
+        ]
+        for service, value in self.in_flight.items():
+            lines.append(f"gateway_requests_in_flight{{{format_labels((('service', service),))}}} {value}")
+
+        for name, help_text, histograms in (
+            ("gateway_request_duration_seconds", "Time until the response starts.", self.latency),
+            ("gateway_upstream_duration_seconds", "Time spent waiting on upstream services.", self.upstream_latency),
+            ("gateway_overhead_duration_seconds", "Request time not spent waiting on upstreams.", self.overhead),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (service, route), histogram in histograms.items():
+                labels = format_labels((("service", service), ("route", route)))
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        for name, help_text, metric_type, collect in self.collectors:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            for labels, value in collect().items():
+                lines.append(f"{name}{{{format_labels(labels)}}} {value}" if labels else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware: counts, in-flight gauge and time-to-first-byte per route.
+
+    A request stays in flight until its body has been sent, streamed bodies included.
+    """
+
+    def __init__(self, app, registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        service, route = registry.route_labels(scope["path"])
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        started = time.perf_counter()
+        finished = False
+        registry.request_started(service)
+
+        async def send_and_measure(message):
+            nonlocal finished
+            if message["type"] == "http.response.start" and not finished:
+                finished = True
+                registry.request_finished(
+                    service, route, scope["method"], message["status"],
+                    time.perf_counter() - started, timing.upstream,
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            if not finished:
+                registry.request_finished(
+                    service, route, scope["method"], 500,
+                    time.perf_counter() - started, timing.upstream,
+                )
+            registry.request_completed(service)
+            current_timing.reset(token)
@@ -0,0 +1,84 @@
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+class RateLimited(Exception):
+    def __init__(self, rule, retry_after):
+        super().__init__(f"Rate limit '{rule.name}' exceeded")
+        self.rule = rule
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimitRule:
+    # scope "ip": charged per client IP before the token is looked at;
+    # scope "client": charged per authenticated user (or IP for anonymous calls)
+    def __init__(self, name, rate, burst, methods=None, pattern=None, scope="client"):
+        self.name = name
+        self.rate = rate  # tokens added per second
+        self.burst = burst  # bucket capacity
+        self.methods = set(methods) if methods else None
+        self.pattern = re.compile(pattern) if pattern else None
+        self.scope = scope
+
+    def applies(self, method, path):
+        if self.methods is not None and method not in self.methods:
+            return False
+        return self.pattern is None or bool(self.pattern.match(path))
+
+
+class RateLimitBackend(ABC):
+    """Bucket storage. A shared store (e.g. Redis) can implement the same call."""
+
+    @abstractmethod
+    async def consume(self, key, rate, burst, cost=1):
+        """Take `cost` tokens; return (allowed, retry_after_seconds, remaining)."""
+
+
+class InMemoryBackend(RateLimitBackend):
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+
+    async def consume(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            tokens = burst
+        else:
+            tokens, updated = bucket
+            tokens = min(burst, tokens + (now - updated) * rate)
+            self.buckets.move_to_end(key)
+
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self.buckets[key] = (tokens, now)
+        # The least recently used bucket is the most idle one, and an idle bucket
+        # refills to full anyway, so evicting it loses nothing that matters.
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+
+        retry_after = 0 if allowed else (cost - tokens) / rate
+        return allowed, retry_after, int(tokens)
+
+
+class RateLimiter:
+    def __init__(self, backend, rules):
+        self.backend = backend
+        self.rules = rules
+        self.rejected = 0
+
+    async def check(self, client_key, method, path, scope="client"):
+        """Charge every rule of `scope` that applies; raise RateLimited on the first empty bucket."""
+        for rule in self.rules:
+            if rule.scope != scope or not rule.applies(method, path):
+                continue
+            allowed, retry_after, remaining = await self.backend.consume(
+                f"{rule.name}:{client_key}", rule.rate, rule.burst
+            )
+            if not allowed:
+                self.rejected += 1
+                raise RateLimited(rule, retry_after)
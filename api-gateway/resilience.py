@@ -0,0 +1,205 @@
+import asyncio
+import math
+import random
+import time
+
+import httpx
+
+from upstream_pool import env_setting
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS = {502, 503, 504}
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError)
+
+
+class UpstreamUnavailable(Exception):
+    """The gateway refused to call an upstream; answered with 503 + Retry-After."""
+
+    def __init__(self, service, reason, retry_after):
+        super().__init__(f"{service} unavailable: {reason}")
+        self.service = service
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class Bulkhead:
+    """Caps concurrent calls to one upstream; a short queue absorbs bursts, the rest is shed."""
+
+    def __init__(self, max_concurrent, max_waiting, wait_timeout):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self.semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self.semaphore.release()
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, reset_timeout, half_open_max_calls):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+
+    def retry_after(self):
+        return self.opened_at + self.reset_timeout - time.monotonic()
+
+    def allow(self):
+        if self.state == self.CLOSED:
+            return True
+        if self.retry_after() <= 0:
+            # Open long enough (or the last probes never reported back): probe again
+            self.state = self.HALF_OPEN
+            self.opened_at = time.monotonic()
+            self.probes = 0
+        if self.state == self.OPEN or self.probes >= self.half_open_max_calls:
+            return False
+        # Half-open: let a few probe calls through; everyone else keeps failing fast
+        self.probes += 1
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """Retries may add at most `ratio` extra load on top of regular traffic (plus a small floor)."""
+
+    def __init__(self, ratio, min_per_second, max_tokens=100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated = time.monotonic()
+
+    def record_request(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self.updated) * self.min_per_second)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class ResiliencePolicy:
+    def __init__(self, service, max_concurrent=100, max_waiting=50, wait_timeout=0.5,
+                 failure_threshold=5, reset_timeout=10.0, half_open_max_calls=1,
+                 max_retries=2, backoff_base=0.05, backoff_max=1.0,
+                 retry_budget_ratio=0.2, retry_budget_min_per_second=5.0):
+        self.service = service
+        self.bulkhead = Bulkhead(max_concurrent, max_waiting, wait_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, half_open_max_calls)
+        self.retry_budget = RetryBudget(retry_budget_ratio, retry_budget_min_per_second)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    @classmethod
+    def from_env(cls, service, prefix):
+        return cls(
+            service,
+            max_concurrent=env_setting(prefix, "MAX_CONCURRENT", 100, int),
+            max_waiting=env_setting(prefix, "MAX_WAITING", 50, int),
+            wait_timeout=env_setting(prefix, "WAIT_TIMEOUT", 0.5, float),
+            failure_threshold=env_setting(prefix, "BREAKER_FAILURES", 5, int),
+            reset_timeout=env_setting(prefix, "BREAKER_RESET_TIMEOUT", 10.0, float),
+            max_retries=env_setting(prefix, "MAX_RETRIES", 2, int),
+        )
+
+    def backoff(self, attempt):
+        # Full jitter: spreads retries out so they do not arrive in waves
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def call(self, method, send, replayable):
+        """Run `send()` (a coroutine factory) under bulkhead, breaker and retry policy."""
+        self.retry_budget.record_request()
+        retryable = replayable and method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            if not await self.bulkhead.acquire():
+                raise UpstreamUnavailable(self.service, "too many concurrent requests", 1)
+            if not self.breaker.allow():
+                self.bulkhead.release()
+                raise UpstreamUnavailable(self.service, "circuit open", self.breaker.retry_after())
+
+            error = None
+            try:
+                response = await send()
+            except httpx.TransportError as e:
+                self.breaker.record_failure()
+                error = e
+                response = None
+            finally:
+                self.bulkhead.release()
+
+            if response is not None:
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response
+
+            can_retry = (
+                retryable
+                and attempt < self.max_retries
+                and (response is not None or isinstance(error, RETRYABLE_ERRORS))
+                and self.retry_budget.try_spend()
+            )
+            if not can_retry:
+                if response is not None:
+                    return response
+                raise error
+
+            if response is not None:
+                await response.aclose()
+            await asyncio.sleep(self.backoff(attempt))
+            attempt += 1
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "active": self.bulkhead.active,
+            "waiting": self.bulkhead.waiting,
+            "rejected": self.bulkhead.rejected,
+            "retry_tokens": round(self.retry_budget.tokens, 2),
+        }
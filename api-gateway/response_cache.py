@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+
+from fastapi.responses import Response
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(body):
+    # Weak: the same validator is valid for every content-encoding of the body
+    return 'W/"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 7232 2.3.2): ignore the W/ prefix on both sides
+    etag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class CacheRule:
+    def __init__(self, pattern, ttl, stale_ttl=0):
+        self.pattern = re.compile(pattern)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+
+class CacheRules:
+    def __init__(self, service, rules, read_only_posts=(), invalidations=()):
+        self.service = service
+        self.rules = rules
+        # POST endpoints that only read (large lookups that do not fit in a query string)
+        self.read_only_posts = [re.compile(pattern) for pattern in read_only_posts]
+        # (write path regex, cache key prefixes it makes stale); first match wins.
+        # Prefixes may use the regex's named groups, e.g. "products/{id}/".
+        self.invalidations = [(re.compile(pattern), prefixes) for pattern, prefixes in invalidations]
+
+    def match(self, service, path):
+        if service != self.service:
+            return None
+        for rule in self.rules:
+            if rule.pattern.match(path):
+                return rule
+        return None
+
+    def stale_prefixes(self, service, method, path):
+        """Key prefixes (within the service) that a successful write to `path` makes stale."""
+        if service != self.service or method == "GET":
+            return []
+        if method == "POST" and any(p.match(path) for p in self.read_only_posts):
+            return []
+        for pattern, prefixes in self.invalidations:
+            match = pattern.match(path)
+            if match:
+                return [prefix.format(**match.groupdict()) for prefix in prefixes]
+        return []
+
+
+class CachedResponse:
+    def __init__(self, status_code, headers, body, rule, etag=None):
+        now = time.monotonic()
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.etag = etag or make_etag(body)
+        self.stored_at = now
+        self.fresh_until = now + rule.ttl
+        self.stale_until = self.fresh_until + rule.stale_ttl
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers)
+
+    def is_fresh(self, now):
+        return now < self.fresh_until
+
+    def is_servable(self, now):
+        return now < self.stale_until
+
+    def to_response(self, state, not_modified=False):
+        headers = [(b"etag", self.etag.encode("latin-1"))]
+        headers.append((b"age", str(int(time.monotonic() - self.stored_at)).encode()))
+        headers.append((b"x-cache", state.encode()))
+        if not_modified:
+            response = Response(status_code=304)
+            response.raw_headers = headers
+            return response
+        response = Response(content=self.body, status_code=self.status_code)
+        response.raw_headers = [
+            (key, value) for key, value in self.headers if key.lower() != b"etag"
+        ] + headers
+        return response
+
+
+class ResponseCache:
+    """LRU cache of upstream responses bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries=5000, max_bytes=64 * 1024 * 1024, max_entry_bytes=1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        # Bumped on every invalidation; a fetch that started under an older
+        # generation must not store its (possibly pre-update) response.
+        self.generation = 0
+        self.refreshing = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(service, path, query_params, encoding):
+        query = "&".join(f"{k}={v}" for k, v in sorted(query_params.multi_items()))
+        return f"{service}/{path}?{query}|{encoding or ''}"
+
+    def accepts(self, response):
+        if response.status_code != 200 or "set-cookie" in response.headers:
+            return False
+        cache_control = response.headers.get("cache-control", "").lower()
+        if "no-store" in cache_control or "private" in cache_control:
+            return False
+        # Only keep bodies of known, bounded size; anything else is streamed
+        length = response.headers.get("content-length")
+        return length is not None and length.isdigit() and int(length) <= self.max_entry_bytes
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if not entry.is_servable(time.monotonic()):
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def set(self, key, entry, generation):
+        if generation != self.generation or entry.size > self.max_entry_bytes:
+            return False
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = entry
+        self.size += entry.size
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            self._remove(next(iter(self.entries)))
+        return True
+
+    def invalidate(self, prefix=""):
+        self.generation += 1
+        keys = [key for key in self.entries if key.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= entry.size
+
+    def revalidate_in_background(self, key, refresh):
+        # Stale-while-revalidate: at most one refresh per key at a time
+        if key in self.refreshing:
+            return
+
+        async def run():
+            try:
+                await refresh()
+            except Exception as e:
+                logger.warning(f"Background revalidation of {key} failed: {e}")
+            finally:
+                self.refreshing.pop(key, None)
+
+        self.refreshing[key] = asyncio.get_running_loop().create_task(run())
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,640 @@
+"""Gateway tests: run with `python -m unittest tests` from api-gateway/.
+
+The gateway app is driven through httpx.ASGITransport and every upstream service is a
+StubUpstream, itself mounted on the pooled clients through another ASGITransport.
+"""
+import asyncio
+import gzip
+import inspect
+import json
+import re
+import unittest
+import zlib
+from unittest import mock
+
+import httpx
+
+import app as gateway
+from auth import TokenAuthenticator
+from cache_events import ProductEventListener
+from coalesce import SingleFlight
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware, MetricsRegistry
+from ratelimit import InMemoryBackend, RateLimiter, RateLimitRule
+from resilience import CircuitBreaker, ResiliencePolicy
+from response_cache import CachedResponse, CacheRule, CacheRules, ResponseCache
+
+
+class Reply:
+    def __init__(self, status=200, body=None, headers=(), chunks=None, content_type="application/json"):
+        self.status = status
+        self.body = json.dumps({"ok": True}).encode() if body is None else body
+        self.headers = list(headers)
+        # Body sent in several ASGI messages without Content-Length (a streamed answer)
+        self.chunks = chunks
+        self.content_type = content_type
+
+
+class StubRequest:
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class StubUpstream:
+    """ASGI app standing in for one upstream service; records every request it gets."""
+
+    def __init__(self):
+        self.requests = []
+        self.handler = lambda request: Reply()
+        # When set, requests are held until the event fires (to keep calls in flight)
+        self.gate = None
+
+    async def __call__(self, scope, receive, send):
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        request = StubRequest(scope["method"], scope["path"], scope["query_string"].decode(), headers, body)
+        self.requests.append(request)
+        if self.gate is not None:
+            await self.gate.wait()
+
+        reply = self.handler(request)
+        if inspect.isawaitable(reply):
+            reply = await reply
+        headers = [(b"content-type", reply.content_type.encode())]
+        headers += [(key.encode(), value.encode()) for key, value in reply.headers]
+        if reply.chunks is None:
+            headers.append((b"content-length", str(len(reply.body)).encode()))
+            await send({"type": "http.response.start", "status": reply.status, "headers": headers})
+            await send({"type": "http.response.body", "body": reply.body})
+            return
+        await send({"type": "http.response.start", "status": reply.status, "headers": headers})
+        for chunk in reply.chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def wait_for_requests(self, count, timeout=2.0):
+        async def poll():
+            while len(self.requests) < count:
+                await asyncio.sleep(0.001)
+        await asyncio.wait_for(poll(), timeout)
+
+
+USERS = {
+    "alice-token": {"id": 1, "username": "alice", "is_staff": False},
+    "alice-token-2": {"id": 1, "username": "alice", "is_staff": False},
+    "bob-token": {"id": 2, "username": "bob", "is_staff": False},
+}
+
+
+def introspection_handler(request):
+    if request.path == "/users/users/introspect/":
+        if request.headers.get("x-introspection-secret") != "intro-secret":
+            return Reply(status=403)
+        tokens = request.json()["tokens"]
+        return Reply(body=json.dumps({"users": {token: USERS[token] for token in tokens if token in USERS}}).encode())
+    return Reply()
+
+
+class GatewayTestCase(unittest.IsolatedAsyncioTestCase):
+    """Fresh gateway state (cache, single flight, policies, limiter, auth cache) per test."""
+
+    async def asyncSetUp(self):
+        self.stubs = {name: StubUpstream() for name in gateway.upstreams.configs}
+        self.stubs["users"].handler = introspection_handler
+        clients = {
+            name: httpx.AsyncClient(base_url="http://upstream", transport=httpx.ASGITransport(app=stub))
+            for name, stub in self.stubs.items()
+        }
+        patches = [
+            mock.patch.dict(gateway.upstreams.clients, clients, clear=True),
+            mock.patch.dict(gateway.resilience, {
+                name: ResiliencePolicy(name, backoff_base=0.001) for name in gateway.resilience
+            }),
+            mock.patch.object(gateway, "response_cache", ResponseCache()),
+            mock.patch.object(gateway, "single_flight", SingleFlight()),
+            mock.patch.object(gateway, "authenticator", TokenAuthenticator(gateway.introspect_tokens)),
+            mock.patch.object(gateway, "rate_limiter", RateLimiter(InMemoryBackend(), [])),
+            mock.patch.object(gateway, "GATEWAY_SHARED_SECRET", "gw-secret"),
+            mock.patch.object(gateway, "GATEWAY_INTROSPECTION_SECRET", "intro-secret"),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=gateway.app, client=("10.0.0.1", 50000)), base_url="http://gateway",
+        )
+        self.addAsyncCleanup(self.client.aclose)
+        for client in clients.values():
+            self.addAsyncCleanup(client.aclose)
+
+    def policy(self, service, **options):
+        policy = gateway.resilience[service] = ResiliencePolicy(service, backoff_base=0.001, **options)
+        return policy
+
+    def introspections(self):
+        return [request for request in self.stubs["users"].requests if request.path.endswith("/introspect/")]
+
+
+class CircuitBreakerTests(GatewayTestCase):
+    async def test_opens_after_failures_and_closes_after_successful_probe(self):
+        policy = self.policy("orders", failure_threshold=2, reset_timeout=0.05, max_retries=0)
+        stub = self.stubs["orders"]
+        stub.handler = lambda request: Reply(status=500)
+
+        for _ in range(2):
+            self.assertEqual((await self.client.get("/orders/orders/")).status_code, 500)
+        self.assertEqual(policy.breaker.state, CircuitBreaker.OPEN)
+
+        response = await self.client.get("/orders/orders/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["reason"], "circuit open")
+        self.assertIn("retry-after", response.headers)
+        self.assertEqual(len(stub.requests), 2)
+
+        await asyncio.sleep(0.06)
+        stub.handler = lambda request: Reply()
+        self.assertEqual((await self.client.get("/orders/orders/")).status_code, 200)
+        self.assertEqual(policy.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_allows_limited_probes_and_reopens_on_failure(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, half_open_max_calls=1)
+        with mock.patch("resilience.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+            self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+            self.assertFalse(breaker.allow())
+        with mock.patch("resilience.time.monotonic", return_value=110.0):
+            self.assertTrue(breaker.allow())
+            self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+            self.assertFalse(breaker.allow())
+            breaker.record_failure()
+            self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+            self.assertFalse(breaker.allow())
+
+
+class BulkheadTests(GatewayTestCase):
+    async def test_sheds_calls_beyond_the_limit(self):
+        policy = self.policy("orders", max_concurrent=1, max_waiting=0)
+        stub = self.stubs["orders"]
+        stub.gate = asyncio.Event()
+
+        first = asyncio.create_task(self.client.get("/orders/orders/1/"))
+        await stub.wait_for_requests(1)
+        response = await self.client.get("/orders/orders/2/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["reason"], "too many concurrent requests")
+        self.assertEqual(policy.bulkhead.rejected, 1)
+
+        stub.gate.set()
+        self.assertEqual((await first).status_code, 200)
+        self.assertEqual(len(stub.requests), 1)
+
+    async def test_queued_call_runs_when_a_slot_frees(self):
+        self.policy("orders", max_concurrent=1, max_waiting=1, wait_timeout=1.0)
+        stub = self.stubs["orders"]
+        stub.gate = asyncio.Event()
+
+        first = asyncio.create_task(self.client.get("/orders/orders/1/"))
+        await stub.wait_for_requests(1)
+        second = asyncio.create_task(self.client.get("/orders/orders/2/"))
+        await asyncio.sleep(0.01)
+        stub.gate.set()
+        self.assertEqual([(await first).status_code, (await second).status_code], [200, 200])
+
+
+class RetryTests(GatewayTestCase):
+    def fail_first(self, count, status=503):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return Reply(status=status) if len(calls) <= count else Reply()
+        return handler
+
+    async def test_idempotent_call_is_retried(self):
+        self.policy("orders")
+        stub = self.stubs["orders"]
+        stub.handler = self.fail_first(2)
+        self.assertEqual((await self.client.get("/orders/orders/")).status_code, 200)
+        self.assertEqual(len(stub.requests), 3)
+
+    async def test_connection_errors_are_retried(self):
+        self.policy("orders")
+        stub = self.stubs["orders"]
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                raise httpx.ConnectError("refused")
+            return Reply()
+        stub.handler = handler
+        self.assertEqual((await self.client.get("/orders/orders/")).status_code, 200)
+        self.assertEqual(len(calls), 2)
+
+    async def test_post_is_not_retried(self):
+        self.policy("orders")
+        stub = self.stubs["orders"]
+        stub.handler = self.fail_first(1)
+        self.assertEqual((await self.client.post("/orders/orders/", json={"a": 1})).status_code, 503)
+        self.assertEqual(len(stub.requests), 1)
+
+    async def test_retries_stop_when_the_budget_is_spent(self):
+        policy = self.policy("orders", retry_budget_ratio=0, retry_budget_min_per_second=0)
+        policy.retry_budget.tokens = 1
+        stub = self.stubs["orders"]
+        stub.handler = lambda request: Reply(status=503)
+
+        self.assertEqual((await self.client.get("/orders/orders/1/")).status_code, 503)
+        self.assertEqual(len(stub.requests), 2)
+        self.assertEqual((await self.client.get("/orders/orders/2/")).status_code, 503)
+        self.assertEqual(len(stub.requests), 3)
+
+
+class SingleFlightTests(GatewayTestCase):
+    async def test_identical_concurrent_gets_share_one_upstream_call(self):
+        stub = self.stubs["orders"]
+        stub.gate = asyncio.Event()
+        stub.handler = lambda request: Reply(body=b'{"orders": []}')
+
+        calls = [asyncio.create_task(self.client.get("/orders/orders/")) for _ in range(5)]
+        await stub.wait_for_requests(1)
+        await asyncio.sleep(0.01)
+        stub.gate.set()
+        responses = await asyncio.gather(*calls)
+
+        self.assertEqual([response.status_code for response in responses], [200] * 5)
+        self.assertEqual({response.content for response in responses}, {b'{"orders": []}'})
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual(gateway.single_flight.coalesced, 4)
+
+    async def test_requests_with_different_vary_headers_are_not_shared(self):
+        stub = self.stubs["orders"]
+        stub.gate = asyncio.Event()
+
+        calls = [
+            asyncio.create_task(self.client.get("/orders/orders/", headers={"accept-language": language}))
+            for language in ("en", "vi", "en")
+        ]
+        await stub.wait_for_requests(2)
+        await asyncio.sleep(0.01)
+        stub.gate.set()
+        await asyncio.gather(*calls)
+        self.assertEqual(sorted(request.headers["accept-language"] for request in stub.requests), ["en", "vi"])
+
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "body"
+
+        leader = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+        self.assertEqual(await follower, ("body", True))
+        self.assertEqual(flight.upstream_calls, 1)
+
+
+class ResponseCacheTests(GatewayTestCase):
+    def versioned(self):
+        stub = self.stubs["products"]
+        versions = []
+
+        def handler(request):
+            versions.append(request)
+            return Reply(body=json.dumps({"path": request.path, "version": len(versions)}).encode())
+        stub.handler = handler
+        return stub
+
+    async def get_product(self, product_id):
+        response = await self.client.get(f"/products/products/{product_id}/")
+        return response.headers["x-cache"], response.json()["version"]
+
+    async def test_second_read_is_a_hit(self):
+        stub = self.versioned()
+        self.assertEqual(await self.get_product(5), ("MISS", 1))
+        self.assertEqual(await self.get_product(5), ("HIT", 1))
+        self.assertEqual(len(stub.requests), 1)
+
+    async def test_write_invalidates_only_the_affected_product_and_listings(self):
+        stub = self.versioned()
+        await self.get_product(5)
+        await self.get_product(6)
+        await self.client.get("/products/products/")
+
+        # Checkout traffic leaves the catalog cache alone
+        await self.client.post("/products/reservations/", json={"items": []})
+        self.assertEqual((await self.get_product(5))[0], "HIT")
+
+        await self.client.put("/products/products/5/", json={"name": "Renamed"})
+        self.assertEqual((await self.get_product(5))[0], "MISS")
+        self.assertEqual((await self.get_product(6))[0], "HIT")
+        self.assertEqual((await self.client.get("/products/products/")).headers["x-cache"], "MISS")
+        self.assertEqual(len([r for r in stub.requests if r.method == "GET"]), 5)
+
+    async def test_stale_entry_is_served_while_revalidating(self):
+        self.versioned()
+        rules = CacheRules("products", [CacheRule(r"^products/\d+/$", ttl=0, stale_ttl=60)])
+        with mock.patch.object(gateway, "cache_rules", rules):
+            self.assertEqual(await self.get_product(5), ("MISS", 1))
+            self.assertEqual(await self.get_product(5), ("STALE", 1))
+            await asyncio.gather(*list(gateway.response_cache.refreshing.values()))
+            self.assertEqual(await self.get_product(5), ("STALE", 2))
+        self.assertEqual(gateway.response_cache.stale_hits, 2)
+
+    async def test_conditional_get_is_answered_from_the_cache(self):
+        self.versioned()
+        etag = (await self.client.get("/products/products/5/")).headers["etag"]
+        response = await self.client.get("/products/products/5/", headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["x-cache"], "HIT")
+
+    async def test_product_events_invalidate_changed_products(self):
+        self.versioned()
+        await self.get_product(5)
+        await self.get_product(6)
+        await self.client.get("/products/products/")
+
+        gateway.invalidate_changed_products([5])
+        self.assertEqual((await self.get_product(5))[0], "MISS")
+        self.assertEqual((await self.get_product(6))[0], "HIT")
+        self.assertEqual((await self.client.get("/products/products/")).headers["x-cache"], "MISS")
+
+        # After a reconnect events may have been missed: every product entry goes
+        gateway.invalidate_changed_products(None)
+        self.assertEqual((await self.get_product(6))[0], "MISS")
+
+    def test_listener_reports_changed_and_deleted_ids(self):
+        changes = []
+        listener = ProductEventListener("localhost", 5672, "guest", "guest", changes.append)
+        listener.loop = mock.Mock(call_soon_threadsafe=lambda callback, ids: callback(ids))
+
+        listener.handle(None, None, None, json.dumps({"products": [{"id": 3}], "deleted": [{"id": 4}]}).encode())
+        listener.handle(None, None, None, b"not json")
+        listener.handle(None, None, None, b"[1]")
+        self.assertEqual(changes, [[3, 4]])
+
+    async def test_purge_needs_a_configured_token(self):
+        self.versioned()
+        await self.get_product(5)
+        with mock.patch.object(gateway, "CACHE_PURGE_TOKEN", ""):
+            self.assertEqual((await self.client.post("/_gateway/cache/purge")).status_code, 403)
+        with mock.patch.object(gateway, "CACHE_PURGE_TOKEN", "purge-secret"):
+            response = await self.client.post("/_gateway/cache/purge", headers={"x-purge-token": "wrong"})
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual((await self.get_product(5))[0], "HIT")
+
+            response = await self.client.post("/_gateway/cache/purge", headers={"x-purge-token": "purge-secret"})
+            self.assertEqual(response.json()["purged"], 1)
+        self.assertEqual((await self.get_product(5))[0], "MISS")
+
+    async def test_purge_is_rate_limited(self):
+        gateway.rate_limiter = RateLimiter(InMemoryBackend(), [
+            RateLimitRule("cache-purge", rate=0.001, burst=2, pattern=r"^/_gateway/cache/purge$", scope="ip"),
+        ])
+        codes = [(await self.client.post("/_gateway/cache/purge")).status_code for _ in range(3)]
+        self.assertEqual(codes, [403, 403, 429])
+
+    def test_fetch_started_before_an_invalidation_is_not_stored(self):
+        cache = ResponseCache()
+        rule = CacheRule(r"", ttl=60)
+        generation = cache.generation
+        cache.invalidate("products/")
+        self.assertFalse(cache.set("products/products/5/?|", CachedResponse(200, [], b"old", rule), generation))
+        self.assertNotIn("products/products/5/?|", cache.entries)
+        self.assertTrue(cache.set("products/products/5/?|", CachedResponse(200, [], b"new", rule), cache.generation))
+
+
+class CompressionTests(GatewayTestCase):
+    async def run_middleware(self, chunks, threshold=1024):
+        async def streaming_app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"application/json")]})
+            for index, chunk in enumerate(chunks):
+                await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        middleware = CompressionMiddleware(streaming_app, threshold=threshold)
+        scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", b"gzip")]}
+        await middleware(scope, None, send)
+        return messages
+
+    async def test_streamed_response_is_gzipped_chunk_by_chunk(self):
+        chunks = [b'{"items": [' + b'"product", ' * 100, b'"product", ' * 100, b'"last"]}']
+        messages = await self.run_middleware(chunks)
+
+        start, bodies = messages[0], messages[1:]
+        headers = dict(start["headers"])
+        self.assertEqual(headers[b"content-encoding"], b"gzip")
+        self.assertNotIn(b"content-length", headers)
+        self.assertEqual(headers[b"vary"], b"Accept-Encoding")
+        self.assertEqual([message["more_body"] for message in bodies], [True, True, False])
+
+        # One gzip member across all messages, complete only after the last one
+        decompressor = zlib.decompressobj(31)
+        data = b"".join(decompressor.decompress(message["body"]) for message in bodies)
+        self.assertTrue(decompressor.eof)
+        self.assertEqual(data, b"".join(chunks))
+
+    async def test_small_single_chunk_passes_through(self):
+        messages = await self.run_middleware([b'{"ok": true}'])
+        self.assertNotIn(b"content-encoding", dict(messages[0]["headers"]))
+        self.assertEqual(messages[1]["body"], b'{"ok": true}')
+
+    async def test_streamed_upstream_body_is_compressed_by_the_gateway(self):
+        chunks = [b'{"orders": [' + b'{"id": 1}, ' * 200, b'{"id": 2}]}']
+        self.stubs["orders"].handler = lambda request: Reply(chunks=chunks)
+
+        async with self.client.stream("GET", "/orders/orders/", headers={"accept-encoding": "gzip"}) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertNotIn("content-length", response.headers)
+        self.assertEqual(gzip.decompress(raw), b"".join(chunks))
+
+
+class MetricsTests(GatewayTestCase):
+    # name{label="value",...} number, with \\, \" and \n as the only escapes inside values
+    SAMPLE = re.compile(r'^[a-z_]+(\{([a-z_]+="([^"\\\n]|\\[\\"n])*",?)*\})? \S+$')
+
+    def assert_valid_exposition(self, text):
+        for line in text.splitlines():
+            if not line.startswith("#"):
+                self.assertRegex(line, self.SAMPLE)
+
+    async def test_unknown_paths_share_one_series(self):
+        registry = MetricsRegistry(["products"], ["/products/products/{id}/"])
+        self.assertEqual(registry.route_labels("/products/products/5/"), ("products", "/products/products/{id}/"))
+        self.assertEqual(registry.route_labels("/products/products/5"), ("products", "/products/products/{id}/"))
+        self.assertEqual(registry.route_labels("/products/junk-1/"), ("products", "/products/*"))
+        self.assertEqual(registry.route_labels("/nowhere"), ("gateway", "other"))
+
+    async def test_paths_with_quotes_and_newlines_keep_the_scrape_valid(self):
+        for path in ("/products/a%22b", "/products/a%0Ab", '/products/a"b\\'):
+            await self.client.get(path)
+        text = (await self.client.get("/metrics")).text
+        self.assert_valid_exposition(text)
+        self.assertNotIn('a"b', text)
+
+        registry = MetricsRegistry([])
+        registry.add_collector("test_total", "Escaping.", "counter", lambda: {(("value", 'a\\b"c\nd'),): 1})
+        self.assertIn('test_total{value="a\\\\b\\"c\\nd"} 1', registry.render())
+
+    async def test_streamed_response_is_in_flight_until_the_body_is_sent(self):
+        registry = MetricsRegistry(["orders"])
+        release = asyncio.Event()
+
+        async def streaming_app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"first", "more_body": True})
+            await release.wait()
+            await send({"type": "http.response.body", "body": b"last"})
+
+        async def send(message):
+            pass
+
+        middleware = MetricsMiddleware(streaming_app, registry)
+        call = asyncio.create_task(middleware({"type": "http", "method": "GET", "path": "/orders/orders/"}, None, send))
+        await asyncio.sleep(0.01)
+        self.assertEqual(registry.in_flight["orders"], 1)
+        self.assertEqual(sum(registry.requests.values()), 1)
+
+        release.set()
+        await call
+        self.assertEqual(registry.in_flight["orders"], 0)
+
+
+class TokenIntrospectionTests(GatewayTestCase):
+    async def test_concurrent_requests_share_one_batched_introspection(self):
+        tokens = ["alice-token", "bob-token", "unknown-token"] * 4
+        responses = await asyncio.gather(*(
+            self.client.get("/cart/carts/", headers={"authorization": f"Token {token}"}) for token in tokens
+        ))
+
+        self.assertEqual([response.status_code for response in responses[:3]], [200, 200, 401])
+        introspections = self.introspections()
+        self.assertEqual(len(introspections), 1)
+        self.assertEqual(sorted(introspections[0].json()["tokens"]), ["alice-token", "bob-token", "unknown-token"])
+
+        # Valid and unknown tokens are both cached
+        await self.client.get("/cart/carts/", headers={"authorization": "Token alice-token"})
+        await self.client.get("/cart/carts/", headers={"authorization": "Token unknown-token"})
+        self.assertEqual(len(self.introspections()), 1)
+        self.assertEqual(gateway.authenticator.hits, 2)
+
+    async def test_large_batches_are_flushed_without_waiting(self):
+        batches = []
+
+        async def introspect(tokens):
+            batches.append(sorted(tokens))
+            return {}
+
+        authenticator = TokenAuthenticator(introspect, batch_window=10, max_batch=2)
+        results = await asyncio.wait_for(
+            asyncio.gather(authenticator.resolve("a"), authenticator.resolve("b")), 1)
+        self.assertEqual(results, [None, None])
+        self.assertEqual(batches, [["a", "b"]])
+
+    async def test_identity_headers_are_set_by_the_gateway_only(self):
+        await self.client.get("/cart/carts/", headers={
+            "authorization": "Token alice-token",
+            "x-user-id": "99",
+            "x-gateway-secret": "forged",
+            "x-introspection-secret": "intro-secret",
+        })
+        upstream = self.stubs["cart"].requests[0].headers
+        self.assertEqual((upstream["x-user-id"], upstream["x-gateway-secret"]), ("1", "gw-secret"))
+        self.assertNotIn("x-introspection-secret", upstream)
+
+        introspection = self.introspections()[0].headers
+        self.assertEqual(introspection["x-introspection-secret"], "intro-secret")
+        self.assertNotIn("x-gateway-secret", introspection)
+
+    async def test_introspection_route_is_not_proxied(self):
+        for path in ("/users/users/introspect/", "/users/users//introspect", "/users//users/introspect/"):
+            response = await self.client.post(path, json={"tokens": ["alice-token"]},
+                                              headers={"authorization": "Token alice-token"})
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.stubs["users"].requests, [])
+
+
+class TokenBucketTests(unittest.IsolatedAsyncioTestCase):
+    async def test_bucket_refills_at_the_configured_rate(self):
+        backend = InMemoryBackend()
+        with mock.patch("ratelimit.time.monotonic", return_value=100.0):
+            self.assertTrue((await backend.consume("k", rate=10, burst=2))[0])
+            self.assertTrue((await backend.consume("k", rate=10, burst=2))[0])
+            allowed, retry_after, _ = await backend.consume("k", rate=10, burst=2)
+            self.assertFalse(allowed)
+            self.assertAlmostEqual(retry_after, 0.1)
+        with mock.patch("ratelimit.time.monotonic", return_value=100.15):
+            self.assertTrue((await backend.consume("k", rate=10, burst=2))[0])
+            self.assertFalse((await backend.consume("k", rate=10, burst=2))[0])
+
+    async def test_least_recently_used_bucket_is_evicted(self):
+        backend = InMemoryBackend(max_keys=2)
+        for key in ("a", "b", "a", "c"):
+            await backend.consume(key, rate=1, burst=5)
+        self.assertEqual(list(backend.buckets), ["a", "c"])
+
+
+class RateLimitTests(GatewayTestCase):
+    def limiter(self, ip_burst=100, client_burst=100):
+        gateway.rate_limiter = RateLimiter(InMemoryBackend(), [
+            RateLimitRule("ip", rate=0.001, burst=ip_burst, scope="ip"),
+            RateLimitRule("client", rate=0.001, burst=client_burst),
+        ])
+        return gateway.rate_limiter
+
+    async def test_made_up_tokens_do_not_get_fresh_buckets(self):
+        limiter = self.limiter(ip_burst=3)
+        codes = [
+            (await self.client.get("/products/categories/", headers={"authorization": f"Token made-up-{i}"}))
+            .status_code
+            for i in range(6)
+        ]
+        self.assertEqual(codes, [401, 401, 401, 429, 429, 429])
+        self.assertEqual(len(self.introspections()), 3)
+        self.assertEqual(list(limiter.backend.buckets), ["ip:ip:10.0.0.1"])
+
+    async def test_client_bucket_is_keyed_on_the_user_not_the_token(self):
+        self.limiter(client_burst=2)
+        codes = [
+            (await self.client.get("/cart/carts/", headers={"authorization": f"Token {token}"})).status_code
+            for token in ("alice-token", "alice-token-2", "alice-token", "bob-token")
+        ]
+        self.assertEqual(codes, [200, 200, 429, 200])
+        # Anonymous calls from the same IP have their own bucket
+        self.assertEqual((await self.client.get("/cart/carts/")).status_code, 200)
+
+    async def test_rule_applies_only_to_matching_method_and_path(self):
+        gateway.rate_limiter = RateLimiter(InMemoryBackend(), [
+            RateLimitRule("payments-write", rate=0.001, burst=1, methods={"POST"}, pattern=r"^/payments/"),
+        ])
+        codes = [(await self.client.post("/payments/payments/", json={})).status_code for _ in range(2)]
+        self.assertEqual(codes, [200, 429])
+        self.assertEqual((await self.client.get("/payments/payments/")).status_code, 200)
+        self.assertEqual((await self.client.post("/orders/orders/", json={})).status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
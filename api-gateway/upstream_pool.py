@@ -0,0 +1,89 @@
+import os
+import httpx
+
+
+def env_setting(prefix, name, default, cast):
+    # Per-upstream value first (e.g. PRODUCT_SERVICE_MAX_CONNECTIONS), then the
+    # gateway-wide default (UPSTREAM_MAX_CONNECTIONS), then the hardcoded one.
+    value = os.getenv(f"{prefix}_{name}", os.getenv(f"UPSTREAM_{name}"))
+    return cast(value) if value is not None else default
+
+
+class UpstreamConfig:
+    def __init__(self, name, base_url, max_connections=100, max_keepalive_connections=20,
+                 keepalive_expiry=30.0, connect_timeout=2.0, read_timeout=10.0):
+        self.name = name
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    @classmethod
+    def from_env(cls, name, prefix, base_url):
+        return cls(
+            name=name,
+            base_url=base_url,
+            max_connections=env_setting(prefix, "MAX_CONNECTIONS", 100, int),
+            max_keepalive_connections=env_setting(prefix, "MAX_KEEPALIVE", 20, int),
+            keepalive_expiry=env_setting(prefix, "KEEPALIVE_EXPIRY", 30.0, float),
+            connect_timeout=env_setting(prefix, "CONNECT_TIMEOUT", 2.0, float),
+            read_timeout=env_setting(prefix, "READ_TIMEOUT", 10.0, float),
+        )
+
+    def build_client(self):
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        timeout = httpx.Timeout(
+            self.read_timeout,
+            connect=self.connect_timeout,
+            pool=self.connect_timeout,
+        )
+        return httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=timeout)
+
+
+class UpstreamPool:
+    """One long-lived AsyncClient (and so one connection pool) per upstream service."""
+
+    def __init__(self, configs):
+        self.configs = {config.name: config for config in configs}
+        self.clients = {}
+
+    async def start(self):
+        for name, config in self.configs.items():
+            if name not in self.clients:
+                self.clients[name] = config.build_client()
+
+    async def close(self):
+        clients, self.clients = self.clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def __contains__(self, name):
+        return name in self.configs
+
+    def client(self, name):
+        client = self.clients.get(name)
+        if client is None:
+            # Startup hook has not run (e.g. the app is mounted without lifespan);
+            # create the client lazily instead of failing the request.
+            client = self.clients[name] = self.configs[name].build_client()
+        return client
+
+    def stats(self):
+        # httpx has no public pool introspection; read httpcore's pool when present
+        stats = {}
+        for name, client in self.clients.items():
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", ()))
+            idle = sum(1 for connection in connections if connection.is_idle())
+            stats[name] = {
+                "active": len(connections) - idle,
+                "idle": idle,
+                "max_connections": self.configs[name].max_connections,
+            }
+        return stats
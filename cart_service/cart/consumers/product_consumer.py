@@ -0,0 +1,77 @@
+import json
+import logging
+import time
+
+import pika
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+
+from ..replica import apply_event
+
+logger = logging.getLogger(__name__)
+
+EXCHANGE = 'product_events'
+QUEUE = 'cart_service_products'
+ROUTING_KEY = 'product.changed'
+
+
+def get_connection():
+    credentials = pika.PlainCredentials(
+        settings.RABBITMQ_USER,
+        settings.RABBITMQ_PASS
+    )
+    parameters = pika.ConnectionParameters(
+        host=settings.RABBITMQ_HOST,
+        port=settings.RABBITMQ_PORT,
+        credentials=credentials,
+        heartbeat=600,
+        blocked_connection_timeout=300
+    )
+    return pika.BlockingConnection(parameters)
+
+
+def declare_queue(channel):
+    channel.exchange_declare(exchange=EXCHANGE, exchange_type='topic', durable=True)
+    channel.queue_declare(queue=QUEUE, durable=True)
+    channel.queue_bind(exchange=EXCHANGE, queue=QUEUE, routing_key=ROUTING_KEY)
+
+
+def product_callback(ch, method, properties, body):
+    try:
+        close_old_connections()
+        written = apply_event(json.loads(body))
+        logger.info(f"Applied product event: {written} replica rows written")
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+    except DatabaseError as e:
+        # Database tạm thời lỗi: trả message về queue và thử lại sau
+        logger.error(f"Database error while applying product event: {e}")
+        time.sleep(1)
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+    except Exception as e:
+        logger.error(f"Error processing product message: {e}")
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+
+
+def prepare_queue():
+    # Khai báo queue trước khi đồng bộ ban đầu: event phát sinh trong lúc đồng bộ được giữ lại
+    # trong queue và áp dụng sau đó (version bỏ qua những event cũ hơn dữ liệu đã đồng bộ)
+    connection = get_connection()
+    try:
+        declare_queue(connection.channel())
+    finally:
+        connection.close()
+
+
+def start_consumer(prefetch_count=100):
+    connection = get_connection()
+    try:
+        channel = connection.channel()
+        declare_queue(channel)
+        channel.basic_qos(prefetch_count=prefetch_count)
+        channel.basic_consume(queue=QUEUE, on_message_callback=product_callback)
+
+        logger.info('Product consumer started. Waiting for messages...')
+        channel.start_consuming()
+    finally:
+        if connection.is_open:
+            connection.close()
@@ -0,0 +1,162 @@
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+class LocalKV:
+    # Thay cho Redis trong một process (test, chạy dev một worker): cùng tên và ngữ nghĩa
+    # với các lệnh redis-py mà storage.KeyValueCartStore dùng, giá trị lưu dạng chuỗi
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = {}
+        self.expires = {}
+
+    def _live(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _hash(self, key):
+        value = self._live(key)
+        if value is None:
+            value = self.data[key] = {}
+        return value
+
+    def pipeline(self):
+        return LocalPipeline(self)
+
+    def get(self, key):
+        with self.lock:
+            return self._live(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        with self.lock:
+            if nx and self._live(key) is not None:
+                return None
+            self.data[key] = str(value)
+            self.expires.pop(key, None)
+            if ex:
+                self.expire(key, ex)
+            return True
+
+    def incr(self, key, amount=1):
+        with self.lock:
+            value = int(self._live(key) or 0) + amount
+            self.data[key] = str(value)
+            return value
+
+    def delete(self, *keys):
+        with self.lock:
+            removed = sum(1 for key in keys if self._live(key) is not None)
+            for key in keys:
+                self.data.pop(key, None)
+                self.expires.pop(key, None)
+            return removed
+
+    def expire(self, key, seconds):
+        with self.lock:
+            if self._live(key) is None:
+                return False
+            self.expires[key] = time.monotonic() + seconds
+            return True
+
+    def hget(self, key, field):
+        with self.lock:
+            return (self._live(key) or {}).get(field)
+
+    def hgetall(self, key):
+        with self.lock:
+            return dict(self._live(key) or {})
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self.lock:
+            values = dict(mapping or {})
+            if field is not None:
+                values[field] = value
+            hash_ = self._hash(key)
+            added = sum(1 for name in values if name not in hash_)
+            hash_.update({name: str(item) for name, item in values.items()})
+            return added
+
+    def hsetnx(self, key, field, value):
+        with self.lock:
+            hash_ = self._hash(key)
+            if field in hash_:
+                return 0
+            hash_[field] = str(value)
+            return 1
+
+    def hincrby(self, key, field, amount=1):
+        with self.lock:
+            hash_ = self._hash(key)
+            value = int(hash_.get(field, 0)) + amount
+            hash_[field] = str(value)
+            return value
+
+    def hdel(self, key, *fields):
+        with self.lock:
+            hash_ = self._live(key) or {}
+            removed = sum(1 for field in fields if hash_.pop(field, None) is not None)
+            if key in self.data and not hash_:
+                self.delete(key)
+            return removed
+
+    def sadd(self, key, *members):
+        with self.lock:
+            value = self._live(key)
+            if value is None:
+                value = self.data[key] = set()
+            added = sum(1 for member in members if str(member) not in value)
+            value.update(str(member) for member in members)
+            return added
+
+    def spop(self, key, count=None):
+        with self.lock:
+            value = self._live(key) or set()
+            popped = [value.pop() for _ in range(min(len(value), 1 if count is None else count))]
+            if key in self.data and not value:
+                self.delete(key)
+            if count is None:
+                return popped[0] if popped else None
+            return popped
+
+
+class LocalPipeline:
+    # Gom lệnh rồi chạy một lần dưới cùng một lock, như MULTI/EXEC của Redis
+    def __init__(self, kv):
+        self.kv = kv
+        self.commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self.kv, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self.kv.lock:
+            results = [method(*args, **kwargs) for method, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+def connect(url, processes=1):
+    # "" hoặc "local://": LocalKV trong process; "redis://host:6379/0": Redis qua redis-py.
+    # processes: số process phục vụ request; mỗi process có LocalKV riêng nên giỏ hàng sẽ bị chia mảnh
+    if not url or url.startswith('local://'):
+        if processes > 1:
+            raise ImproperlyConfigured(
+                f"CART_STORE_URL must point at Redis when running {processes} worker processes")
+        return LocalKV()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('CART_STORE_URL points at Redis but the redis package is not installed')
+        return redis.Redis.from_url(url, decode_responses=True)
+    raise ImproperlyConfigured(f"Unsupported CART_STORE_URL {url!r}")
@@ -0,0 +1,126 @@
+import json
+import logging
+import statistics
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from cart.models import Cart, CartItem, ProductReplica
+from cart.replica import apply_changes
+from cart.views import CartViewSet
+
+
+def product(product_id):
+    return {'id': product_id, 'name': f'Product {product_id}', 'price': '10.00', 'stock': 5,
+            'image': None, 'category': 1}
+
+
+class FakeProductService(ThreadingHTTPServer):
+    # Giả lập product-service: mỗi request (detail hoặc batch) chờ `latency` giây
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(('127.0.0.1', 0), FakeProductHandler)
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Client bỏ request khi quá timeout: không in traceback BrokenPipe
+        pass
+
+
+class FakeProductHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        if url.path == '/api/products/batch/':
+            ids = [int(value) for value in parse_qs(url.query)['ids'][0].split(',')]
+            body = {'products': [product(product_id) for product_id in ids], 'missing': []}
+        else:
+            body = product(int(url.path.rstrip('/').rsplit('/', 1)[1]))
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Measures GET /api/carts/user/ latency by cart size against a fake product-service'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', default='1,5,10,30,100', help='Comma separated cart sizes')
+        parser.add_argument('--latency-ms', type=float, default=10,
+                            help='Delay of every product-service response')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--timeout', type=float, default=0.2,
+                            help='PRODUCT_SERVICE_TIMEOUT used for the benchmark')
+        parser.add_argument('--replica', action='store_true',
+                            help='Fill the local product replica first, so reads never call product-service')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['items'].split(',')]
+        if options['replica']:
+            apply_changes([
+                {'id': product_id, 'name': f'Product {product_id}', 'price': '10.00', 'in_stock': True,
+                 'image': '', 'version': 1}
+                for product_id in range(1, max(sizes) + 1)
+            ])
+        self.stdout.write(f"product-service latency {options['latency_ms']:g} ms, "
+                          f"timeout {options['timeout']:g} s")
+        self.stdout.write(f"{'items':>6} {'requests':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        for size in sizes:
+            self.run(size, options['latency_ms'] / 1000, options['repeat'], options['timeout'])
+
+        # product-service treo: giỏ hàng vẫn trả về sau khoảng timeout, với snapshot
+        self.stdout.write("product-service slower than the timeout:")
+        logging.getLogger('cart.products').setLevel(logging.ERROR)
+        self.run(sizes[-1], options['timeout'] * 5, 3, options['timeout'])
+        if options['replica']:
+            ProductReplica.objects.filter(product_id__lte=max(sizes), version=1).delete()
+
+    def run(self, size, latency, repeat, timeout):
+        user_id = 900000 + size
+        cart = Cart.objects.create(user_id=user_id)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product_id=product_id, quantity=1, price=Decimal('10.00'),
+                     product_name=f'Product {product_id}')
+            for product_id in range(1, size + 1)
+        ])
+        server = FakeProductService(latency)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        view = CartViewSet.as_view({'get': 'user'})
+        factory = APIRequestFactory()
+        try:
+            with override_settings(PRODUCT_SERVICE_URL=f'http://127.0.0.1:{server.server_port}',
+                                   PRODUCT_SERVICE_TIMEOUT=timeout):
+                samples = []
+                for _ in range(repeat + 1):
+                    started = time.perf_counter()
+                    response = view(factory.get('/api/carts/user/', {'user_id': user_id}))
+                    response.render()
+                    samples.append((time.perf_counter() - started) * 1000)
+                    if len(response.data['items']) != size:
+                        raise CommandError(f"Expected {size} items, got {len(response.data['items'])}")
+            requests_per_get = server.requests / (repeat + 1)
+        finally:
+            server.shutdown()
+            server.server_close()
+            cart.delete()
+
+        samples = sorted(samples[1:])
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        self.stdout.write(f"{size:>6} {requests_per_get:>9.1f} {statistics.median(samples):>9.2f} {p95:>9.2f}")
@@ -0,0 +1,107 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from cart import storage
+from cart.models import Cart, CartItem, ProductReplica
+from cart.replica import apply_changes
+from cart.views import CartItemViewSet, CartViewSet
+
+FIRST_USER_ID = 800000
+
+
+class Command(BaseCommand):
+    help = 'Measures POST /api/cart-items/ (add to cart) operations per second for each cart store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--products', type=int, default=50)
+        parser.add_argument('--bulk-size', type=int, default=20,
+                            help='Items per POST /api/cart-items/bulk/ request')
+        parser.add_argument('--backends', default='database,kv', help='Comma separated: database, kv')
+        parser.add_argument('--kv-url', default='',
+                            help='CART_STORE_URL for the kv backend; empty means in-process LocalKV')
+
+    def handle(self, *args, **options):
+        product_ids = range(1, options['products'] + 1)
+        # Giá lấy từ bản sao sản phẩm: không gọi product-service
+        apply_changes([
+            {'id': product_id, 'name': f'Product {product_id}', 'price': '10.00', 'in_stock': True,
+             'image': '', 'version': 1}
+            for product_id in product_ids
+        ])
+        user_ids = range(FIRST_USER_ID, FIRST_USER_ID + options['users'])
+
+        self.stdout.write(f"{options['ops']} adds over {options['users']} carts and {options['products']} products")
+        self.stdout.write("api: POST /api/cart-items/ through the view; store: cart store add_item() alone; "
+                          f"bulk: items/s through POST /api/cart-items/bulk/ with {options['bulk_size']} items each")
+        self.stdout.write(f"{'backend':<10} {'api ops/s':>10} {'store ops/s':>12} {'bulk items/s':>13} {'flush s':>9}")
+        try:
+            for backend in options['backends'].split(','):
+                if backend not in ('database', 'kv'):
+                    raise CommandError(f"Unknown backend {backend!r}")
+                self.run(backend, options['kv_url'], options['ops'], options['bulk_size'], list(user_ids),
+                         list(product_ids))
+        finally:
+            Cart.objects.filter(user_id__in=user_ids).delete()
+            ProductReplica.objects.filter(product_id__in=product_ids, version=1).delete()
+
+    def run(self, backend, kv_url, ops, bulk_size, user_ids, product_ids):
+        rng = random.Random(7)
+        factory = APIRequestFactory()
+        add = CartItemViewSet.as_view({'post': 'create'})
+        add_bulk = CartItemViewSet.as_view({'post': 'bulk'})
+        get_cart = CartViewSet.as_view({'get': 'user'})
+
+        with override_settings(CART_STORE=backend, CART_STORE_URL=kv_url, CART_STORE_FLUSH_INTERVAL=0):
+            storage._stores.clear()
+            CartItem.objects.filter(cart__user_id__in=user_ids).delete()
+            cart_ids = [get_cart(factory.get('/api/carts/user/', {'user_id': user_id})).data['id']
+                        for user_id in user_ids]
+
+            started = time.perf_counter()
+            for _ in range(ops):
+                request = factory.post('/api/cart-items/', {
+                    'cart': rng.choice(cart_ids), 'product_id': rng.choice(product_ids), 'quantity': 1,
+                }, format='json')
+                response = add(request)
+                if response.status_code not in (200, 201):
+                    raise CommandError(f"Add to cart failed: {response.status_code} {response.data}")
+            api_elapsed = time.perf_counter() - started
+
+            store = storage.get_cart_store()
+            started = time.perf_counter()
+            for _ in range(ops):
+                store.add_item(rng.choice(cart_ids), rng.choice(product_ids), 1)
+            store_elapsed = time.perf_counter() - started
+
+            batches = max(1, ops // bulk_size)
+            started = time.perf_counter()
+            for _ in range(batches):
+                request = factory.post('/api/cart-items/bulk/', {
+                    'cart': rng.choice(cart_ids),
+                    'items': [{'product_id': rng.choice(product_ids), 'quantity': 1} for _ in range(bulk_size)],
+                }, format='json')
+                response = add_bulk(request)
+                if response.status_code != 200:
+                    raise CommandError(f"Bulk add failed: {response.status_code} {response.data}")
+            bulk_elapsed = time.perf_counter() - started
+
+            started = time.perf_counter()
+            store.flush()
+            flushed = time.perf_counter() - started
+            storage._stores.clear()
+
+        stored = sum(CartItem.objects.filter(cart_id__in=cart_ids).values_list('quantity', flat=True))
+        expected = 2 * ops + batches * bulk_size
+        if stored != expected:
+            raise CommandError(f"{backend}: {stored} units in the database after flush, expected {expected}")
+        counted = sum(Cart.objects.filter(pk__in=cart_ids).values_list('item_count', flat=True))
+        if counted != expected:
+            raise CommandError(f"{backend}: carts report {counted} units, expected {expected}")
+        self.stdout.write(f"{backend:<10} {ops / api_elapsed:>10.0f} {ops / store_elapsed:>12.0f} "
+                          f"{batches * bulk_size / bulk_elapsed:>13.0f} {flushed:>9.2f}")
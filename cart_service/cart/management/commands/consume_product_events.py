@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from pika.exceptions import AMQPError
+
+from cart.consumers.product_consumer import prepare_queue, start_consumer
+from cart.replica import bootstrap
+
+
+class Command(BaseCommand):
+    help = 'Keeps the local product replica up to date from product.changed events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bootstrap', action='store_true',
+                            help='Copy every product from product-service before consuming events')
+        parser.add_argument('--retry-interval', type=float, default=5,
+                            help='Seconds to wait before reconnecting to RabbitMQ')
+
+    def handle(self, *args, **options):
+        needs_bootstrap = options['bootstrap']
+        while True:
+            try:
+                if needs_bootstrap:
+                    prepare_queue()
+                    applied, removed = bootstrap()
+                    self.stdout.write(f"Bootstrap: {applied} products written, {removed} marked deleted")
+                    needs_bootstrap = False
+                start_consumer()
+            except KeyboardInterrupt:
+                break
+            except Exception as e:  # noqa: BLE001 - RabbitMQ/product-service chưa sẵn sàng: thử lại
+                kind = 'RabbitMQ' if isinstance(e, AMQPError) else 'Consumer'
+                self.stderr.write(f"{kind} error: {e}; retrying in {options['retry_interval']}s")
+                time.sleep(options['retry_interval'])
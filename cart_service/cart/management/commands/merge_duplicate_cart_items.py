@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from cart.storage import merge_duplicate_items
+
+
+class Command(BaseCommand):
+    help = 'Merges cart items that share a (cart, product_id) pair, summing their quantity; run before migrate'
+
+    def handle(self, *args, **options):
+        removed = merge_duplicate_items()
+        self.stdout.write(self.style.SUCCESS(f"Merged away {removed} duplicate cart items"))
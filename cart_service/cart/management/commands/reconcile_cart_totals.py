@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from cart.storage import reconcile_totals
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Cart.item_count and Cart.total from cart items and repairs carts that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted carts without fixing them')
+
+    def handle(self, *args, **options):
+        checked, drifted = reconcile_totals(options['batch_size'], options['dry_run'])
+        for cart_id, item_count, total, count, amount in drifted:
+            self.stdout.write(f"Cart {cart_id}: item_count {item_count} -> {count}, total {total} -> {amount}")
+        action = 'found' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} carts, {action} {len(drifted)}"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from cart.replica import bootstrap
+
+
+class Command(BaseCommand):
+    help = 'Copies every product from product-service into the local product replica'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        def progress(applied, removed):
+            self.stdout.write(f"{applied} products written, {removed} marked deleted")
+
+        applied, removed = bootstrap(options['page_size'], progress)
+        self.stdout.write(self.style.SUCCESS(f"Done: {applied} products written, {removed} marked deleted"))
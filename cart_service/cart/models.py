@@ -5,6 +5,10 @@ class Cart(models.Model):
     user_id = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Tổng số lượng và tổng tiền, cập nhật cùng transaction với mỗi lần sửa item (storage.py);
+    # lệch thì sửa bằng `manage.py reconcile_cart_totals`
+    item_count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
     def __str__(self):
         return f"Cart #{self.id} for User #{self.user_id}"
@@ -15,6 +19,27 @@ class CartItem(models.Model):
     product_id = models.IntegerField()
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)  # Price at time of adding to cart
+    # Snapshot dùng khi product-service không trả lời kịp (xem products.py)
+    product_name = models.CharField(max_length=200, blank=True, default='')
+    product_image = models.CharField(max_length=500, blank=True, default='')
+
+    class Meta:
+        # Mỗi sản phẩm một dòng trong giỏ: thêm lại là upsert cộng dồn số lượng (storage.py)
+        unique_together = ('cart', 'product_id')
+
+    def __str__(self):
+        return f"{self.quantity} x Product #{self.product_id}"
+
+class ProductReplica(models.Model):
+    # Bản sao gọn của sản phẩm, cập nhật từ event product.changed của product_service (replica.py)
+    product_id = models.IntegerField(primary_key=True)
+    name = models.CharField(max_length=200)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    in_stock = models.BooleanField(default=True)
+    image = models.CharField(max_length=500, blank=True, default='')
+    # updated_at (micro giây) của sản phẩm; sản phẩm đã xoá được giữ lại với deleted=True
+    version = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
 
     def __str__(self):
-        return f"{self.quantity} x Product #{self.product_id}"
\ No newline at end of file
+        return f"Replica of Product #{self.product_id} v{self.version}"
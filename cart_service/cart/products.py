@@ -0,0 +1,94 @@
+import logging
+
+import requests
+from django.conf import settings
+
+from . import replica
+
+logger = logging.getLogger(__name__)
+
+# Số id tối đa trong một request batch (giữ URL của GET ngắn)
+BATCH_SIZE = 200
+
+# Giữ kết nối keep-alive tới product-service giữa các request
+session = requests.Session()
+
+
+class ProductServiceError(Exception):
+    pass
+
+
+def fetch_products(product_ids):
+    # {product_id: product} qua /api/products/batch/; id không tồn tại thì không có trong kết quả.
+    # Raise ProductServiceError khi product-service lỗi hoặc chậm quá PRODUCT_SERVICE_TIMEOUT.
+    ids = list(dict.fromkeys(int(product_id) for product_id in product_ids))
+    products = {}
+    for start in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[start:start + BATCH_SIZE]
+        try:
+            response = session.get(
+                f"{settings.PRODUCT_SERVICE_URL}/api/products/batch/",
+                params={'ids': ','.join(str(product_id) for product_id in chunk)},
+                timeout=settings.PRODUCT_SERVICE_TIMEOUT,
+            )
+            response.raise_for_status()
+            for product in response.json()['products']:
+                products[product['id']] = compact(product)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            raise ProductServiceError(str(e))
+    return products
+
+
+def compact(product):
+    # Cùng các trường với bản sao (replica.as_product)
+    return {
+        'id': product['id'],
+        'name': product['name'],
+        'price': product['price'],
+        'in_stock': product['stock'] > 0,
+        'image': product['image'],
+    }
+
+
+def get_products(product_ids):
+    # Bản sao cục bộ trước, product-service cho các id bản sao chưa có; sản phẩm đã xoá/không tồn tại -> None
+    product_ids = {int(product_id) for product_id in product_ids}
+    products = replica.lookup(product_ids) if settings.PRODUCT_REPLICA_ENABLED else {}
+    missing = product_ids - set(products)
+    if missing:
+        products.update(fetch_products(missing))
+    return {product_id: products.get(product_id) for product_id in product_ids}
+
+
+def get_product(product_id):
+    return get_products([product_id])[int(product_id)]
+
+
+def snapshot(item):
+    # Thông tin lưu trong CartItem lúc thêm vào giỏ
+    return {
+        'id': item.product_id,
+        'name': item.product_name,
+        'price': str(item.price),
+        'in_stock': None,
+        'image': item.product_image or None,
+        'snapshot': True,
+    }
+
+
+def products_for_items(items):
+    # {item.id: product}: đọc bản sao cục bộ; id chưa có trong bản sao (ví dụ trước khi đồng bộ
+    # ban đầu xong) được lấy bằng một request batch cho cả giỏ. Khi product-service lỗi/chậm
+    # hoặc sản phẩm đã bị xoá thì dùng snapshot thay vì None.
+    items = list(items)
+    if not items:
+        return {}
+    product_ids = {item.product_id for item in items}
+    products = replica.lookup(product_ids) if settings.PRODUCT_REPLICA_ENABLED else {}
+    missing = product_ids - set(products)
+    if missing:
+        try:
+            products.update(fetch_products(missing))
+        except ProductServiceError as e:
+            logger.warning(f"Product service unavailable, rendering {len(missing)} cart items from snapshots: {e}")
+    return {item.id: products.get(item.product_id) or snapshot(item) for item in items}
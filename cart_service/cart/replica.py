@@ -0,0 +1,98 @@
+import logging
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ProductReplica
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ['name', 'price', 'in_stock', 'image', 'version', 'deleted']
+BOOTSTRAP_TIMEOUT = 30
+
+
+def apply_changes(products=(), deleted=()):
+    # products/deleted: định dạng của event product.changed (product_service/products/events.py).
+    # Chỉ ghi dòng có version mới hơn bản đang giữ; trả về số dòng được ghi.
+    incoming = {}
+    for row in products:
+        incoming[row['id']] = ProductReplica(
+            product_id=row['id'], name=row['name'], price=Decimal(row['price']), in_stock=row['in_stock'],
+            image=row['image'] or '', version=row['version'],
+        )
+    for row in deleted:
+        if row['id'] not in incoming or incoming[row['id']].version < row['version']:
+            incoming[row['id']] = ProductReplica(product_id=row['id'], name='', price=Decimal(0),
+                                                 version=row['version'], deleted=True)
+    if not incoming:
+        return 0
+
+    with transaction.atomic():
+        current = dict(
+            ProductReplica.objects.select_for_update()
+            .filter(product_id__in=list(incoming)).values_list('product_id', 'version')
+        )
+        newer = [replica for replica in incoming.values() if replica.version > current.get(replica.product_id, -1)]
+        ProductReplica.objects.bulk_create(newer, update_conflicts=True, unique_fields=['product_id'],
+                                           update_fields=FIELDS)
+    return len(newer)
+
+
+def apply_event(message):
+    return apply_changes(message.get('products', []), message.get('deleted', []))
+
+
+def as_product(replica):
+    return {
+        'id': replica.product_id,
+        'name': replica.name,
+        'price': str(replica.price),
+        'in_stock': replica.in_stock,
+        'image': replica.image or None,
+    }
+
+
+def lookup(product_ids):
+    # {product_id: product} cho các id có trong bản sao; sản phẩm đã bị xoá -> None
+    return {
+        replica.product_id: None if replica.deleted else as_product(replica)
+        for replica in ProductReplica.objects.filter(product_id__in=list(product_ids))
+    }
+
+
+def bootstrap(page_size=1000, progress=None):
+    # Đồng bộ toàn bộ qua /api/products/replica/ theo id tăng dần. Dòng trong bản sao nằm
+    # trong khoảng id của một trang nhưng không có trong trang đó là sản phẩm đã bị xoá
+    # (id chỉ tăng nên sản phẩm mới không thể rơi vào khoảng đã đọc). Trang cuối không có
+    # cận trên: mọi dòng có id lớn hơn id cuối cùng đã đọc cũng là sản phẩm đã bị xoá.
+    # Chỉ đánh dấu xoá dòng có version cũ hơn lúc bắt đầu: dòng mới hơn do event ghi trong lúc
+    # bootstrap đang chạy (ví dụ sản phẩm tạo sau khi trang cuối đã được đọc).
+    # version là updated_at tính bằng micro giây, như version_of() của product_service
+    started = int(timezone.now().timestamp() * 1000000)
+    after_id = 0
+    applied = removed = 0
+    while True:
+        response = requests.get(
+            f"{settings.PRODUCT_SERVICE_URL}/api/products/replica/",
+            params={'after_id': after_id, 'limit': page_size},
+            timeout=BOOTSTRAP_TIMEOUT,
+        )
+        response.raise_for_status()
+        page = response.json()
+        rows = page['products']
+        last_page = page['next_after_id'] is None
+        applied += apply_changes(rows)
+        missing = ProductReplica.objects.filter(product_id__gt=after_id, deleted=False, version__lt=started)
+        if not last_page:
+            missing = missing.filter(product_id__lte=rows[-1]['id'])
+        removed += missing.exclude(product_id__in=[row['id'] for row in rows]).update(deleted=True)
+        if progress:
+            progress(applied, removed)
+        if last_page:
+            break
+        after_id = page['next_after_id']
+    logger.info(f"Product replica bootstrap: {applied} rows written, {removed} marked deleted")
+    return applied, removed
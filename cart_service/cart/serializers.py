@@ -1,7 +1,15 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
-import requests
-from django.conf import settings
+from .products import products_for_items
+
+
+class CartItemListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Lấy sản phẩm của mọi item bằng một request batch, không phải một request mỗi item
+        items = list(data.all() if hasattr(data, 'all') else data)
+        products = self.context.setdefault('products', {})
+        products.update(products_for_items(item for item in items if item.id not in products))
+        return super().to_representation(items)
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -9,43 +17,57 @@ class CartItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CartItem
-        fields = ['id', 'product_id', 'quantity', 'price', 'product', 'cart']
-        read_only_fields = ['price']
+        fields = ['id', 'product_id', 'quantity', 'price', 'product_name', 'product_image', 'product', 'cart']
+        read_only_fields = ['price', 'product_name', 'product_image']
+        list_serializer_class = CartItemListSerializer
 
     def get_product(self, obj):
-        # Fetch product details from Product Service
-        try:
-            response = requests.get(f"{settings.PRODUCT_SERVICE_URL}/api/products/{obj.product_id}/")
-            if response.status_code == 200:
-                return response.json()
-            return None
-        except Exception as e:
-            # Log the error
-            print(f"Error fetching product: {e}")
-            return None
-
-    def create(self, validated_data):
-        # Get current price from Product Service
-        try:
-            response = requests.get(f"{settings.PRODUCT_SERVICE_URL}/api/products/{validated_data['product_id']}/")
-            if response.status_code == 200:
-                product_data = response.json()
-                validated_data['price'] = product_data['price']
-            else:
-                raise serializers.ValidationError("Product not found or unavailable")
-        except Exception as e:
-            raise serializers.ValidationError(f"Error fetching product: {e}")
-
-        return super().create(validated_data)
+        products = self.context.get('products', {})
+        if obj.id not in products:
+            products = products_for_items([obj])
+        return products[obj.id]
+
+
+class AddCartItemSerializer(serializers.Serializer):
+    # POST /cart-items/; giá và thông tin sản phẩm do cart store điền (storage.py)
+    cart = serializers.IntegerField()
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class BulkCartItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class BulkAddCartItemsSerializer(serializers.Serializer):
+    # POST /cart-items/bulk/: {"cart": 1, "items": [{"product_id": 2, "quantity": 3}, ...]}
+    MAX_ITEMS = 100
+
+    cart = serializers.IntegerField()
+    items = BulkCartItemSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+
+
+class CartItemQuantitySerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=0)
 
 
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
-    total = serializers.SerializerMethodField()
+    # Cột của Cart, cập nhật khi item thay đổi (storage.py): đọc giỏ không phải cộng lại item
+    total = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False, read_only=True)
 
     class Meta:
         model = Cart
-        fields = ['id', 'user_id', 'created_at', 'updated_at', 'items', 'total']
+        fields = ['id', 'user_id', 'created_at', 'updated_at', 'items', 'item_count', 'total']
+        read_only_fields = ['item_count']
+
 
-    def get_total(self, obj):
-        return sum(item.price * item.quantity for item in obj.items.all())
\ No newline at end of file
+class CartSummarySerializer(serializers.ModelSerializer):
+    # Danh sách giỏ: chỉ tổng, không tải item
+    total = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False, read_only=True)
+
+    class Meta:
+        model = Cart
+        fields = ['id', 'user_id', 'created_at', 'updated_at', 'item_count', 'total']
+        read_only_fields = ['item_count']
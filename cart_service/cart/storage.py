@@ -0,0 +1,496 @@
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Max, Sum, prefetch_related_objects
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import kv as kv_backends
+from .models import Cart, CartItem
+from .products import ProductServiceError, get_products
+
+logger = logging.getLogger(__name__)
+
+
+class ProductUnavailable(Exception):
+    pass
+
+
+def product_snapshots(product_ids):
+    # {product_id: giá và snapshot cho item mới} (bản sao sản phẩm, hoặc product-service nếu chưa có);
+    # raise ProductUnavailable nếu có sản phẩm không tồn tại, trước khi ghi bất cứ gì
+    try:
+        products = get_products(product_ids)
+    except ProductServiceError as e:
+        raise ProductUnavailable(f"Error fetching product: {e}")
+    missing = sorted(product_id for product_id, product in products.items() if product is None)
+    if missing:
+        raise ProductUnavailable(f"Product not found or unavailable: {', '.join(map(str, missing))}")
+    return {
+        product_id: {'price': product['price'], 'product_name': product['name'],
+                     'product_image': product['image'] or ''}
+        for product_id, product in products.items()
+    }
+
+
+def normalize_items(items):
+    # [(product_id, quantity)] -> {product_id: tổng số lượng} theo product_id tăng dần:
+    # các upsert đồng thời khóa dòng theo cùng thứ tự nên không deadlock
+    quantities = {}
+    for product_id, quantity in items:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return OrderedDict(sorted(quantities.items()))
+
+
+def cart_totals(items):
+    # item_count/total của Cart tính từ các item đã có trong bộ nhớ
+    return {'item_count': sum(item.quantity for item in items),
+            'total': sum((item.price * item.quantity for item in items), Decimal('0.00'))}
+
+
+def reconcile_totals(batch_size=500, dry_run=False):
+    # Tính lại item_count/total của mọi giỏ từ CartItem, sửa những giỏ bị lệch.
+    # Khóa từng lô giỏ như DatabaseCartStore nên chạy được khi hệ thống đang nhận request.
+    # Trả về (số giỏ đã kiểm tra, [(cart_id, item_count, total, item_count đúng, total đúng)])
+    checked = 0
+    drifted = []
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            carts = list(Cart.objects.select_for_update().filter(pk__gt=last_id).order_by('pk')
+                         .values_list('id', 'item_count', 'total')[:batch_size])
+            if not carts:
+                break
+            last_id = carts[-1][0]
+            actual = {
+                row['cart_id']: (row['count'], row['amount'])
+                for row in CartItem.objects.filter(cart_id__in=[cart[0] for cart in carts])
+                .values('cart_id')
+                .annotate(count=Sum('quantity'),
+                          amount=Sum(F('price') * F('quantity'),
+                                     output_field=DecimalField(max_digits=12, decimal_places=2)))
+            }
+            for cart_id, item_count, total in carts:
+                count, amount = actual.get(cart_id, (0, Decimal('0.00')))
+                if (item_count, total) != (count, amount):
+                    drifted.append((cart_id, item_count, total, count, amount))
+                    if not dry_run:
+                        Cart.objects.filter(pk=cart_id).update(item_count=count, total=amount)
+            checked += len(carts)
+    return checked, drifted
+
+
+def merge_duplicate_items():
+    # Gộp các dòng trùng (cart, product_id) có từ trước unique_together thành dòng cũ nhất với tổng số lượng.
+    # Chạy trước `migrate` (start-system.sh) nên chỉ dùng SQL thô trên các cột có từ đầu;
+    # trả về số dòng đã xóa
+    table = CartItem._meta.db_table
+    if table not in connection.introspection.table_names():
+        return 0
+    removed = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT cart_id, product_id, MIN(id), SUM(quantity) FROM {table} "
+            f"GROUP BY cart_id, product_id HAVING COUNT(*) > 1"
+        )
+        for cart_id, product_id, keep_id, quantity in cursor.fetchall():
+            cursor.execute(f"UPDATE {table} SET quantity = %s WHERE id = %s", [quantity, keep_id])
+            cursor.execute(f"DELETE FROM {table} WHERE cart_id = %s AND product_id = %s AND id <> %s",
+                           [cart_id, product_id, keep_id])
+            removed += cursor.rowcount
+    return removed
+
+
+def with_items(cart, items):
+    # Gắn sẵn danh sách item như prefetch_related: serializer đọc cart.items.all() không cần truy vấn
+    queryset = cart.items.all()
+    queryset._result_cache = items
+    queryset._prefetch_done = True
+    cart._prefetched_objects_cache = {'items': queryset}
+    return cart
+
+
+class DatabaseCartStore:
+    # Đọc/ghi thẳng bảng Cart/CartItem. Thêm vào giỏ là một câu lệnh dựa trên unique
+    # (cart, product_id): hai request đồng thời không mất số lượng, không tạo dòng trùng.
+    # Mỗi lần ghi khóa dòng Cart trước rồi mới sửa item và cộng dồn item_count/total
+    # trong cùng transaction: cùng một thứ tự khóa nên không deadlock, tổng không lệch.
+    ITEM_COLUMNS = ['id', 'cart_id', 'product_id', 'quantity', 'price', 'product_name', 'product_image']
+
+    def get_cart(self, user_id):
+        cart, _ = Cart.objects.get_or_create(user_id=user_id)
+        prefetch_related_objects([cart], 'items')
+        return cart
+
+    def lock_cart(self, cart_id):
+        # SELECT ... FOR UPDATE; raise Cart.DoesNotExist nếu không có giỏ
+        Cart.objects.select_for_update().values_list('id', flat=True).get(pk=cart_id)
+
+    def adjust_totals(self, cart_id, count, amount):
+        Cart.objects.filter(pk=cart_id).update(
+            item_count=F('item_count') + count, total=F('total') + amount, updated_at=timezone.now(),
+        )
+
+    def sql_names(self):
+        quote = connection.ops.quote_name
+        return quote(CartItem._meta.db_table), {column: quote(column) for column in self.ITEM_COLUMNS}
+
+    def fetch_items(self, sql, params):
+        # RETURNING (Postgres, SQLite >= 3.35) -> CartItem không cần đọc lại
+        price = CartItem._meta.get_field('price')
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        items = []
+        for row in rows:
+            values = dict(zip(self.ITEM_COLUMNS, row))
+            values['price'] = price.to_python(values['price'])
+            items.append(CartItem(**values))
+        return items
+
+    def increment(self, cart_id, product_id, quantity):
+        # UPDATE ... SET quantity = quantity + n RETURNING ...; None nếu giỏ chưa có sản phẩm này
+        table, c = self.sql_names()
+        items = self.fetch_items(
+            f"UPDATE {table} SET {c['quantity']} = {c['quantity']} + %s "
+            f"WHERE {c['cart_id']} = %s AND {c['product_id']} = %s "
+            f"RETURNING {', '.join(c.values())}",
+            [quantity, cart_id, product_id],
+        )
+        return items[0] if items else None
+
+    def upsert(self, cart_id, quantities, snapshots):
+        # INSERT ... ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = quantity + excluded.quantity
+        table, c = self.sql_names()
+        price = CartItem._meta.get_field('price')
+        columns = ['cart_id', 'product_id', 'quantity', 'price', 'product_name', 'product_image']
+        params = []
+        for product_id, quantity in quantities.items():
+            snapshot = snapshots[product_id]
+            params += [cart_id, product_id, quantity,
+                       price.get_db_prep_save(Decimal(snapshot['price']), connection),
+                       snapshot['product_name'], snapshot['product_image']]
+        values = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(quantities))
+        return self.fetch_items(
+            f"INSERT INTO {table} ({', '.join(c[column] for column in columns)}) VALUES {values} "
+            f"ON CONFLICT ({c['cart_id']}, {c['product_id']}) "
+            f"DO UPDATE SET {c['quantity']} = {table}.{c['quantity']} + EXCLUDED.{c['quantity']} "
+            f"RETURNING {', '.join(c.values())}",
+            params,
+        )
+
+    def add_item(self, cart_id, product_id, quantity):
+        # Trả về (item, created). Sản phẩm đã có trong giỏ: một câu UPDATE, không cần giá;
+        # chưa có: lấy snapshot (ngoài transaction, có thể gọi product-service) rồi upsert
+        # (request khác có thể vừa thêm cùng sản phẩm)
+        with transaction.atomic():
+            self.lock_cart(cart_id)
+            item = self.increment(cart_id, product_id, quantity)
+            if item is not None:
+                self.adjust_totals(cart_id, quantity, item.price * quantity)
+                return item, False
+        snapshots = product_snapshots([product_id])
+        with transaction.atomic():
+            self.lock_cart(cart_id)
+            item = self.upsert(cart_id, {product_id: quantity}, snapshots)[0]
+            self.adjust_totals(cart_id, quantity, item.price * quantity)
+        # Dòng có sẵn khi upsert chỉ có thể do một lần thêm khác (số lượng >= 1) tạo ra
+        return item, item.quantity == quantity
+
+    def add_items(self, cart_id, items):
+        # Thêm nhiều sản phẩm trong một câu lệnh; hoặc tất cả, hoặc không gì cả
+        quantities = normalize_items(items)
+        if not Cart.objects.filter(pk=cart_id).exists():
+            raise Cart.DoesNotExist(f"Cart {cart_id} does not exist")
+        snapshots = product_snapshots(quantities)
+        with transaction.atomic():
+            self.lock_cart(cart_id)
+            added = self.upsert(cart_id, quantities, snapshots)
+            self.adjust_totals(cart_id, sum(quantities.values()),
+                               sum(item.price * quantities[item.product_id] for item in added))
+        return sorted(added, key=lambda item: item.product_id)
+
+    def locked_item(self, item_id):
+        cart_id = CartItem.objects.values_list('cart_id', flat=True).get(pk=item_id)
+        self.lock_cart(cart_id)
+        # Đọc lại sau khi khóa giỏ: item có thể vừa bị sửa/xoá
+        return CartItem.objects.get(pk=item_id)
+
+    def set_quantity(self, item_id, quantity):
+        with transaction.atomic():
+            item = self.locked_item(item_id)
+            change = quantity - item.quantity
+            item.quantity = quantity
+            item.save(update_fields=['quantity'])
+            self.adjust_totals(item.cart_id, change, item.price * change)
+        return item
+
+    def remove_item(self, item_id):
+        with transaction.atomic():
+            item = self.locked_item(item_id)
+            item.delete()
+            self.adjust_totals(item.cart_id, -item.quantity, -item.price * item.quantity)
+
+    def clear(self, cart_id):
+        with transaction.atomic():
+            self.lock_cart(cart_id)
+            CartItem.objects.filter(cart_id=cart_id).delete()
+            Cart.objects.filter(pk=cart_id).update(item_count=0, total=0, updated_at=timezone.now())
+
+    def flush(self):
+        return 0
+
+
+class KeyValueCartStore:
+    # Giỏ hàng trong key-value store (Redis hoặc LocalKV), mỗi giỏ là một hash hết hạn sau
+    # CART_STORE_TTL giây không dùng:
+    #   cart:<cart_id>       user_id, created_at, updated_at, q:<product_id> -> số lượng,
+    #                        i:<product_id> -> JSON {id, price, product_name, product_image}
+    #   cart:user:<user_id>  -> cart_id
+    #   cart:item:<item_id>  -> "<cart_id>:<product_id>" (PATCH/DELETE /cart-items/<id>/)
+    # Ghi sau (write-behind): giỏ bị sửa được đánh dấu trong cart:dirty và flush() chép vào
+    # Cart/CartItem, kể cả item_count/total (khi đọc thì tính từ hash). Hash hết hạn hoặc
+    # bị xoá thì được nạp lại từ database khi dùng tới, nên TTL phải dài hơn nhiều so với chu
+    # kỳ flush. Item id lấy từ bộ đếm cart:item_seq, khởi tạo bằng id lớn nhất trong database;
+    # khi quay lại DatabaseCartStore trên Postgres cần chạy `manage.py sqlsequencereset cart`.
+    DIRTY = 'cart:dirty'
+    SEQUENCE = 'cart:item_seq'
+
+    def __init__(self, kv, ttl, flush_interval=0):
+        self.kv = kv
+        self.ttl = ttl
+        self.sequence_ready = False
+        if flush_interval > 0:
+            threading.Thread(target=self.flush_forever, args=(flush_interval,), daemon=True,
+                             name='cart-store-flusher').start()
+            atexit.register(self.flush)
+
+    def cart_key(self, cart_id):
+        return f'cart:{cart_id}'
+
+    def item_key(self, item_id):
+        return f'cart:item:{item_id}'
+
+    def user_key(self, user_id):
+        return f'cart:user:{user_id}'
+
+    def load(self, cart_id):
+        # hsetnx: không ghi đè thay đổi của request khác đã vào hash trong lúc nạp
+        cart = Cart.objects.get(pk=cart_id)
+        key = self.cart_key(cart_id)
+        pipe = self.kv.pipeline()
+        for item in cart.items.all():
+            pipe.hsetnx(key, f'q:{item.product_id}', item.quantity)
+            pipe.hsetnx(key, f'i:{item.product_id}', json.dumps({
+                'id': item.id, 'price': str(item.price),
+                'product_name': item.product_name, 'product_image': item.product_image,
+            }))
+            pipe.set(self.item_key(item.id), f'{cart_id}:{item.product_id}', ex=self.ttl)
+        pipe.hsetnx(key, 'created_at', cart.created_at.isoformat())
+        pipe.hsetnx(key, 'updated_at', cart.updated_at.isoformat())
+        pipe.hsetnx(key, 'user_id', cart.user_id)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def ensure_loaded(self, cart_id):
+        if self.kv.hget(self.cart_key(cart_id), 'user_id') is None:
+            self.load(cart_id)
+
+    def next_item_id(self):
+        if not self.sequence_ready:
+            start = CartItem.objects.aggregate(last=Max('id'))['last'] or 0
+            self.kv.set(self.SEQUENCE, start, nx=True)
+            self.sequence_ready = True
+        return self.kv.incr(self.SEQUENCE)
+
+    def make_item(self, cart_id, product_id, quantity, meta):
+        meta = json.loads(meta)
+        return CartItem(id=meta['id'], cart_id=cart_id, product_id=product_id, quantity=int(quantity),
+                        price=Decimal(meta['price']), product_name=meta['product_name'],
+                        product_image=meta['product_image'])
+
+    def items_from(self, cart_id, data):
+        # Bỏ qua số lượng không còn thông tin item (item vừa bị xoá, xem add_item)
+        return [
+            self.make_item(cart_id, int(field[2:]), data[field], data[f'i:{field[2:]}'])
+            for field in data if field.startswith('q:') and f'i:{field[2:]}' in data
+        ]
+
+    def touch(self, pipe, cart_id):
+        # Sau mỗi lần ghi: gia hạn TTL và đánh dấu cần flush
+        key = self.cart_key(cart_id)
+        pipe.hset(key, 'updated_at', timezone.now().isoformat())
+        pipe.expire(key, self.ttl)
+        pipe.sadd(self.DIRTY, cart_id)
+
+    def get_cart(self, user_id):
+        cart_id = self.kv.get(self.user_key(user_id))
+        if cart_id is None:
+            cart_id = Cart.objects.get_or_create(user_id=user_id)[0].id
+        key = self.cart_key(cart_id)
+        data = self.kv.hgetall(key)
+        if 'user_id' not in data:
+            try:
+                self.load(cart_id)
+            except Cart.DoesNotExist:
+                self.kv.delete(self.user_key(user_id))
+                return self.get_cart(user_id)
+            data = self.kv.hgetall(key)
+
+        pipe = self.kv.pipeline()
+        pipe.set(self.user_key(user_id), cart_id, ex=self.ttl)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+        items = sorted(self.items_from(int(cart_id), data), key=lambda item: item.id)
+        cart = Cart(id=int(cart_id), user_id=int(data['user_id']), created_at=parse_datetime(data['created_at']),
+                    updated_at=parse_datetime(data['updated_at']), **cart_totals(items))
+        return with_items(cart, items)
+
+    def add_item(self, cart_id, product_id, quantity, snapshot=None):
+        key = self.cart_key(cart_id)
+        self.ensure_loaded(cart_id)
+        created = False
+        while True:
+            if self.kv.hget(key, f'i:{product_id}') is None:
+                item_id = self.next_item_id()
+                snapshot = snapshot or product_snapshots([product_id])[product_id]
+                meta = dict(snapshot, id=item_id)
+                if self.kv.hsetnx(key, f'i:{product_id}', json.dumps(meta)):
+                    created = True
+                    self.kv.set(self.item_key(item_id), f'{cart_id}:{product_id}', ex=self.ttl)
+
+            # HINCRBY: hai request thêm cùng sản phẩm không ghi đè lên nhau
+            pipe = self.kv.pipeline()
+            pipe.hincrby(key, f'q:{product_id}', quantity)
+            pipe.hget(key, f'i:{product_id}')
+            self.touch(pipe, cart_id)
+            new_quantity, meta = pipe.execute()[:2]
+            if meta is not None:
+                return self.make_item(cart_id, product_id, new_quantity, meta), created
+            # Item vừa bị xoá bởi request khác giữa hai bước: bỏ số lượng mồ côi và thêm lại
+            self.kv.hdel(key, f'q:{product_id}')
+            quantity = new_quantity
+
+    def add_items(self, cart_id, items):
+        # Kiểm tra giỏ và mọi sản phẩm trước khi ghi; mỗi item là một add_item (HINCRBY)
+        quantities = normalize_items(items)
+        self.ensure_loaded(cart_id)
+        snapshots = product_snapshots(quantities)
+        return [self.add_item(cart_id, product_id, quantity, snapshots[product_id])[0]
+                for product_id, quantity in quantities.items()]
+
+    def locate(self, item_id):
+        # (cart_id, product_id) của item; index hết hạn thì tìm trong database (đã flush)
+        location = self.kv.get(self.item_key(item_id))
+        if location is not None:
+            cart_id, product_id = location.split(':')
+            return int(cart_id), int(product_id)
+        item = CartItem.objects.filter(pk=item_id).values_list('cart_id', 'product_id').first()
+        if item is None:
+            raise CartItem.DoesNotExist(f"Cart item {item_id} does not exist")
+        return item
+
+    def current_meta(self, item_id):
+        cart_id, product_id = self.locate(item_id)
+        self.ensure_loaded(cart_id)
+        meta = self.kv.hget(self.cart_key(cart_id), f'i:{product_id}')
+        if meta is None or json.loads(meta)['id'] != int(item_id):
+            raise CartItem.DoesNotExist(f"Cart item {item_id} does not exist")
+        return cart_id, product_id, meta
+
+    def set_quantity(self, item_id, quantity):
+        cart_id, product_id, meta = self.current_meta(item_id)
+        pipe = self.kv.pipeline()
+        pipe.hset(self.cart_key(cart_id), f'q:{product_id}', quantity)
+        self.touch(pipe, cart_id)
+        pipe.execute()
+        return self.make_item(cart_id, product_id, quantity, meta)
+
+    def remove_item(self, item_id):
+        cart_id, product_id, _ = self.current_meta(item_id)
+        pipe = self.kv.pipeline()
+        pipe.hdel(self.cart_key(cart_id), f'q:{product_id}', f'i:{product_id}')
+        pipe.delete(self.item_key(item_id))
+        self.touch(pipe, cart_id)
+        pipe.execute()
+
+    def clear(self, cart_id):
+        self.ensure_loaded(cart_id)
+        key = self.cart_key(cart_id)
+        fields = [field for field in self.kv.hgetall(key) if field.startswith(('q:', 'i:'))]
+        pipe = self.kv.pipeline()
+        if fields:
+            pipe.hdel(key, *fields)
+        self.touch(pipe, cart_id)
+        pipe.execute()
+
+    def persist(self, cart_id):
+        data = self.kv.hgetall(self.cart_key(cart_id))
+        if 'user_id' not in data:
+            logger.warning(f"Cart {cart_id} expired from the cart store before it was flushed")
+            return
+        items = self.items_from(cart_id, data)
+        with transaction.atomic():
+            if not Cart.objects.filter(pk=cart_id).update(updated_at=parse_datetime(data['updated_at']),
+                                                          **cart_totals(items)):
+                return
+            CartItem.objects.filter(cart_id=cart_id).exclude(id__in=[item.id for item in items]).delete()
+            CartItem.objects.bulk_create(items, update_conflicts=True, unique_fields=['id'],
+                                         update_fields=['quantity', 'price', 'product_name', 'product_image'])
+
+    def flush(self, batch_size=100):
+        # Chép các giỏ đã thay đổi vào database; trả về số giỏ đã ghi
+        flushed = 0
+        failed = []
+        while True:
+            cart_ids = self.kv.spop(self.DIRTY, batch_size)
+            if not cart_ids:
+                break
+            for cart_id in cart_ids:
+                try:
+                    self.persist(int(cart_id))
+                    flushed += 1
+                except Exception as e:
+                    logger.error(f"Failed to flush cart {cart_id}: {e}")
+                    failed.append(cart_id)
+        if failed:
+            self.kv.sadd(self.DIRTY, *failed)
+        return flushed
+
+    def flush_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Cart store flush failed: {e}")
+            finally:
+                connection.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_cart_store():
+    # Một store cho mỗi cấu hình (CART_STORE, CART_STORE_URL) trong process
+    key = (settings.CART_STORE, settings.CART_STORE_URL)
+    with _stores_lock:
+        if key not in _stores:
+            if settings.CART_STORE == 'database':
+                _stores[key] = DatabaseCartStore()
+            elif settings.CART_STORE == 'kv':
+                kv = kv_backends.connect(settings.CART_STORE_URL, settings.WEB_CONCURRENCY)
+                _stores[key] = KeyValueCartStore(kv, settings.CART_STORE_TTL, settings.CART_STORE_FLUSH_INTERVAL)
+            else:
+                raise ImproperlyConfigured(f"Unknown CART_STORE {settings.CART_STORE!r}; use database or kv")
+        return _stores[key]
@@ -1,3 +1,398 @@
-from django.test import TestCase
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from .consumers.product_consumer import product_callback
+from .models import Cart, CartItem, ProductReplica
+from . import storage
+from .replica import apply_event, bootstrap
+
+
+def batch_response(products):
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {'products': products, 'missing': []}
+    return response
+
+
+def replica_row(product_id, version, price='10.00', in_stock=True):
+    return {'id': product_id, 'name': f'Product {product_id}', 'price': price, 'in_stock': in_stock,
+            'image': f'/media/products/{product_id}.jpg', 'version': version}
+
+
+def product(product_id, price='10.00'):
+    return {'id': product_id, 'name': f'Product {product_id}', 'price': price, 'stock': 5,
+            'image': None, 'category': 1}
+
+
+class CartProductEnrichmentTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.cart = Cart.objects.create(user_id=7, item_count=6, total=Decimal('60.00'))
+        for product_id in (1, 2, 3):
+            CartItem.objects.create(cart=self.cart, product_id=product_id, quantity=2, price=Decimal('10.00'),
+                                    product_name=f'Saved {product_id}')
+
+    @mock.patch('cart.products.session.get')
+    def test_cart_fetches_products_missing_from_replica_in_one_batch(self, get):
+        get.return_value = batch_response([product(1), product(2), product(3, price='12.00')])
+        # cart, items và bản sao sản phẩm; total là cột của Cart
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/carts/user/', {'user_id': 7})
+
+        self.assertEqual(response.status_code, 200)
+        get.assert_called_once()
+        self.assertTrue(get.call_args.args[0].endswith('/api/products/batch/'))
+        self.assertEqual(get.call_args.kwargs['params'], {'ids': '1,2,3'})
+        self.assertIsNotNone(get.call_args.kwargs['timeout'])
+        self.assertEqual([item['product']['price'] for item in response.data['items']], ['10.00', '10.00', '12.00'])
+        self.assertEqual(response.data['total'], Decimal('60.00'))
+
+    @mock.patch('cart.products.session.get', side_effect=requests.Timeout('read timed out'))
+    def test_slow_product_service_falls_back_to_snapshot(self, get):
+        response = self.client.get('/api/carts/user/', {'user_id': 7})
+
+        self.assertEqual(response.status_code, 200)
+        get.assert_called_once()
+        first = response.data['items'][0]['product']
+        self.assertEqual((first['name'], first['price'], first['snapshot']), ('Saved 1', '10.00', True))
+
+    @mock.patch('cart.products.session.get')
+    def test_deleted_product_falls_back_to_snapshot(self, get):
+        get.return_value = batch_response([product(1), product(2)])
+        response = self.client.get('/api/carts/user/', {'user_id': 7})
+        self.assertEqual(response.data['items'][2]['product']['name'], 'Saved 3')
+
+    @mock.patch('cart.products.session.get')
+    def test_add_item_stores_product_snapshot(self, get):
+        get.return_value = batch_response([product(9, price='4.50')])
+        response = self.client.post('/api/cart-items/', {'cart': self.cart.id, 'product_id': 9, 'quantity': 1},
+                                    format='json')
+
+        self.assertEqual(response.status_code, 201)
+        item = CartItem.objects.get(cart=self.cart, product_id=9)
+        self.assertEqual((item.price, item.product_name), (Decimal('4.50'), 'Product 9'))
+
+    @mock.patch('cart.products.session.get', side_effect=requests.ConnectionError('refused'))
+    def test_add_item_fails_without_product_service(self, get):
+        response = self.client.post('/api/cart-items/', {'cart': self.cart.id, 'product_id': 9, 'quantity': 1},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.filter(product_id=9).exists())
+
+
+class ProductReplicaTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.cart = Cart.objects.create(user_id=8)
+
+    def test_older_events_are_ignored(self):
+        self.assertEqual(apply_event({'products': [replica_row(1, version=20, price='15.00')]}), 1)
+        self.assertEqual(apply_event({'products': [replica_row(1, version=10, price='9.00')]}), 0)
+        self.assertEqual(ProductReplica.objects.get(product_id=1).price, Decimal('15.00'))
+
+        apply_event({'products': [], 'deleted': [{'id': 1, 'version': 30}]})
+        apply_event({'products': [replica_row(1, version=25)]})
+        self.assertTrue(ProductReplica.objects.get(product_id=1).deleted)
+
+    @mock.patch('cart.products.session.get')
+    def test_cart_reads_make_no_product_service_calls(self, get):
+        apply_event({'products': [replica_row(1, version=1, price='3.00'), replica_row(2, version=1, in_stock=False)],
+                     'deleted': [{'id': 3, 'version': 2}]})
+        for product_id in (1, 2, 3):
+            CartItem.objects.create(cart=self.cart, product_id=product_id, quantity=1, price=Decimal('5.00'),
+                                    product_name=f'Saved {product_id}')
+
+        items = self.client.get('/api/carts/user/', {'user_id': 8}).data['items']
+
+        get.assert_not_called()
+        self.assertEqual(items[0]['product']['price'], '3.00')
+        self.assertFalse(items[1]['product']['in_stock'])
+        self.assertEqual((items[2]['product']['name'], items[2]['product']['snapshot']), ('Saved 3', True))
+
+    @mock.patch('cart.products.session.get')
+    def test_add_item_prices_from_replica(self, get):
+        apply_event({'products': [replica_row(4, version=1, price='7.25')]})
+        response = self.client.post('/api/cart-items/', {'cart': self.cart.id, 'product_id': 4, 'quantity': 2},
+                                    format='json')
+
+        self.assertEqual(response.status_code, 201)
+        get.assert_not_called()
+        self.assertEqual(CartItem.objects.get(product_id=4).price, Decimal('7.25'))
+
+    @mock.patch('cart.replica.requests.get')
+    def test_bootstrap_pages_and_marks_missing_products_deleted(self, get):
+        apply_event({'products': [replica_row(2, version=1), replica_row(9, version=1)]})
+        pages = [
+            {'products': [replica_row(1, version=5), replica_row(3, version=5)], 'next_after_id': 3},
+            {'products': [replica_row(4, version=5)], 'next_after_id': None},
+        ]
+        get.side_effect = [mock.Mock(**{'json.return_value': page}) for page in pages]
+
+        self.assertEqual(bootstrap(page_size=2), (3, 2))
+        self.assertEqual(get.call_args_list[1].kwargs['params'], {'after_id': 3, 'limit': 2})
+        self.assertTrue(ProductReplica.objects.get(product_id=2).deleted)
+        # id 9 lớn hơn id cuối cùng của trang cuối: sản phẩm đã bị xoá
+        self.assertTrue(ProductReplica.objects.get(product_id=9).deleted)
+
+    @mock.patch('cart.replica.requests.get')
+    def test_bootstrap_empty_last_page_marks_rows_after_cursor_deleted(self, get):
+        apply_event({'products': [replica_row(3, version=1), replica_row(7, version=1)]})
+        pages = [
+            {'products': [replica_row(1, version=5), replica_row(3, version=5)], 'next_after_id': 3},
+            {'products': [], 'next_after_id': None},
+        ]
+        get.side_effect = [mock.Mock(**{'json.return_value': page}) for page in pages]
+
+        self.assertEqual(bootstrap(page_size=2), (2, 1))
+        self.assertFalse(ProductReplica.objects.get(product_id=3).deleted)
+        self.assertTrue(ProductReplica.objects.get(product_id=7).deleted)
+
+    @mock.patch('cart.replica.requests.get')
+    def test_bootstrap_keeps_rows_written_by_events_while_it_runs(self, get):
+        apply_event({'products': [replica_row(8, version=1)]})
+
+        def last_page(*args, **kwargs):
+            # Sản phẩm 10 được tạo sau khi product-service trả trang cuối, event đến trước khi bootstrap dọn
+            apply_event({'products': [replica_row(10, version=int(time.time() * 1000000))]})
+            return mock.Mock(**{'json.return_value': {'products': [replica_row(1, version=5)], 'next_after_id': None}})
+        get.side_effect = last_page
+
+        self.assertEqual(bootstrap(page_size=2), (1, 1))
+        self.assertTrue(ProductReplica.objects.get(product_id=8).deleted)
+        self.assertFalse(ProductReplica.objects.get(product_id=10).deleted)
+
+    def test_consumer_acks_applied_events_and_drops_malformed_ones(self):
+        channel = mock.Mock()
+        product_callback(channel, mock.Mock(delivery_tag=1), None, b'{"products": [], "deleted": []}')
+        channel.basic_ack.assert_called_once_with(delivery_tag=1)
+
+        product_callback(channel, mock.Mock(delivery_tag=2), None, b'not json')
+        channel.basic_nack.assert_called_once_with(delivery_tag=2, requeue=False)
+
+
+class CartStoreScenarios:
+    # Cùng hành vi API cho mọi cart store
+    def setUp(self):
+        storage._stores.clear()
+        self.addCleanup(storage._stores.clear)
+        self.client = APIClient()
+        apply_event({'products': [replica_row(1, version=1, price='2.50'), replica_row(2, version=1, price='4.00')]})
+        self.cart_id = self.client.get('/api/carts/user/', {'user_id': 5}).data['id']
+
+    def add(self, product_id, quantity=1):
+        return self.client.post('/api/cart-items/', {'cart': self.cart_id, 'product_id': product_id,
+                                                     'quantity': quantity}, format='json')
+
+    def cart(self):
+        return self.client.get('/api/carts/user/', {'user_id': 5}).data
+
+    def test_adding_same_product_twice_sums_quantity(self):
+        first = self.add(1, 2)
+        second = self.add(1, 3)
+        self.assertEqual((first.status_code, second.status_code), (201, 200))
+        self.assertEqual(first.data['id'], second.data['id'])
+
+        cart = self.cart()
+        self.assertEqual([(item['product_id'], item['quantity']) for item in cart['items']], [(1, 5)])
+        self.assertEqual(cart['items'][0]['product']['name'], 'Product 1')
+        self.assertEqual(Decimal(cart['total']), Decimal('12.50'))
+
+    def test_update_remove_and_clear(self):
+        item_id = self.add(1).data['id']
+        self.add(2)
+        self.assertEqual(self.client.patch(f'/api/cart-items/{item_id}/', {'quantity': 4}, format='json')
+                         .data['quantity'], 4)
+        self.assertEqual(self.client.delete(f'/api/cart-items/{item_id}/').status_code, 204)
+        self.assertEqual(self.client.delete(f'/api/cart-items/{item_id}/').status_code, 404)
+        self.assertEqual([item['product_id'] for item in self.cart()['items']], [2])
+
+        self.client.delete(f'/api/cart-items/clear_cart/?cart_id={self.cart_id}')
+        self.assertEqual(self.cart()['items'], [])
+
+    def test_unknown_cart_and_product_are_rejected(self):
+        response = self.client.post('/api/cart-items/', {'cart': 999, 'product_id': 1}, format='json')
+        self.assertEqual(response.status_code, 400)
+        with mock.patch('cart.products.session.get', return_value=batch_response([])):
+            self.assertEqual(self.add(77).status_code, 400)
+
+    def test_bulk_add_merges_items_and_is_all_or_nothing(self):
+        self.add(1)
+        response = self.client.post('/api/cart-items/bulk/', {'cart': self.cart_id, 'items': [
+            {'product_id': 2, 'quantity': 2}, {'product_id': 1, 'quantity': 3}, {'product_id': 2},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(item['product_id'], item['quantity']) for item in response.data], [(1, 4), (2, 3)])
+
+        with mock.patch('cart.products.session.get', return_value=batch_response([])):
+            response = self.client.post('/api/cart-items/bulk/', {'cart': self.cart_id, 'items': [
+                {'product_id': 1}, {'product_id': 77},
+            ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(item['product_id'], item['quantity']) for item in self.cart()['items']], [(1, 4), (2, 3)])
+
+        response = self.client.post('/api/cart-items/bulk/', {'cart': self.cart_id, 'items': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def totals(self):
+        cart = self.cart()
+        # Sau flush (kv) cột của Cart phải khớp với những gì API trả về
+        storage.get_cart_store().flush()
+        stored = Cart.objects.values_list('item_count', 'total').get(pk=self.cart_id)
+        self.assertEqual(stored, (cart['item_count'], cart['total']))
+        return stored
+
+    def test_totals_follow_every_change(self):
+        item_id = self.add(1, 2).data['id']
+        self.add(1)
+        self.assertEqual(self.totals(), (3, Decimal('7.50')))
+        self.client.post('/api/cart-items/bulk/', {'cart': self.cart_id, 'items': [
+            {'product_id': 2, 'quantity': 2}, {'product_id': 1},
+        ]}, format='json')
+        self.assertEqual(self.totals(), (6, Decimal('18.00')))
+        self.client.patch(f'/api/cart-items/{item_id}/', {'quantity': 1}, format='json')
+        self.assertEqual(self.totals(), (3, Decimal('10.50')))
+        self.client.delete(f'/api/cart-items/{item_id}/')
+        self.assertEqual(self.totals(), (2, Decimal('8.00')))
+        self.client.delete(f'/api/cart-items/clear_cart/?cart_id={self.cart_id}')
+        self.assertEqual(self.totals(), (0, Decimal('0.00')))
+
+
+class DatabaseCartStoreTests(CartStoreScenarios, TestCase):
+    def test_cart_list_shows_totals_without_loading_items(self):
+        self.add(1, 2)
+        with self.assertNumQueries(1):
+            carts = self.client.get('/api/carts/').data
+        self.assertEqual([(cart['id'], cart['item_count'], cart['total']) for cart in carts],
+                         [(self.cart_id, 2, Decimal('5.00'))])
+        self.assertNotIn('items', carts[0])
+
+    def test_reconcile_repairs_drifted_totals(self):
+        self.add(1, 2)
+        self.add(2)
+        other = Cart.objects.create(user_id=6, item_count=4, total=Decimal('9.99'))
+        Cart.objects.filter(pk=self.cart_id).update(item_count=1, total=Decimal('1.00'))
+
+        out = StringIO()
+        call_command('reconcile_cart_totals', '--dry-run', stdout=out)
+        self.assertIn('found 2', out.getvalue())
+        self.assertEqual(Cart.objects.get(pk=other.id).item_count, 4)
+
+        call_command('reconcile_cart_totals', '--batch-size', '1', stdout=out)
+        self.assertEqual(list(Cart.objects.order_by('pk').values_list('item_count', 'total')),
+                         [(3, Decimal('9.00')), (0, Decimal('0.00'))])
+        call_command('reconcile_cart_totals', stdout=out)
+        self.assertIn('Checked 2 carts, repaired 0', out.getvalue())
+
+
+class MergeDuplicateCartItemsTests(TransactionTestCase):
+    def setUp(self):
+        # Bảng như trước khi có unique_together(('cart', 'product_id'))
+        with connection.schema_editor() as editor:
+            editor.alter_unique_together(CartItem, CartItem._meta.unique_together, [])
+
+    def tearDown(self):
+        with connection.schema_editor() as editor:
+            editor.alter_unique_together(CartItem, [], CartItem._meta.unique_together)
+
+    def test_duplicates_are_merged_into_the_oldest_row(self):
+        cart = Cart.objects.create(user_id=7)
+        other = Cart.objects.create(user_id=8)
+        first = CartItem.objects.create(cart=cart, product_id=1, quantity=2, price=Decimal('3.00'))
+        CartItem.objects.create(cart=cart, product_id=1, quantity=3, price=Decimal('3.50'))
+        CartItem.objects.create(cart=cart, product_id=1, quantity=1, price=Decimal('3.50'))
+        CartItem.objects.create(cart=cart, product_id=2, quantity=1, price=Decimal('5.00'))
+        CartItem.objects.create(cart=other, product_id=1, quantity=4, price=Decimal('3.00'))
+
+        out = StringIO()
+        call_command('merge_duplicate_cart_items', stdout=out)
+        self.assertIn('Merged away 2 duplicate cart items', out.getvalue())
+        self.assertEqual(sorted(CartItem.objects.values_list('id', 'cart_id', 'product_id', 'quantity')),
+                         sorted([(first.id, cart.id, 1, 6), (first.id + 3, cart.id, 2, 1),
+                                 (first.id + 4, other.id, 1, 4)]))
+
+
+class ConcurrentAddToCartTests(TransactionTestCase):
+    workers = 8
+    adds = 10
+
+    def test_parallel_adds_of_same_product_keep_one_row_and_every_unit(self):
+        storage._stores.clear()
+        self.addCleanup(storage._stores.clear)
+        apply_event({'products': [replica_row(1, version=1)]})
+        cart = Cart.objects.create(user_id=5)
+        store = storage.get_cart_store()
+        errors = []
+
+        def adder():
+            try:
+                for _ in range(self.adds):
+                    while True:
+                        try:
+                            store.add_item(cart.id, 1, 1)
+                        except OperationalError:
+                            # SQLite khóa cả database khi ghi đồng thời: câu lệnh không chạy, thử lại
+                            if connection.vendor != 'sqlite':
+                                raise
+                            time.sleep(0.001)
+                            continue
+                        break
+            except Exception as e:  # noqa: BLE001 - báo lỗi của thread về test
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=adder) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(list(CartItem.objects.filter(cart=cart).values_list('product_id', 'quantity')),
+                         [(1, self.workers * self.adds)])
+        cart.refresh_from_db()
+        self.assertEqual((cart.item_count, cart.total), (self.workers * self.adds, Decimal('800.00')))
+
+
+@override_settings(CART_STORE='kv', CART_STORE_URL='', CART_STORE_FLUSH_INTERVAL=0)
+class KeyValueCartStoreTests(CartStoreScenarios, TestCase):
+    def test_writes_reach_database_only_on_flush(self):
+        item_id = self.add(1, 2).data['id']
+        self.add(2)
+        self.assertFalse(CartItem.objects.filter(cart_id=self.cart_id).exists())
+
+        self.assertEqual(storage.get_cart_store().flush(), 1)
+        self.assertEqual(
+            list(CartItem.objects.filter(cart_id=self.cart_id).order_by('id').values_list('id', 'product_id', 'quantity')),
+            [(item_id, 1, 2), (item_id + 1, 2, 1)],
+        )
+
+        self.client.delete(f'/api/cart-items/{item_id}/')
+        storage.get_cart_store().flush()
+        self.assertEqual(list(CartItem.objects.filter(cart_id=self.cart_id).values_list('product_id', flat=True)), [2])
+
+    @override_settings(WEB_CONCURRENCY=4)
+    def test_in_process_store_is_refused_with_several_workers(self):
+        storage._stores.clear()
+        with self.assertRaisesMessage(ImproperlyConfigured, 'must point at Redis'):
+            storage.get_cart_store()
+
+    def test_expired_cart_is_reloaded_from_database(self):
+        item_id = self.add(1, 2).data['id']
+        store = storage.get_cart_store()
+        store.flush()
+        store.kv.delete(store.cart_key(self.cart_id), store.item_key(item_id))
+
+        self.assertEqual([item['quantity'] for item in self.cart()['items']], [2])
+        self.assertEqual(self.client.patch(f'/api/cart-items/{item_id}/', {'quantity': 1}, format='json')
+                         .status_code, 200)
+        self.assertEqual(self.add(1).data['quantity'], 2)
@@ -1,50 +1,112 @@
+from django.http import Http404
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from .models import Cart, CartItem
-from .serializers import CartSerializer, CartItemSerializer
+from .serializers import (
+    AddCartItemSerializer, BulkAddCartItemsSerializer, CartSerializer, CartItemQuantitySerializer,
+    CartItemSerializer, CartSummarySerializer,
+)
+from .storage import ProductUnavailable, get_cart_store
 
 
 class CartViewSet(viewsets.ModelViewSet):
-    queryset = Cart.objects.all()
+    queryset = Cart.objects.prefetch_related('items')
     serializer_class = CartSerializer
 
+    def get_queryset(self):
+        if self.action == 'list':
+            return Cart.objects.all()
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        # GET /carts/ trả về item_count/total có sẵn trên Cart, không tải item
+        if self.action == 'list':
+            return CartSummarySerializer
+        return super().get_serializer_class()
+
     @action(detail=False, methods=['get'])
     def user(self, request):
         user_id = request.query_params.get('user_id')
         if user_id is None:
             return Response({"error": "user_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            return Response({"error": "user_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
-        cart, created = Cart.objects.get_or_create(user_id=user_id)
+        cart = get_cart_store().get_cart(user_id)
         serializer = self.get_serializer(cart)
         return Response(serializer.data)
 
 
 class CartItemViewSet(viewsets.ModelViewSet):
+    # Thêm/sửa/xoá item đi qua cart store (CART_STORE: database hoặc kv, xem storage.py)
     queryset = CartItem.objects.all()
     serializer_class = CartItemSerializer
 
+    def get_item_id(self):
+        try:
+            return int(self.kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+
     def create(self, request, *args, **kwargs):
-        cart_id = request.data.get('cart')
-        product_id = request.data.get('product_id')
-        quantity = request.data.get('quantity', 1)
+        serializer = AddCartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            item, created = get_cart_store().add_item(data['cart'], data['product_id'], data['quantity'])
+        except Cart.DoesNotExist:
+            return Response({"cart": [f"Invalid pk \"{data['cart']}\" - object does not exist."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except ProductUnavailable as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(item)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        # Thêm nhiều sản phẩm trong một request; sản phẩm lặp lại được cộng dồn
+        serializer = BulkAddCartItemsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        items = [(item['product_id'], item['quantity']) for item in data['items']]
+        try:
+            items = get_cart_store().add_items(data['cart'], items)
+        except Cart.DoesNotExist:
+            return Response({"cart": [f"Invalid pk \"{data['cart']}\" - object does not exist."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except ProductUnavailable as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(items, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def update(self, request, *args, **kwargs):
+        serializer = CartItemQuantitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            item = get_cart_store().set_quantity(self.get_item_id(), serializer.validated_data['quantity'])
+        except CartItem.DoesNotExist:
+            raise Http404
+        return Response(self.get_serializer(item).data)
 
-        # Check if item already exists in cart
+    def destroy(self, request, *args, **kwargs):
         try:
-            item = CartItem.objects.get(cart_id=cart_id, product_id=product_id)
-            # Update quantity
-            item.quantity += int(quantity)
-            item.save()
-            serializer = self.get_serializer(item)
-            return Response(serializer.data)
+            get_cart_store().remove_item(self.get_item_id())
         except CartItem.DoesNotExist:
-            # Create new item
-            return super().create(request, *args, **kwargs)
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['delete'])
     def clear_cart(self, request):
         cart_id = request.query_params.get('cart_id')
         if cart_id:
-            CartItem.objects.filter(cart_id=cart_id).delete()
+            try:
+                get_cart_store().clear(int(cart_id))
+            except (ValueError, Cart.DoesNotExist):
+                return Response({"error": "Cart not found"}, status=status.HTTP_404_NOT_FOUND)
             return Response({"message": "Cart cleared successfully"}, status=status.HTTP_200_OK)
-        return Response({"error": "cart_id is required"}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response({"error": "cart_id is required"}, status=status.HTTP_400_BAD_REQUEST)
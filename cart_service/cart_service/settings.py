@@ -98,6 +98,25 @@ REST_FRAMEWORK = {
 
 # Service URLs
 PRODUCT_SERVICE_URL = os.getenv('PRODUCT_SERVICE_URL', 'http://ecom-product-service:8000')
+# Timeout (giây) khi gọi product-service; quá hạn thì giỏ hàng dùng snapshot sản phẩm
+PRODUCT_SERVICE_TIMEOUT = float(os.getenv('PRODUCT_SERVICE_TIMEOUT', '2'))
+# Đọc sản phẩm từ bản sao cục bộ (cart/replica.py) trước khi gọi product-service
+PRODUCT_REPLICA_ENABLED = os.getenv('PRODUCT_REPLICA_ENABLED', 'True') == 'True'
+
+# Nơi lưu giỏ hàng (cart/storage.py): "database" (Cart/CartItem) hoặc "kv" (hash trong Redis,
+# hoặc trong process nếu CART_STORE_URL rỗng, ghi sau vào database mỗi CART_STORE_FLUSH_INTERVAL giây)
+CART_STORE = os.getenv('CART_STORE', 'database')
+CART_STORE_URL = os.getenv('CART_STORE_URL', '')
+CART_STORE_TTL = int(os.getenv('CART_STORE_TTL', str(7 * 24 * 3600)))
+CART_STORE_FLUSH_INTERVAL = float(os.getenv('CART_STORE_FLUSH_INTERVAL', '5'))
+# Số worker gunicorn (gunicorn đọc cùng biến); nhiều worker thì CART_STORE_URL phải là Redis
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+# RabbitMQ settings
+RABBITMQ_HOST = os.getenv('RABBITMQ_HOST', 'rabbitmq')
+RABBITMQ_PORT = int(os.getenv('RABBITMQ_PORT', '5672'))
+RABBITMQ_USER = os.getenv('RABBITMQ_USER', 'guest')
+RABBITMQ_PASS = os.getenv('RABBITMQ_PASS', 'guest')
 
 # Cấu hình CORS
 CORS_ALLOW_ALL_ORIGINS = True  # Cho phép tất cả các nguồn gốc (chỉ sử dụng trong môi trường phát triển)
@@ -16,7 +16,7 @@ import {
   styled
 } from '@mui/material';
 import { ShoppingCart, TrendingUp, Star, LocalShipping } from '@mui/icons-material';
-import { getProducts, getCategories } from '../../store/slices/productSlice';
+import { getProducts, getCategories, loadMoreProducts } from '../../store/slices/productSlice';
 
 const VisuallyHiddenText = styled('span')({
   border: 0,
@@ -48,15 +48,15 @@ const HeroSection = styled(Box)(({ theme }) => ({
 
 const HomePage = () => {
   const dispatch = useDispatch();
-  const { products, categories } = useSelector((state) => state.products);
+  const { products, categories, nextCursor, isLoadingMore } = useSelector((state) => state.products);
   
   useEffect(() => {
-    dispatch(getProducts({ limit: 6 }));
+    dispatch(getProducts({ page_size: 4 }));
     dispatch(getCategories());
   }, [dispatch]);
   
-  // Featured products - get first 4 products
-  const featuredProducts = products?.slice(0, 4) || [];
+  // Featured products - first page of 4, more pages on "Load more"
+  const featuredProducts = products || [];
   
   return (
     <Container maxWidth="lg">
@@ -188,7 +188,7 @@ const HomePage = () => {
                   <CardMedia
                     component="img"
                     height="180"
-                    image={product.image || 'https://via.placeholder.com/300x180?text=No+Image'}
+                    image={product.image_variants?.medium?.webp || product.image || 'https://via.placeholder.com/300x180?text=No+Image'}
                     alt={product.name}
                   />
                   <CardContent>
@@ -207,6 +207,18 @@ const HomePage = () => {
             </Grid>
           ))}
         </Grid>
+        
+        {nextCursor && (
+          <Box sx={{ mt: 3, display: 'flex', justifyContent: 'center' }}>
+            <Button
+              variant="outlined"
+              onClick={() => dispatch(loadMoreProducts())}
+              disabled={isLoadingMore}
+            >
+              {isLoadingMore ? 'Loading...' : 'Load more products'}
+            </Button>
+          </Box>
+        )}
       </Box>
       
       {/* Categories Section */}
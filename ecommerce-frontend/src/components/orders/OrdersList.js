@@ -14,14 +14,14 @@ import {
   Typography
 } from '@mui/material';
 import { ShoppingBag, AccessTime, CalendarToday } from '@mui/icons-material';
-import { getUserOrders } from '../../store/slices/orderSlice';
+import { getUserOrders, loadMoreOrders } from '../../store/slices/orderSlice';
 import Loading from '../layout/Loading';
 
 const OrdersList = () => {
   const dispatch = useDispatch();
   
   const { user } = useSelector((state) => state.auth);
-  const { orders, isLoading, error } = useSelector((state) => state.orders);
+  const { orders, nextCursor, isLoading, isLoadingMore, error } = useSelector((state) => state.orders);
   
   useEffect(() => {
     if (user) {
@@ -161,6 +161,18 @@ const OrdersList = () => {
           </Grid>
         ))}
       </Grid>
+      
+      {nextCursor && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+          <Button
+            variant="outlined"
+            onClick={() => dispatch(loadMoreOrders(user.id))}
+            disabled={isLoadingMore}
+          >
+            {isLoadingMore ? 'Loading...' : 'Load more orders'}
+          </Button>
+        </Box>
+      )}
     </Container>
   );
 };
@@ -11,29 +11,24 @@ import {
   Button,
   Box,
   Rating,
-  Pagination,
   FormControl,
   InputLabel,
   Select,
   MenuItem
 } from '@mui/material';
 import { ShoppingCart } from '@mui/icons-material';
-import { getProducts } from '../../store/slices/productSlice';
+import { getProducts, loadMoreProducts } from '../../store/slices/productSlice';
 import { getUserCart, addToCart } from '../../store/slices/cartSlice';
 import Loading from '../layout/Loading';
 
 const ProductList = () => {
-  const [page, setPage] = useState(1);
   const [sort, setSort] = useState('name');
   const dispatch = useDispatch();
   const navigate = useNavigate();
   
-  const { products, isLoading, error } = useSelector((state) => state.products);
+  const { products, nextCursor, isLoading, isLoadingMore, error } = useSelector((state) => state.products);
   const { user } = useSelector((state) => state.auth);
   const { cart } = useSelector((state) => state.cart);
-  
-  const itemsPerPage = 9;
-  const totalPages = Math.ceil((products?.length || 0) / itemsPerPage);
 
   useEffect(() => {
     dispatch(getProducts({ sort }));
@@ -43,11 +38,6 @@ const ProductList = () => {
     }
   }, [dispatch, sort, user]);
   
-  const handlePageChange = (event, value) => {
-    setPage(value);
-    window.scrollTo(0, 0);
-  };
-  
   const handleSortChange = (event) => {
     setSort(event.target.value);
   };
@@ -93,12 +83,6 @@ const ProductList = () => {
     );
   }
   
-  // Get current page products
-  const currentProducts = products.slice(
-    (page - 1) * itemsPerPage,
-    page * itemsPerPage
-  );
-
   return (
     <>
       <Box sx={{ display: 'flex', justifyContent: 'flex-end', mb: 3 }}>
@@ -120,7 +104,7 @@ const ProductList = () => {
       </Box>
       
       <Grid container spacing={4}>
-        {currentProducts.map((product) => (
+        {products.map((product) => (
           <Grid item key={product.id} xs={12} sm={6} md={4}>
             <Card sx={{ 
               height: '100%', 
@@ -136,7 +120,7 @@ const ProductList = () => {
                 <CardMedia
                   component="img"
                   height="200"
-                  image={product.image || 'https://via.placeholder.com/300x200?text=No+Image'}
+                  image={product.image_variants?.medium?.webp || product.image || 'https://via.placeholder.com/300x200?text=No+Image'}
                   alt={product.name}
                 />
               </Link>
@@ -192,14 +176,15 @@ const ProductList = () => {
         ))}
       </Grid>
       
-      {totalPages > 1 && (
+      {nextCursor && (
         <Box sx={{ mt: 4, display: 'flex', justifyContent: 'center' }}>
-          <Pagination 
-            count={totalPages} 
-            page={page} 
-            color="primary" 
-            onChange={handlePageChange} 
-          />
+          <Button
+            variant="outlined"
+            onClick={() => dispatch(loadMoreProducts())}
+            disabled={isLoadingMore}
+          >
+            {isLoadingMore ? 'Loading...' : 'Load more products'}
+          </Button>
         </Box>
       )}
     </>
@@ -5,8 +5,12 @@ const orderService = {
     return await api.post('/orders/', orderData);
   },
 
-  getUserOrders: async (userId) => {
-    return await api.get(`/orders/user_orders/?user_id=${userId}`);
+  getUserOrders: async (userId, cursor = null) => {
+    const params = { user_id: userId };
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    return await api.get('/orders/user_orders/', { params });
   },
 
   getOrderById: async (id) => {
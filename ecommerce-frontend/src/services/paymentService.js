@@ -5,8 +5,12 @@ const paymentService = {
     return await api.post('/payments/', paymentData);
   },
 
-  getUserPayments: async (userId) => {
-    return await api.get(`/payments/user_payments/?user_id=${userId}`);
+  getUserPayments: async (userId, cursor = null) => {
+    const params = { user_id: userId };
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    return await api.get('/payments/user_payments/', { params });
   },
 
   getOrderPayment: async (orderId) => {
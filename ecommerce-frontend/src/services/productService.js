@@ -13,12 +13,16 @@ const productService = {
     return await api.get('/categories/');
   },
 
-  getProductsByCategory: async (categoryId) => {
-    return await api.get(`/products/by_category/?category_id=${categoryId}`);
+  getProductsByCategory: async (categoryId, cursor = null) => {
+    const params = { category_id: categoryId };
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    return await api.get('/products/by_category/', { params });
   },
 
-  searchProducts: async (query) => {
-    return await api.get(`/products/?search=${query}`);
+  searchProducts: async (query, params) => {
+    return await api.get('/products/search/', { params: { ...params, q: query } });
   }
 };
 
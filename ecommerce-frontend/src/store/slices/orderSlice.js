@@ -3,8 +3,10 @@ import orderService from '../../services/orderService';
 
 const initialState = {
   orders: [],
+  nextCursor: null,
   order: null,
   isLoading: false,
+  isLoadingMore: false,
   error: null,
   success: false
 };
@@ -22,7 +24,10 @@ export const createOrder = createAsyncThunk(
   }
 );
 
-// Get user orders
+// Cursor of the next page, taken from the `next` link of a paginated response
+const cursorFrom = (next) => (next ? new URL(next).searchParams.get('cursor') : null);
+
+// Get user orders (first page)
 export const getUserOrders = createAsyncThunk(
   'orders/getUserOrders',
   async (userId, { rejectWithValue }) => {
@@ -35,6 +40,19 @@ export const getUserOrders = createAsyncThunk(
   }
 );
 
+// Load the next page of user orders
+export const loadMoreOrders = createAsyncThunk(
+  'orders/loadMore',
+  async (userId, { getState, rejectWithValue }) => {
+    try {
+      const response = await orderService.getUserOrders(userId, getState().orders.nextCursor);
+      return response.data;
+    } catch (error) {
+      return rejectWithValue(error.response.data);
+    }
+  }
+);
+
 // Get order by ID
 export const getOrderById = createAsyncThunk(
   'orders/getById',
@@ -95,13 +113,29 @@ const orderSlice = createSlice({
       })
       .addCase(getUserOrders.fulfilled, (state, action) => {
         state.isLoading = false;
-        state.orders = action.payload;
+        state.orders = action.payload.results;
+        state.nextCursor = cursorFrom(action.payload.next);
       })
       .addCase(getUserOrders.rejected, (state, action) => {
         state.isLoading = false;
         state.error = action.payload || 'Failed to fetch orders';
       })
       
+      // Load more orders cases
+      .addCase(loadMoreOrders.pending, (state) => {
+        state.isLoadingMore = true;
+        state.error = null;
+      })
+      .addCase(loadMoreOrders.fulfilled, (state, action) => {
+        state.isLoadingMore = false;
+        state.orders = [...state.orders, ...action.payload.results];
+        state.nextCursor = cursorFrom(action.payload.next);
+      })
+      .addCase(loadMoreOrders.rejected, (state, action) => {
+        state.isLoadingMore = false;
+        state.error = action.payload || 'Failed to fetch orders';
+      })
+      
       // Get order by ID cases
       .addCase(getOrderById.pending, (state) => {
         state.isLoading = true;
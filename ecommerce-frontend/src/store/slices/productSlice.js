@@ -3,19 +3,33 @@ import productService from '../../services/productService';
 
 const initialState = {
   products: [],
+  // Query of the current product list, repeated with nextCursor to load the next page
+  listQuery: null,
+  nextCursor: null,
   product: null,
   categories: [],
   isLoading: false,
+  isLoadingMore: false,
   error: null
 };
 
-// Get all products
+// Cursor of the next page, taken from the `next` link of a paginated response
+const cursorFrom = (next) => (next ? new URL(next).searchParams.get('cursor') : null);
+
+const fetchProductPage = (query, cursor = null) => (
+  query.categoryId
+    ? productService.getProductsByCategory(query.categoryId, cursor)
+    : productService.getAllProducts(cursor ? { ...query.params, cursor } : query.params)
+);
+
+// Get all products (first page)
 export const getProducts = createAsyncThunk(
   'products/getAll',
   async (params, { rejectWithValue }) => {
     try {
-      const response = await productService.getAllProducts(params);
-      return response.data;
+      const query = { params };
+      const response = await fetchProductPage(query);
+      return { query, page: response.data };
     } catch (error) {
       return rejectWithValue(error.response.data);
     }
@@ -48,12 +62,27 @@ export const getCategories = createAsyncThunk(
   }
 );
 
-// Get products by category
+// Get products by category (first page)
 export const getProductsByCategory = createAsyncThunk(
   'products/getByCategory',
   async (categoryId, { rejectWithValue }) => {
     try {
-      const response = await productService.getProductsByCategory(categoryId);
+      const query = { categoryId };
+      const response = await fetchProductPage(query);
+      return { query, page: response.data };
+    } catch (error) {
+      return rejectWithValue(error.response.data);
+    }
+  }
+);
+
+// Load the next page of the current product list
+export const loadMoreProducts = createAsyncThunk(
+  'products/loadMore',
+  async (_, { getState, rejectWithValue }) => {
+    try {
+      const { listQuery, nextCursor } = getState().products;
+      const response = await fetchProductPage(listQuery, nextCursor);
       return response.data;
     } catch (error) {
       return rejectWithValue(error.response.data);
@@ -79,7 +108,9 @@ const productSlice = createSlice({
       })
       .addCase(getProducts.fulfilled, (state, action) => {
         state.isLoading = false;
-        state.products = action.payload;
+        state.products = action.payload.page.results;
+        state.listQuery = action.payload.query;
+        state.nextCursor = cursorFrom(action.payload.page.next);
       })
       .addCase(getProducts.rejected, (state, action) => {
         state.isLoading = false;
@@ -121,11 +152,28 @@ const productSlice = createSlice({
       })
       .addCase(getProductsByCategory.fulfilled, (state, action) => {
         state.isLoading = false;
-        state.products = action.payload;
+        state.products = action.payload.page.results;
+        state.listQuery = action.payload.query;
+        state.nextCursor = cursorFrom(action.payload.page.next);
       })
       .addCase(getProductsByCategory.rejected, (state, action) => {
         state.isLoading = false;
         state.error = action.payload || 'Failed to fetch products by category';
+      })
+      
+      // Load more products cases
+      .addCase(loadMoreProducts.pending, (state) => {
+        state.isLoadingMore = true;
+        state.error = null;
+      })
+      .addCase(loadMoreProducts.fulfilled, (state, action) => {
+        state.isLoadingMore = false;
+        state.products = [...state.products, ...action.payload.results];
+        state.nextCursor = cursorFrom(action.payload.next);
+      })
+      .addCase(loadMoreProducts.rejected, (state, action) => {
+        state.isLoadingMore = false;
+        state.error = action.payload || 'Failed to fetch products';
       });
   }
 });
@@ -96,6 +96,10 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Phân trang theo con trỏ (utils/pagination.py)
+PAGINATION_PAGE_SIZE = int(os.getenv('PAGINATION_PAGE_SIZE', '20'))
+PAGINATION_MAX_PAGE_SIZE = int(os.getenv('PAGINATION_MAX_PAGE_SIZE', '100'))
+
 # Service URLs
 PRODUCT_SERVICE_URL = os.getenv('PRODUCT_SERVICE_URL', 'http://ecom-product-service:8000')
 USER_SERVICE_URL = os.getenv('USER_SERVICE_URL', 'http://ecom-user-service:8000')
@@ -24,6 +24,13 @@ class Order(models.Model):
     def __str__(self):
         return f"Order #{self.order_id}"
 
+    class Meta:
+        # Phục vụ phân trang theo con trỏ (created_at, id)
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['user_id', '-created_at', '-id']),
+        ]
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
@@ -1,3 +1,58 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Order
+
+
+@override_settings(PAGINATION_PAGE_SIZE=2, PAGINATION_MAX_PAGE_SIZE=3)
+class UserOrdersPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now()
+        self.orders = []
+        for minutes in range(5):
+            order = Order.objects.create(user_id=7, total_amount='10.00',
+                                         shipping_address='HN', billing_address='HN')
+            # created_at là auto_now_add: đặt lại để thứ tự trang được xác định
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(minutes=minutes))
+            self.orders.append(order)
+        Order.objects.create(user_id=8, total_amount='5.00', shipping_address='HCM', billing_address='HCM')
+
+    def ids(self, response):
+        return [order['id'] for order in response.data['results']]
+
+    def test_requires_user_id(self):
+        self.assertEqual(self.client.get('/api/orders/user_orders/').status_code, 400)
+
+    def test_first_page_uses_default_page_size(self):
+        response = self.client.get('/api/orders/user_orders/', {'user_id': 7})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids(response), [self.orders[0].id, self.orders[1].id])
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNone(response.data['previous'])
+
+    def test_page_size_is_capped_at_max_page_size(self):
+        response = self.client.get('/api/orders/user_orders/', {'user_id': 7, 'page_size': 50})
+        self.assertEqual(len(response.data['results']), 3)
+
+        response = self.client.get('/api/orders/user_orders/', {'user_id': 7, 'page_size': 1})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_next_and_previous_cursors_walk_all_user_orders(self):
+        response = self.client.get('/api/orders/user_orders/', {'user_id': 7})
+        first_page = self.ids(response)
+        seen = list(first_page)
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            self.assertIsNotNone(response.data['previous'])
+            seen.extend(self.ids(response))
+
+        # Mới nhất trước, không trùng, không lẫn đơn của user khác
+        self.assertEqual(seen, [order.id for order in self.orders])
+
+        second = self.client.get(self.client.get('/api/orders/user_orders/', {'user_id': 7}).data['next'])
+        self.assertEqual(self.ids(self.client.get(second.data['previous'])), first_page)
@@ -4,12 +4,14 @@ from rest_framework.response import Response
 import requests
 from .models import Order, OrderItem
 from .serializers import OrderSerializer, OrderItemSerializer
+from .utils.pagination import KeysetPagination
 from django.conf import settings
 
 
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    pagination_class = KeysetPagination
 
     @action(detail=False, methods=['get'])
     def user_orders(self, request):
@@ -17,9 +19,10 @@ class OrderViewSet(viewsets.ModelViewSet):
         if not user_id:
             return Response({"error": "user_id is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        orders = Order.objects.filter(user_id=user_id).order_by('-created_at')
-        serializer = self.get_serializer(orders, many=True)
-        return Response(serializer.data)
+        orders = Order.objects.filter(user_id=user_id)
+        page = self.paginate_queryset(orders)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
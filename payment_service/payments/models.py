@@ -27,6 +27,13 @@ class Payment(models.Model):
     def __str__(self):
         return f"Payment {self.id} - Order {self.order_id} - {self.payment_status}"
 
+    class Meta:
+        # Phục vụ phân trang theo con trỏ (created_at, id)
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['user_id', '-created_at', '-id']),
+        ]
+
 
 class PaymentDetail(models.Model):
     payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name='details')
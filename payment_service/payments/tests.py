@@ -1,3 +1,59 @@
-from django.test import TestCase
+import uuid
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Payment
+
+
+@override_settings(PAGINATION_PAGE_SIZE=2, PAGINATION_MAX_PAGE_SIZE=3)
+class UserPaymentsPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now()
+        self.payments = []
+        for minutes in range(5):
+            payment = Payment.objects.create(order_id=uuid.uuid4(), user_id=7, amount='10.00',
+                                             payment_method='credit_card')
+            # created_at là auto_now_add: đặt lại để thứ tự trang được xác định
+            Payment.objects.filter(pk=payment.pk).update(created_at=now - timedelta(minutes=minutes))
+            self.payments.append(payment)
+        Payment.objects.create(order_id=uuid.uuid4(), user_id=8, amount='5.00', payment_method='paypal')
+
+    def ids(self, response):
+        return [payment['id'] for payment in response.data['results']]
+
+    def test_requires_user_id(self):
+        self.assertEqual(self.client.get('/api/payments/user_payments/').status_code, 400)
+
+    def test_first_page_uses_default_page_size(self):
+        response = self.client.get('/api/payments/user_payments/', {'user_id': 7})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids(response), [self.payments[0].id, self.payments[1].id])
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNone(response.data['previous'])
+
+    def test_page_size_is_capped_at_max_page_size(self):
+        response = self.client.get('/api/payments/user_payments/', {'user_id': 7, 'page_size': 50})
+        self.assertEqual(len(response.data['results']), 3)
+
+        response = self.client.get('/api/payments/user_payments/', {'user_id': 7, 'page_size': 1})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_next_and_previous_cursors_walk_all_user_payments(self):
+        response = self.client.get('/api/payments/user_payments/', {'user_id': 7})
+        first_page = self.ids(response)
+        seen = list(first_page)
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            self.assertIsNotNone(response.data['previous'])
+            seen.extend(self.ids(response))
+
+        # Mới nhất trước, không trùng, không lẫn thanh toán của user khác
+        self.assertEqual(seen, [payment.id for payment in self.payments])
+
+        second = self.client.get(self.client.get('/api/payments/user_payments/', {'user_id': 7}).data['next'])
+        self.assertEqual(self.ids(self.client.get(second.data['previous'])), first_page)
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 import requests
 from .models import Payment
 from .serializers import PaymentSerializer
+from .utils.pagination import KeysetPagination
 from django.conf import settings
 import logging
 
@@ -13,6 +14,7 @@ logger = logging.getLogger(__name__)
 class PaymentViewSet(viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    pagination_class = KeysetPagination
 
     @action(detail=False, methods=['get'])
     def user_payments(self, request):
@@ -20,9 +22,10 @@ class PaymentViewSet(viewsets.ModelViewSet):
         if not user_id:
             return Response({"error": "user_id is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        payments = Payment.objects.filter(user_id=user_id).order_by('-created_at')
-        serializer = self.get_serializer(payments, many=True)
-        return Response(serializer.data)
+        payments = Payment.objects.filter(user_id=user_id)
+        page = self.paginate_queryset(payments)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def order_payment(self, request):
@@ -93,6 +93,46 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Phân trang theo con trỏ (utils/pagination.py)
+PAGINATION_PAGE_SIZE = int(os.getenv('PAGINATION_PAGE_SIZE', '20'))
+PAGINATION_MAX_PAGE_SIZE = int(os.getenv('PAGINATION_MAX_PAGE_SIZE', '100'))
+
+# Cache biểu diễn đã serialize của sản phẩm/category (products/cache.py).
+# Mặc định LRU trong process; đặt PRODUCT_CACHE_BACKEND/LOCATION để dùng cache chung
+# (vd. django.core.cache.backends.redis.RedisCache, redis://redis:6379/1).
+PRODUCT_CACHE_ENABLED = os.getenv('PRODUCT_CACHE_ENABLED', 'True') == 'True'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'products': {
+        'BACKEND': os.getenv('PRODUCT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('PRODUCT_CACHE_LOCATION', 'products'),
+        'TIMEOUT': int(os.getenv('PRODUCT_CACHE_TIMEOUT', '60')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('PRODUCT_CACHE_MAX_ENTRIES', '10000'))},
+    },
+}
+
+# Giữ hàng (products/reservations.py): thời gian giữ mặc định/tối đa, tính bằng giây
+RESERVATION_DEFAULT_TTL = int(os.getenv('RESERVATION_DEFAULT_TTL', '900'))
+RESERVATION_MAX_TTL = int(os.getenv('RESERVATION_MAX_TTL', '3600'))
+
+# Số thread tạo ảnh thumbnail/WebP (products/images.py)
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', '2'))
+
+# File import sản phẩm (products/bulk.py): nằm ngoài MEDIA_ROOT để nginx không phục vụ,
+# bị xóa khi job kết thúc. Job "running" không báo tiến độ quá IMPORT_JOB_STALE_AFTER giây
+# (worker `run_import_jobs` bị dừng giữa chừng) bị đánh dấu failed
+PRODUCT_IMPORT_ROOT = os.getenv('PRODUCT_IMPORT_ROOT', os.path.join(BASE_DIR, 'imports'))
+IMPORT_JOB_STALE_AFTER = int(os.getenv('IMPORT_JOB_STALE_AFTER', '900'))
+
+# RabbitMQ: event product.changed cho bản sao sản phẩm ở cart_service (products/events.py)
+RABBITMQ_HOST = os.getenv('RABBITMQ_HOST', 'rabbitmq')
+RABBITMQ_PORT = int(os.getenv('RABBITMQ_PORT', '5672'))
+RABBITMQ_USER = os.getenv('RABBITMQ_USER', 'guest')
+RABBITMQ_PASS = os.getenv('RABBITMQ_PASS', 'guest')
+PRODUCT_EVENTS_ENABLED = os.getenv('PRODUCT_EVENTS_ENABLED', 'True') == 'True'
+
 # Thêm vào cuối file settings.py
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
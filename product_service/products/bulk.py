@@ -0,0 +1,314 @@
+import csv
+import io
+import json
+import logging
+import os
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cache as product_cache
+from .events import publish_on_commit
+from .facets import refresh_facets
+from .models import Category, Product, ProductImportJob
+from .search import update_search_vectors, use_postgres
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+EXPORT_FIELDS = ['id', 'sku', 'name', 'description', 'price', 'stock', 'category', 'created_at', 'updated_at']
+UPDATE_FIELDS = ['name', 'description', 'price', 'stock', 'category', 'sku', 'updated_at']
+MAX_REPORTED_ERRORS = 100
+MAX_PRICE = Decimal('99999999.99')
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if extension == 'csv':
+        return 'csv'
+    raise ValueError(f"Cannot tell the format of {filename}; use .csv or .jsonl")
+
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+
+class CategoryMap:
+    # Toàn bộ category nằm trong bộ nhớ (chỉ có vài chục); category mới được tạo khi gặp lần đầu
+    def __init__(self):
+        self.ids = dict(Category.objects.values_list('name', 'id'))
+
+    def resolve(self, name):
+        if name not in self.ids:
+            self.ids[name] = Category.objects.get_or_create(name=name)[0].id
+        return self.ids[name]
+
+
+def iter_rows(stream, file_format):
+    # Đọc từng dòng từ file nhị phân, không nạp cả file vào bộ nhớ; trả về (số dòng, dict hoặc None)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def clean_row(row):
+    if row is None:
+        raise ValueError('not a JSON object')
+
+    def text(field):
+        value = row.get(field)
+        return '' if value is None else str(value).strip()
+
+    cleaned = {'name': text('name'), 'description': text('description'), 'sku': text('sku') or None}
+    if not cleaned['name']:
+        raise ValueError('name is required')
+    if len(cleaned['name']) > 200:
+        raise ValueError('name is longer than 200 characters')
+    if cleaned['sku'] and len(cleaned['sku']) > 64:
+        raise ValueError('sku is longer than 64 characters')
+
+    try:
+        price = Decimal(text('price'))
+    except InvalidOperation:
+        raise ValueError(f"invalid price {row.get('price')!r}")
+    if not price.is_finite():
+        raise ValueError(f"invalid price {row.get('price')!r}")
+    price = price.quantize(Decimal('0.01'))
+    if not Decimal(0) <= price <= MAX_PRICE:
+        raise ValueError(f"price {price} out of range")
+    cleaned['price'] = price
+
+    try:
+        cleaned['stock'] = int(text('stock') or 0)
+    except ValueError:
+        raise ValueError(f"invalid stock {row.get('stock')!r}")
+    if cleaned['stock'] < 0:
+        raise ValueError('stock must not be negative')
+
+    cleaned['category'] = text('category')
+    if not cleaned['category']:
+        raise ValueError('category is required')
+
+    product_id = text('id')
+    try:
+        cleaned['id'] = int(product_id) if product_id else None
+    except ValueError:
+        raise ValueError(f"invalid id {product_id!r}")
+    return cleaned
+
+
+def refresh_derived_data():
+    # Facet và cache không được signal cập nhật khi ghi hàng loạt (bulk_create/bulk_update);
+    # event product.changed được gửi theo từng chunk trong import_chunk()
+    refresh_facets()
+    product_cache.invalidate(product_cache.CATEGORY_VERSION)
+
+
+def import_chunk(chunk, categories, report):
+    # chunk: [(line, cleaned row)]; upsert theo id nếu có, nếu không thì theo sku
+    existing = Product.objects.in_bulk([row['id'] for _, row in chunk if row['id']])
+    skus = [row['sku'] for _, row in chunk if row['sku'] and not row['id']]
+    by_sku = {product.sku: product for product in Product.objects.filter(sku__in=skus)}
+
+    now = timezone.now()
+    updates = {}
+    creates = {}
+    for line, row in chunk:
+        try:
+            category_id = categories.resolve(row['category'])
+        except DatabaseError as e:
+            report.add_error(line, f"category {row['category']!r}: {e}")
+            continue
+
+        if row['id']:
+            product = existing.get(row['id'])
+            if product is None:
+                report.add_error(line, f"no product with id {row['id']}")
+                continue
+        else:
+            product = by_sku.get(row['sku']) if row['sku'] else None
+
+        fields = {key: row[key] for key in ('name', 'description', 'price', 'stock', 'sku')}
+        if product is None:
+            # Cùng sku xuất hiện nhiều lần trong chunk: dòng sau thắng
+            key = row['sku'] or ('line', line)
+            creates[key] = Product(category_id=category_id, **fields)
+        else:
+            for name, value in fields.items():
+                setattr(product, name, value)
+            product.category_id = category_id
+            product.updated_at = now
+            updates[product.pk] = product
+
+    try:
+        with transaction.atomic():
+            created = Product.objects.bulk_create(list(creates.values()))
+            # INSERT ... ON CONFLICT (id) DO UPDATE: bulk_update() dựng CASE WHEN cho từng dòng
+            # và tốn ~3ms CPU mỗi dòng, còn upsert thì gần bằng insert
+            Product.objects.bulk_create(
+                list(updates.values()), update_conflicts=True, unique_fields=['id'], update_fields=UPDATE_FIELDS
+            )
+            if use_postgres():
+                # bulk_* không gửi signal nên tự cập nhật search_vector
+                touched = [product.pk for product in created] + list(updates)
+                update_search_vectors(Product.objects.filter(pk__in=touched))
+            publish_on_commit(product_ids=[product.pk for product in created] + list(updates))
+    except DatabaseError as e:
+        first_line = chunk[0][0]
+        for line, _ in chunk:
+            report.add_error(line, f"batch starting at line {first_line} failed: {e}")
+        return
+    report.created += len(creates)
+    report.updated += len(updates)
+
+
+def import_products(stream, file_format, batch_size=2000, progress=None):
+    report = ImportReport()
+    categories = CategoryMap()
+    chunk = []
+
+    for line, row in iter_rows(stream, file_format):
+        report.processed += 1
+        try:
+            chunk.append((line, clean_row(row)))
+        except ValueError as e:
+            report.add_error(line, str(e))
+        if len(chunk) >= batch_size:
+            import_chunk(chunk, categories, report)
+            chunk = []
+            if progress:
+                progress(report)
+    if chunk:
+        import_chunk(chunk, categories, report)
+
+    if not use_postgres():
+        update_search_vectors()
+    refresh_derived_data()
+    if progress:
+        progress(report)
+    return report
+
+
+def claim_next_import_job():
+    # UPDATE có điều kiện pending -> running: hai worker không bao giờ nhận cùng một job
+    for job in ProductImportJob.objects.filter(status='pending').order_by('created_at')[:10]:
+        claimed = ProductImportJob.objects.filter(pk=job.pk, status='pending').update(
+            status='running', heartbeat_at=timezone.now())
+        if claimed:
+            return job
+    return None
+
+
+def finish_import_job(job, **changes):
+    # File upload chứa giá/tồn kho: xóa ngay khi job kết thúc, dù thành công hay lỗi
+    if job.file:
+        job.file.delete(save=False)
+    ProductImportJob.objects.filter(pk=job.pk).update(file='', finished_at=timezone.now(), **changes)
+
+
+def run_import_job(job, batch_size=2000):
+    # job đã được claim_next_import_job nhận; tiến độ và heartbeat được ghi vào ProductImportJob
+    def progress(report):
+        ProductImportJob.objects.filter(pk=job.pk).update(
+            processed=report.processed, created=report.created, updated=report.updated,
+            failed=report.failed, errors=report.errors, heartbeat_at=timezone.now(),
+        )
+
+    try:
+        with job.file.open('rb') as stream:
+            import_products(stream, job.file_format, batch_size, progress)
+        changes = {'status': 'completed'}
+    except Exception as e:
+        logger.exception(f"Product import {job.job_id} failed")
+        errors = ProductImportJob.objects.get(pk=job.pk).errors + [{'line': None, 'error': str(e)}]
+        changes = {'status': 'failed', 'errors': errors}
+    finish_import_job(job, **changes)
+
+
+def fail_stale_import_jobs():
+    # Worker bị dừng giữa chừng (deploy, hết bộ nhớ): job kẹt ở "running" mà không còn báo tiến độ
+    # (job chạy bằng thread nền trước đây không có heartbeat_at)
+    cutoff = timezone.now() - timedelta(seconds=settings.IMPORT_JOB_STALE_AFTER)
+    stale = ProductImportJob.objects.filter(Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True), status='running')
+    failed = 0
+    for job in stale:
+        errors = job.errors + [{'line': None, 'error': 'Import worker stopped before the job finished'}]
+        if stale.filter(pk=job.pk).update(status='failed', errors=errors):
+            finish_import_job(job)
+            failed += 1
+    return failed
+
+
+def run_import_jobs(batch_size=2000):
+    # Một lượt của worker: dọn job kẹt rồi chạy lần lượt các job đang chờ
+    stale = fail_stale_import_jobs()
+    if stale:
+        logger.warning(f"Marked {stale} stale product import jobs as failed")
+    ran = 0
+    while True:
+        job = claim_next_import_job()
+        if job is None:
+            return ran
+        run_import_job(job, batch_size)
+        ran += 1
+
+
+class Echo:
+    # csv.writer ghi vào đây và nhận lại chuỗi, để stream từng dòng
+    def write(self, value):
+        return value
+
+
+def export_products(file_format):
+    # Generator: đọc bảng bằng iterator (server-side cursor trên Postgres), không nạp cả bảng
+    rows = (
+        Product.objects.order_by('id')
+        .values_list('id', 'sku', 'name', 'description', 'price', 'stock', 'category__name',
+                     'created_at', 'updated_at')
+        .iterator(chunk_size=2000)
+    )
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder) + '\n'
@@ -0,0 +1,86 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Đổi số này khi format của ProductSerializer/CategorySerializer thay đổi
+SCHEMA_VERSION = 1
+CATEGORY_VERSION = 'category-version'
+
+
+def product_version(product_id):
+    return f'product-version:{product_id}'
+
+
+def get_cache():
+    return caches['products']
+
+
+class CacheStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'backend': settings.CACHES['products']['BACKEND'],
+            'enabled': settings.PRODUCT_CACHE_ENABLED,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None,
+        }
+
+
+stats = CacheStats()
+
+
+def current_versions(cache, names):
+    # Version thiếu (chưa có hoặc đã bị LRU loại) được khởi tạo bằng thời gian hiện tại,
+    # nên không bao giờ trùng với một version cũ còn nằm trong cache
+    values = cache.get_many(names)
+    missing = [name for name in names if name not in values]
+    if missing:
+        for name in missing:
+            cache.add(name, time.time_ns(), timeout=None)
+        values.update(cache.get_many(missing))
+    return [str(values.get(name)) for name in names]
+
+
+def bump(name):
+    cache = get_cache()
+    try:
+        cache.incr(name)
+    except ValueError:
+        cache.set(name, time.time_ns(), timeout=None)
+
+
+def invalidate(name):
+    # Đổi version sau khi transaction commit: reader đọc version mới chắc chắn thấy dữ liệu mới
+    transaction.on_commit(lambda: bump(name))
+
+
+def read_through(request, prefix, version_names, build):
+    if not settings.PRODUCT_CACHE_ENABLED:
+        return build()
+
+    cache = get_cache()
+    versions = current_versions(cache, version_names)
+    # URL ảnh là tuyệt đối nên phụ thuộc vào host mà client gọi tới
+    key = ':'.join([prefix, str(SCHEMA_VERSION), *versions, request.build_absolute_uri('/')])
+    data = cache.get(key)
+    stats.record(data is not None)
+    if data is None:
+        data = build()
+        cache.set(key, data)
+    return data
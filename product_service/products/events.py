@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Product
+from .utils.messaging import publish_messages
+
+# Event "product.changed" cho bản sao sản phẩm của các service khác (cart_service):
+# {"products": [replica row, ...], "deleted": [{"id": ..., "version": ...}, ...]}
+EXCHANGE = 'product_events'
+ROUTING_KEY = 'product.changed'
+BATCH_SIZE = 500
+REPLICA_FIELDS = ('id', 'name', 'price', 'stock', 'image', 'updated_at')
+
+
+def version_of(moment):
+    # updated_at tính bằng micro giây: phía nhận bỏ qua event có version không mới hơn bản đang giữ
+    return int(moment.timestamp() * 1000000)
+
+
+def replica_row(product_id, name, price, stock, image, updated_at):
+    return {
+        'id': product_id,
+        'name': name,
+        'price': str(price),
+        'in_stock': stock > 0,
+        'image': default_storage.url(image) if image else '',
+        'version': version_of(updated_at),
+    }
+
+
+def replica_rows(queryset):
+    return [replica_row(*row) for row in queryset.values_list(*REPLICA_FIELDS)]
+
+
+def publish_changes(product_ids=(), deleted_ids=()):
+    # Gửi trạng thái hiện tại trong database, không phải giá trị lúc thay đổi:
+    # event đến muộn hay sai thứ tự vẫn đúng nhờ version
+    product_ids = list(product_ids)
+    messages = [
+        {'products': replica_rows(Product.objects.filter(pk__in=product_ids[start:start + BATCH_SIZE])),
+         'deleted': []}
+        for start in range(0, len(product_ids), BATCH_SIZE)
+    ]
+    if deleted_ids:
+        version = version_of(timezone.now())
+        messages.append({'products': [], 'deleted': [{'id': pk, 'version': version} for pk in deleted_ids]})
+    if messages:
+        publish_messages(EXCHANGE, ROUTING_KEY, messages)
+
+
+def publish_on_commit(product_ids=(), deleted_ids=()):
+    if settings.PRODUCT_EVENTS_ENABLED:
+        product_ids, deleted_ids = list(product_ids), list(deleted_ids)
+        # robust: lỗi khi gửi event chỉ được ghi log, không làm hỏng request đã commit
+        transaction.on_commit(lambda: publish_changes(product_ids, deleted_ids), robust=True)
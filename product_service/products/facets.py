@@ -0,0 +1,118 @@
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import Category, Product, ProductFacet
+
+# Cận dưới của từng khoảng giá; khoảng cuối không có cận trên
+PRICE_BUCKETS = [0, 25, 50, 100, 250, 500, 1000]
+
+
+def price_bucket(price):
+    return max(bisect_right(PRICE_BUCKETS, Decimal(str(price))) - 1, 0)
+
+
+def facet_key(category_id, price, stock):
+    # price/stock có thể còn là chuỗi khi gán trực tiếp rồi save()
+    return category_id, price_bucket(price), int(stock) > 0
+
+
+def apply_delta(key, delta):
+    category_id, bucket, in_stock = key
+    changes = {'product_count': F('product_count') + delta}
+    if in_stock:
+        changes['in_stock_count'] = F('in_stock_count') + delta
+    facets = ProductFacet.objects.filter(category_id=category_id, price_bucket=bucket)
+    if delta < 0:
+        # Không bao giờ tạo dòng khi trừ: khi category bị xóa (cascade) dòng facet đã/sẽ bị xóa theo,
+        # tạo lại nó sẽ trỏ tới category không còn tồn tại
+        facets.update(**changes)
+        return
+    ProductFacet.objects.get_or_create(category_id=category_id, price_bucket=bucket)
+    facets.update(**changes)
+
+
+def adjust_in_stock(deltas):
+    # Dùng khi chỉ stock thay đổi (reservation) và sản phẩm vừa hết hàng/có hàng lại.
+    # deltas: {(category_id, price_bucket): delta}. Gọi sau khi đã khóa xong mọi dòng Product
+    # và cập nhật theo thứ tự key, để các transaction luôn khóa dòng facet theo cùng thứ tự
+    for (category_id, bucket), delta in sorted(deltas.items()):
+        if delta:
+            ProductFacet.objects.filter(category_id=category_id, price_bucket=bucket).update(
+                in_stock_count=F('in_stock_count') + delta
+            )
+
+
+def move(old_key, new_key):
+    # old_key/new_key là None khi sản phẩm mới tạo/vừa bị xóa
+    if old_key == new_key:
+        return
+    with transaction.atomic():
+        if old_key is not None:
+            apply_delta(old_key, -1)
+        if new_key is not None:
+            apply_delta(new_key, 1)
+
+
+def refresh_facets():
+    # Tính lại toàn bộ bằng một truy vấn GROUP BY cho mỗi khoảng giá
+    rows = {}
+    for bucket, low in enumerate(PRICE_BUCKETS):
+        queryset = Product.objects.filter(price__gte=low)
+        if bucket + 1 < len(PRICE_BUCKETS):
+            queryset = queryset.filter(price__lt=PRICE_BUCKETS[bucket + 1])
+        counts = queryset.values('category_id').annotate(
+            product_count=Count('id'),
+            in_stock_count=Count('id', filter=Q(stock__gt=0)),
+        )
+        for row in counts:
+            rows[(row['category_id'], bucket)] = row
+
+    with transaction.atomic():
+        ProductFacet.objects.all().delete()
+        ProductFacet.objects.bulk_create([
+            ProductFacet(
+                category_id=category_id,
+                price_bucket=bucket,
+                product_count=row['product_count'],
+                in_stock_count=row['in_stock_count'],
+            )
+            for (category_id, bucket), row in rows.items()
+        ])
+    return len(rows)
+
+
+def facet_summary(category_id=None):
+    # Chỉ đọc bảng facet (số category x số khoảng giá dòng), không quét bảng Product
+    facets = list(ProductFacet.objects.all())
+    names = dict(Category.objects.values_list('id', 'name'))
+
+    categories = {}
+    for facet in facets:
+        entry = categories.setdefault(facet.category_id, {
+            'id': facet.category_id, 'name': names.get(facet.category_id), 'count': 0, 'in_stock': 0,
+        })
+        entry['count'] += facet.product_count
+        entry['in_stock'] += facet.in_stock_count
+
+    selected = [facet for facet in facets if category_id is None or facet.category_id == category_id]
+    buckets = []
+    for bucket, low in enumerate(PRICE_BUCKETS):
+        high = PRICE_BUCKETS[bucket + 1] if bucket + 1 < len(PRICE_BUCKETS) else None
+        buckets.append({
+            'min': low,
+            'max': high,
+            'count': sum(facet.product_count for facet in selected if facet.price_bucket == bucket),
+        })
+
+    return {
+        'total': sum(facet.product_count for facet in selected),
+        'in_stock': sum(facet.in_stock_count for facet in selected),
+        'categories': sorted(
+            (entry for entry in categories.values() if entry['count']),
+            key=lambda entry: entry['name'] or '',
+        ),
+        'price_buckets': buckets,
+    }
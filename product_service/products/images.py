@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image
+
+from . import cache as product_cache
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# Kích thước tối đa (giữ tỉ lệ) của từng biến thể; mỗi cỡ có bản JPEG và WebP
+VARIANT_SIZES = {
+    'thumb': (150, 150),
+    'medium': (400, 400),
+    'large': (800, 800),
+}
+VARIANT_FORMATS = {'jpg': 'JPEG', 'webp': 'WEBP'}
+VARIANT_QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS,
+                                           thread_name_prefix='image-variants')
+        return _executor
+
+
+def variant_name(name, digest, size, extension):
+    # Đặt cạnh ảnh gốc, kèm hash nội dung: products/abc.png -> products/abc.1a2b3c4d5e6f__thumb.webp
+    # abc.png và abc.jpg, hay ảnh tải lại cùng tên, không bao giờ dùng chung một tên biến thể
+    base, _ = os.path.splitext(name)
+    return f"{base}.{digest}__{size}.{extension}"
+
+
+def render_variants(name):
+    with default_storage.open(name, 'rb') as original_file:
+        content = original_file.read()
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    original = Image.open(BytesIO(content))
+    original.load()
+
+    variants = {}
+    for size, box in VARIANT_SIZES.items():
+        image = original.copy()
+        image.thumbnail(box, Image.LANCZOS)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        variants[size] = {}
+        for extension, image_format in VARIANT_FORMATS.items():
+            # JPEG không có kênh alpha
+            encoded = image.convert('RGB') if image_format == 'JPEG' else image
+            buffer = BytesIO()
+            encoded.save(buffer, image_format, quality=VARIANT_QUALITY)
+            target = variant_name(name, digest, size, extension)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            variants[size][extension] = default_storage.save(target, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def delete_variants(variants):
+    for formats in (variants or {}).values():
+        for name in formats.values():
+            if default_storage.exists(name):
+                default_storage.delete(name)
+
+
+def generate_variants(product_id, name, previous_variants=None):
+    try:
+        delete_variants(previous_variants)
+        variants = render_variants(name)
+        # Ảnh có thể đã bị thay trong lúc xử lý: chỉ ghi nếu sản phẩm vẫn dùng ảnh này
+        if Product.objects.filter(pk=product_id, image=name).update(image_variants=variants):
+            product_cache.invalidate(product_cache.product_version(product_id))
+        else:
+            delete_variants(variants)
+    except Exception as e:
+        logger.error(f"Failed to generate image variants for product {product_id} ({name}): {e}")
+    finally:
+        connection.close()
+
+
+def schedule_variants(product_id, name, previous_variants=None):
+    return get_executor().submit(generate_variants, product_id, name, previous_variants)
+
+
+def variant_urls(variants, request=None):
+    urls = {}
+    for size, formats in (variants or {}).items():
+        urls[size] = {}
+        for extension, name in formats.items():
+            url = default_storage.url(name)
+            urls[size][extension] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,80 @@
+import json
+import random
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from rest_framework.test import APIRequestFactory
+
+from products.images import generate_variants
+from products.models import Category, Product
+from products.views import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compares the bytes a client downloads for one product-list page with original images vs variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', action='store_true',
+                            help='Create products with 1600x1200 photo-like JPEGs if the first page has no images')
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        if options['seed']:
+            self.seed(page_size)
+
+        view = ProductViewSet.as_view({'get': 'list'})
+        response = view(APIRequestFactory().get('/api/products/', {'page_size': page_size}))
+        response.render()
+        results = [item for item in response.data['results'] if item['image']]
+        if not results:
+            raise CommandError("No product images on the first page. Use --seed.")
+
+        products = Product.objects.in_bulk([item['id'] for item in results])
+        for product in products.values():
+            if not product.image_variants:
+                generate_variants(product.id, product.image.name)
+                product.refresh_from_db()
+
+        def size(name):
+            return default_storage.size(name)
+
+        json_bytes = len(response.content)
+        rows = [
+            ('original', sum(size(p.image.name) for p in products.values())),
+            ('thumb jpg', sum(size(p.image_variants['thumb']['jpg']) for p in products.values())),
+            ('thumb webp', sum(size(p.image_variants['thumb']['webp']) for p in products.values())),
+            ('medium jpg', sum(size(p.image_variants['medium']['jpg']) for p in products.values())),
+            ('medium webp', sum(size(p.image_variants['medium']['webp']) for p in products.values())),
+        ]
+
+        self.stdout.write(f"list page: {len(results)} products with images, JSON {json_bytes:,} bytes "
+                          f"({len(json.dumps(results[0]))} bytes per product)")
+        baseline = rows[0][1] + json_bytes
+        for name, image_bytes in rows:
+            total = image_bytes + json_bytes
+            self.stdout.write(f"{name:<12} images {image_bytes:>12,} B   page total {total:>12,} B   "
+                              f"{total / baseline:6.1%} of original")
+
+    def seed(self, count):
+        rng = random.Random(1)
+        category, _ = Category.objects.get_or_create(name='Image benchmark')
+        products = []
+        for i in range(count):
+            # Nhiễu + gradient: nén gần giống ảnh chụp hơn là một màu phẳng
+            image = Image.effect_noise((1600, 1200), 40).convert('RGB')
+            overlay = Image.linear_gradient('L').resize((1600, 1200)).convert('RGB')
+            image = Image.blend(image, overlay, 0.5)
+            tint = Image.new('RGB', image.size, tuple(rng.randint(0, 255) for _ in range(3)))
+            image = Image.blend(image, tint, 0.4)
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=90)
+            name = default_storage.save(f'products/image-benchmark-{i}.jpg', ContentFile(buffer.getvalue()))
+            products.append(Product(name=f'Image benchmark {i}', description='', price=Decimal('1.00'),
+                                    category=category, image=name))
+        # bulk_create không gửi signal: biến thể được tạo đồng bộ trong handle()
+        Product.objects.bulk_create(products)
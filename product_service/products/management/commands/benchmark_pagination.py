@@ -0,0 +1,95 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIRequestFactory
+
+from products.models import Category, Product
+from products.utils.pagination import KeysetPagination
+from products.views import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks cursor pagination of /api/products/ against OFFSET pagination, from page 1 to page 10,000'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', default='1,10,100,1000,10000',
+                            help='Comma separated page numbers to measure')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', action='store_true',
+                            help='Create benchmark products if the table is too small for the last page')
+
+    def handle(self, *args, **options):
+        pages = sorted(int(p) for p in options['pages'].split(','))
+        page_size = options['page_size']
+        repeat = options['repeat']
+
+        needed = pages[-1] * page_size
+        existing = Product.objects.count()
+        if existing < needed:
+            if not options['seed']:
+                raise CommandError(f"Need {needed} products for page {pages[-1]}, found {existing}. Use --seed.")
+            self.seed(needed - existing)
+
+        view = ProductViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        paginator = KeysetPagination()
+        paginator.base_url = '/api/products/'
+        ordering = paginator.ordering
+
+        self.stdout.write(f"{'page':>8} {'cursor view ms':>15} {'cursor query ms':>16} {'offset query ms':>16}")
+        for page in pages:
+            offset = (page - 1) * page_size
+            url = f'/api/products/?page_size={page_size}'
+            anchor = None
+            if offset:
+                # Con trỏ trỏ vào bản ghi cuối của trang trước (lấy ngoài phần đo thời gian)
+                anchor = Product.objects.order_by(*ordering)[offset - 1]
+                url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(anchor.created_at)))
+                url += f'&page_size={page_size}'
+
+            def cursor_view():
+                response = view(factory.get(url))
+                response.render()
+                assert response.status_code == 200, response.status_code
+
+            def cursor_query():
+                queryset = Product.objects.order_by(*ordering)
+                if anchor is not None:
+                    queryset = queryset.filter(created_at__lt=anchor.created_at)
+                list(queryset[:page_size])
+
+            def offset_query():
+                list(Product.objects.order_by(*ordering)[offset:offset + page_size])
+
+            self.stdout.write(
+                f"{page:>8} {self.measure(cursor_view, repeat):>15.2f} "
+                f"{self.measure(cursor_query, repeat):>16.2f} {self.measure(offset_query, repeat):>16.2f}"
+            )
+
+    def measure(self, fn, repeat):
+        fn()
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
+
+    def seed(self, count, batch_size=5000):
+        self.stdout.write(f"Seeding {count} benchmark products...")
+        category, _ = Category.objects.get_or_create(name='Benchmark')
+        for start in range(0, count, batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    name=f'Benchmark product {start + i}',
+                    description='Benchmark product',
+                    price=Decimal('9.99'),
+                    stock=10,
+                    category=category,
+                )
+                for i in range(min(batch_size, count - start))
+            ])
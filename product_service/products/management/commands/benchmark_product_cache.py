@@ -0,0 +1,59 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from products.cache import stats
+from products.models import Category, Product
+from products.views import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks /api/products/{id}/ read throughput with and without the product cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000,
+                            help='Number of distinct products read (the hot set)')
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--seed', action='store_true',
+                            help='Create benchmark products if there are fewer than --products')
+
+    def handle(self, *args, **options):
+        ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:options['products']])
+        if len(ids) < options['products']:
+            if not options['seed']:
+                raise CommandError(f"Need {options['products']} products, found {len(ids)}. Use --seed.")
+            category, _ = Category.objects.get_or_create(name='Benchmark')
+            Product.objects.bulk_create([
+                Product(name=f'Benchmark product {i}', description='Benchmark product',
+                        price=Decimal('9.99'), stock=10, category=category)
+                for i in range(options['products'] - len(ids))
+            ])
+            ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:options['products']])
+
+        rng = random.Random(42)
+        sequence = [rng.choice(ids) for _ in range(options['requests'])]
+        view = ProductViewSet.as_view({'get': 'retrieve'})
+        factory = APIRequestFactory()
+
+        def run():
+            started = time.perf_counter()
+            for product_id in sequence:
+                response = view(factory.get(f'/api/products/{product_id}/'), pk=str(product_id))
+                assert response.status_code == 200, response.status_code
+            return len(sequence) / (time.perf_counter() - started)
+
+        caches['products'].clear()
+        with override_settings(PRODUCT_CACHE_ENABLED=False):
+            uncached = run()
+        hits, misses = stats.hits, stats.misses
+        cached = run()
+
+        self.stdout.write(f"without cache: {uncached:10.0f} req/s")
+        self.stdout.write(f"with cache:    {cached:10.0f} req/s  "
+                          f"(hits {stats.hits - hits}, misses {stats.misses - misses}, "
+                          f"{cached / uncached:.1f}x)")
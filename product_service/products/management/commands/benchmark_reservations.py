@@ -0,0 +1,86 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from products.models import Category, Product, StockReservation
+from products.reservations import InsufficientStock, commit, reserve
+
+
+class Command(BaseCommand):
+    help = 'Runs parallel reservers against a few hot products, checks for oversell and reports reservations/s'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--products', type=int, default=5)
+        parser.add_argument('--stock', type=int, default=2000)
+        parser.add_argument('--items', type=int, default=3, help='Products per reservation')
+
+    def handle(self, *args, **options):
+        category, _ = Category.objects.get_or_create(name='Reservation benchmark')
+        products = [
+            Product.objects.create(name=f'Reservation benchmark {i}', description='', price=Decimal('5.00'),
+                                   stock=options['stock'], category=category)
+            for i in range(options['products'])
+        ]
+        reserved = {product.id: 0 for product in products}
+        lock = threading.Lock()
+        counts = {'reservations': 0, 'rejected': 0, 'retries': 0}
+
+        def reserver(worker):
+            try:
+                attempt = 0
+                while True:
+                    attempt += 1
+                    # Mỗi worker chọn các sản phẩm theo thứ tự khác nhau
+                    chosen = [products[(worker + attempt + i) % len(products)] for i in range(options['items'])]
+                    items = [{'product_id': product.id, 'quantity': 1} for product in reversed(chosen)]
+                    try:
+                        reservation = reserve(items, ttl=60)
+                        commit(reservation.reservation_id)
+                    except InsufficientStock:
+                        with lock:
+                            counts['rejected'] += 1
+                        if counts['rejected'] > options['workers'] * 10:
+                            return
+                        continue
+                    except OperationalError:
+                        # SQLite chỉ có khóa cả database
+                        with lock:
+                            counts['retries'] += 1
+                        continue
+                    with lock:
+                        counts['reservations'] += 1
+                        for item in items:
+                            reserved[item['product_id']] += 1
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=reserver, args=(worker,)) for worker in range(options['workers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        oversold = []
+        for product in products:
+            product.refresh_from_db()
+            if product.stock < 0 or product.stock + reserved[product.id] != options['stock']:
+                oversold.append(product.id)
+
+        self.stdout.write(
+            f"{counts['reservations']} reservations ({options['items']} items each) by {options['workers']} workers "
+            f"in {elapsed:.2f}s = {counts['reservations'] / elapsed:.0f} reservations/s; "
+            f"{counts['rejected']} rejected for stock, {counts['retries']} lock retries"
+        )
+        if oversold:
+            self.stderr.write(self.style.ERROR(f"Stock mismatch for products {oversold}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No oversell: remaining stock + reserved == initial stock"))
+
+        StockReservation.objects.filter(items__product__in=products).delete()
+        Product.objects.filter(pk__in=[product.id for product in products]).delete()
@@ -0,0 +1,87 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+
+from products.models import Category, Product
+from products.search import search_index, update_search_vectors, use_postgres
+from products.views import ProductViewSet
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'po', 'da', 'fu', 'gi', 'ho', 'je', 'wu']
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks /api/products/search/ on a large synthetic catalog (1M products by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', action='store_true',
+                            help='Create synthetic products until the catalog has --products rows')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        # 4096 từ, tần suất kiểu Zipf: vài từ rất phổ biến, đa số hiếm
+        vocabulary = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+        weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+
+        existing = Product.objects.count()
+        if existing < options['products']:
+            if not options['seed']:
+                raise CommandError(f"Need {options['products']} products, found {existing}. Use --seed.")
+            self.seed(options['products'] - existing, options['batch_size'], rng, vocabulary, weights)
+
+        started = time.perf_counter()
+        if use_postgres():
+            update_search_vectors(batch_size=options['batch_size'])
+            self.stdout.write(f"search_vector refresh: {time.perf_counter() - started:.1f}s")
+        else:
+            search_index.reset()
+            search_index.ensure_built()
+            self.stdout.write(f"in-memory index build: {time.perf_counter() - started:.1f}s")
+
+        category = Category.objects.order_by('id').first()
+        cases = [
+            ('common word', {'q': vocabulary[0]}),
+            ('rare word', {'q': vocabulary[2000]}),
+            ('two words', {'q': f'{vocabulary[3]} {vocabulary[40]}'}),
+            ('word + category', {'q': vocabulary[1], 'category_id': category.id}),
+            ('word + price range', {'q': vocabulary[2], 'min_price': '100', 'max_price': '200'}),
+            ('page 50', {'q': vocabulary[0], 'page': 50}),
+        ]
+
+        view = ProductViewSet.as_view({'get': 'search'})
+        factory = APIRequestFactory()
+        self.stdout.write(f"{'case':<20} {'hits':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        for name, params in cases:
+            samples = []
+            hits = 0
+            for _ in range(options['repeat'] + 1):
+                request = factory.get('/api/products/search/', params)
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                samples.append((time.perf_counter() - started) * 1000)
+                hits = response.data.get('count', 0)
+            samples = sorted(samples[1:])
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            self.stdout.write(f"{name:<20} {hits:>9} {statistics.median(samples):>9.2f} {p95:>9.2f}")
+
+    def seed(self, count, batch_size, rng, vocabulary, weights):
+        self.stdout.write(f"Seeding {count} synthetic products...")
+        categories = [Category.objects.get_or_create(name=f'Search benchmark {i}')[0] for i in range(8)]
+        for start in range(0, count, batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    name=' '.join(rng.choices(vocabulary, weights, k=3)),
+                    description=' '.join(rng.choices(vocabulary, weights, k=25)),
+                    price=Decimal(rng.randint(100, 100000)) / 100,
+                    stock=rng.randint(0, 100),
+                    category=rng.choice(categories),
+                )
+                for _ in range(min(batch_size, count - start))
+            ])
@@ -1,27 +1,61 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from products.bulk import refresh_derived_data
 from products.models import Category, Product
+from products.search import update_search_vectors
 from django.utils.text import slugify
 from faker import Faker
 import random
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
 from django.core.files.base import ContentFile
 import requests
 from io import BytesIO
 from django.core.files import File
+from PIL import Image, ImageDraw
 
 fake = Faker()
 
+CATEGORIES = [
+    'Electronics', 'Clothing', 'Books', 'Home & Kitchen',
+    'Sports & Outdoors', 'Beauty & Personal Care', 'Toys & Games'
+]
+
+
+def render_placeholder(spec):
+    # Chạy trong process pool: chỉ dùng Pillow, không đụng tới Django/database
+    path, width, height, color, label = spec
+    if not os.path.exists(path):
+        image = Image.new('RGB', (width, height), color)
+        draw = ImageDraw.Draw(image)
+        draw.text((10, height // 2), label, fill=(255, 255, 255))
+        image.save(path, 'JPEG', quality=80)
+    return path
+
 
 class Command(BaseCommand):
     help = 'Creates sample data for products app'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int,
+                            help='Fast mode: bulk-create this many products (offline, reproducible with --seed)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, help='Random seed; the same seed produces the same catalog')
+        parser.add_argument('--images', choices=['local', 'none'], default='local',
+                            help='Fast mode: draw placeholder images locally with Pillow, or skip them')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Processes used to draw images')
+
     def handle(self, *args, **options):
+        if options['count']:
+            return self.handle_bulk(**options)
+
         self.stdout.write(self.style.SUCCESS('Creating sample data...'))
 
         # Create categories
-        categories = [
-            'Electronics', 'Clothing', 'Books', 'Home & Kitchen',
-            'Sports & Outdoors', 'Beauty & Personal Care', 'Toys & Games'
-        ]
+        categories = CATEGORIES
 
         category_objects = []
         for category_name in categories:
@@ -66,4 +100,70 @@ class Command(BaseCommand):
                 self.stdout.write(f"Created product: {name} in {category.name}")
 
         self.stdout.write(self.style.SUCCESS(
-            f'Successfully created {Category.objects.count()} categories and {Product.objects.count()} products'))
\ No newline at end of file
+            f'Successfully created {Category.objects.count()} categories and {Product.objects.count()} products'))
+
+    def handle_bulk(self, count, batch_size, seed, images, workers, **options):
+        if seed is None:
+            seed = random.randrange(1_000_000)
+        self.stdout.write(f"Seeding {count} products with seed {seed} (images: {images})")
+        rng = random.Random(seed)
+        Faker.seed(seed)
+
+        existing = dict(Category.objects.filter(name__in=CATEGORIES).values_list('name', 'id'))
+        Category.objects.bulk_create([
+            Category(name=name, description=fake.paragraph()) for name in CATEGORIES if name not in existing
+        ])
+        category_ids = [
+            category_id for _, category_id in
+            sorted(Category.objects.filter(name__in=CATEGORIES).values_list('name', 'id'))
+        ]
+
+        # Faker chậm (~100µs mỗi đoạn văn): sinh sẵn một kho câu rồi ghép ngẫu nhiên
+        phrases = [fake.catch_phrase() for _ in range(2000)]
+        paragraphs = [fake.paragraph(nb_sentences=5) for _ in range(500)]
+
+        image_dir = os.path.join(settings.MEDIA_ROOT, 'products', 'sample', str(seed))
+        pool = None
+        if images == 'local':
+            os.makedirs(image_dir, exist_ok=True)
+            pool = ProcessPoolExecutor(max_workers=workers)
+
+        started = time.perf_counter()
+        created = 0
+        try:
+            for start in range(0, count, batch_size):
+                products = []
+                specs = []
+                for index in range(start, min(start + batch_size, count)):
+                    name = f"{rng.choice(phrases)} {index}"
+                    product = Product(
+                        name=name,
+                        description='\n'.join(rng.sample(paragraphs, 3)),
+                        price=Decimal(rng.randint(1000, 100000)) / 100,
+                        stock=rng.randint(0, 100),
+                        category_id=rng.choice(category_ids),
+                        sku=f"SAMPLE-{seed}-{index:08d}",
+                    )
+                    width, height = rng.randint(200, 500), rng.randint(200, 500)
+                    color = (rng.randint(0, 200), rng.randint(0, 200), rng.randint(0, 200))
+                    if pool is not None:
+                        product.image = f"products/sample/{seed}/{index}.jpg"
+                        specs.append((os.path.join(image_dir, f"{index}.jpg"), width, height, color, name[:40]))
+                    products.append(product)
+
+                if pool is not None:
+                    list(pool.map(render_placeholder, specs, chunksize=64))
+                # Chạy lại với cùng seed: sku đã có thì bỏ qua
+                Product.objects.bulk_create(products, ignore_conflicts=True)
+                created += len(products)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{created}/{count} products in {elapsed:.1f}s ({created / elapsed:.0f}/s)")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        update_search_vectors(Product.objects.filter(sku__startswith=f"SAMPLE-{seed}-"))
+        refresh_derived_data()
+        self.stdout.write(self.style.SUCCESS(
+            f'Catalog now has {Category.objects.count()} categories and {Product.objects.count()} products'))
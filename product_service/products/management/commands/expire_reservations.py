@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.reservations import expire_reservations
+
+
+class Command(BaseCommand):
+    help = 'Returns the stock held by expired, uncommitted reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running, sweeping every --interval seconds')
+        parser.add_argument('--interval', type=int, default=30)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_reservations(limit=options['batch_size'])
+            self.stdout.write(f"Expired {expired} reservations")
+            if not options['loop']:
+                break
+            # Còn nhiều reservation quá hạn thì quét tiếp ngay
+            if expired < options['batch_size']:
+                time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from products.bulk import FORMATS, export_products
+
+
+class Command(BaseCommand):
+    help = 'Streams every product to CSV or JSONL without loading the table into memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', default='-', help='File path, or - for stdout')
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            self.write(sys.stdout, options['format'])
+        else:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                self.write(output, options['format'])
+
+    def write(self, output, file_format):
+        for chunk in export_products(file_format):
+            output.write(chunk)
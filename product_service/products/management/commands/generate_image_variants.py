@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from products.images import get_executor, generate_variants
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Generates thumbnail/WebP variants for products whose images have none (e.g. after bulk seeding)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate variants for every product image')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            products = products.filter(image_variants={})
+
+        futures = [
+            get_executor().submit(generate_variants, product_id, name, variants if options['all'] else None)
+            for product_id, name, variants in products.values_list('id', 'image', 'image_variants').iterator()
+        ]
+        for done, future in enumerate(futures, 1):
+            future.result()
+            if done % 1000 == 0:
+                self.stdout.write(f"{done}/{len(futures)} products")
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {len(futures)} products"))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import FORMATS, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = 'Upserts products from a CSV or JSONL file (by id, else by sku) in batched transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            file_format = options['format'] or detect_format(options['path'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.perf_counter()
+
+        def progress(report):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{report.processed} rows ({report.created} created, {report.updated} updated, "
+                              f"{report.failed} failed) in {elapsed:.1f}s, {report.processed / elapsed:.0f} rows/s")
+
+        with open(options['path'], 'rb') as stream:
+            report = import_products(stream, file_format, options['batch_size'], progress)
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if report.failed > len(report.errors):
+            self.stderr.write(f"... and {report.failed - len(report.errors)} more errors")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created + report.updated} of {report.processed} rows"
+        ))
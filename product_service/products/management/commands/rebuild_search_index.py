@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Recomputes product search vectors (needed after bulk imports, which bypass signals)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        count = update_search_vectors(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated search vectors for {count} products"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.facets import refresh_facets
+
+
+class Command(BaseCommand):
+    help = 'Recomputes catalog facet counts from the product table (run periodically or after bulk imports)'
+
+    def handle(self, *args, **options):
+        rows = refresh_facets()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {rows} facet rows"))
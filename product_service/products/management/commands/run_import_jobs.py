@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.bulk import run_import_jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs pending product import jobs uploaded through /api/product-imports/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling every --interval seconds')
+        parser.add_argument('--interval', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        while True:
+            ran = run_import_jobs(batch_size=options['batch_size'])
+            if ran:
+                self.stdout.write(f"Ran {ran} import jobs")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
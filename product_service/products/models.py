@@ -1,4 +1,38 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, models
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+import uuid
+
+SEARCH_CONFIG = 'english'
+# Cột đi vào search_vector
+SEARCH_FIELDS = {'name', 'description'}
+
+
+def search_vector(name='name', description='description'):
+    # tsvector của name (trọng số A) + description (B); nhận tên cột hoặc expression
+    return (
+        SearchVector(name, weight='A', config=SEARCH_CONFIG)
+        + SearchVector(description, weight='B', config=SEARCH_CONFIG)
+    )
+
+
+@deconstructible
+class ImportFileStorage(FileSystemStorage):
+    # Thư mục PRODUCT_IMPORT_ROOT, ngoài MEDIA_ROOT: file import chứa giá và tồn kho
+    # nên không được public qua /media/
+    @cached_property
+    def base_location(self):
+        return settings.PRODUCT_IMPORT_ROOT
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'PRODUCT_IMPORT_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
 
 
 class Category(models.Model):
@@ -19,8 +53,113 @@ class Product(models.Model):
     stock = models.PositiveIntegerField(default=0)
     category = models.ForeignKey(Category, related_name='products', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Tên file các biến thể {cỡ: {đuôi file: tên}}, do products/images.py tạo ở nền
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Mã hàng của bộ phận merchandising, dùng làm khóa upsert khi import file
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # tsvector của name (trọng số A) + description (B), ghi cùng câu INSERT/UPDATE của save()
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        # Postgres: tính search_vector từ giá trị đang lưu ngay trong câu lệnh của save(),
+        # bỏ qua khi update_fields không chạm tới name/description
+        update_fields = kwargs.get('update_fields')
+        indexed = connection.vendor == 'postgresql' and (
+            update_fields is None or not SEARCH_FIELDS.isdisjoint(update_fields))
+        if indexed:
+            self.search_vector = search_vector(models.Value(self.name), models.Value(self.description))
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_vector'}
+        super().save(*args, **kwargs)
+        if indexed:
+            # Giá trị thật nằm trong database: coi như field bị defer thay vì giữ expression
+            del self.__dict__['search_vector']
+
+    class Meta:
+        # Phục vụ phân trang theo con trỏ (created_at, id)
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['category', '-created_at', '-id']),
+            GinIndex(fields=['search_vector']),
+        ]
+
+
+class ProductFacet(models.Model):
+    # Số sản phẩm theo (category, khoảng giá), cập nhật dần bởi signals.py
+    # và tính lại toàn bộ bằng `manage.py refresh_facets`
+    category = models.ForeignKey(Category, related_name='facets', on_delete=models.CASCADE)
+    price_bucket = models.PositiveSmallIntegerField()
+    product_count = models.IntegerField(default=0)
+    in_stock_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.category_id} / bucket {self.price_bucket}: {self.product_count}"
+
+    class Meta:
+        unique_together = ('category', 'price_bucket')
+
+
+class StockReservation(models.Model):
+    # Giữ hàng tạm thời: stock bị trừ ngay khi reserve, trả lại khi release/hết hạn
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('committed', 'Committed'),
+        ('released', 'Released'),
+        ('expired', 'Expired'),
+    ]
+
+    reservation_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Reservation {self.reservation_id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+
+class StockReservationItem(models.Model):
+    reservation = models.ForeignKey(StockReservation, related_name='items', on_delete=models.CASCADE)
+    # Xoá sản phẩm không bị chặn bởi các lần giữ hàng cũ; item chỉ mất liên kết
+    product = models.ForeignKey(Product, related_name='reservation_items', null=True, on_delete=models.SET_NULL)
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id}"
+
+
+class ProductImportJob(models.Model):
+    # Một lần import file từ endpoint admin, chạy bởi worker `manage.py run_import_jobs` (products/bulk.py)
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    job_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    file = models.FileField(storage=ImportFileStorage(), blank=True)
+    file_format = models.CharField(max_length=5)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    processed = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Cập nhật mỗi lần báo tiến độ; job "running" lâu không cập nhật là worker đã chết
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"Import {self.job_id} ({self.status})"
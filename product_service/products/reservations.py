@@ -0,0 +1,151 @@
+import logging
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import cache as product_cache
+from .events import publish_on_commit
+from .facets import adjust_in_stock, price_bucket
+from .models import Product, StockReservation, StockReservationItem
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationError(Exception):
+    pass
+
+
+class InsufficientStock(ReservationError):
+    def __init__(self, product_id, requested):
+        super().__init__(f"Insufficient stock for product {product_id}")
+        self.product_id = product_id
+        self.requested = requested
+
+
+class ReservationNotPending(ReservationError):
+    def __init__(self, reservation):
+        super().__init__(f"Reservation {reservation.reservation_id} is {reservation.status}")
+        self.reservation = reservation
+
+
+def normalize_items(items):
+    # Gộp các dòng trùng sản phẩm và sắp xếp theo product_id:
+    # mọi transaction khóa các dòng Product theo cùng một thứ tự nên không deadlock
+    quantities = {}
+    for item in items:
+        product_id = int(item['product_id'])
+        quantity = int(item['quantity'])
+        if quantity <= 0:
+            raise ValueError('quantity must be positive')
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if not quantities:
+        raise ValueError('items must not be empty')
+    return OrderedDict(sorted(quantities.items()))
+
+
+def change_stock(product_id, delta, in_stock_deltas=None):
+    # Một câu UPDATE có điều kiện; trả về False nếu không đủ hàng (hoặc không có sản phẩm).
+    # Khi đổi stock nhiều sản phẩm trong một transaction, truyền in_stock_deltas rồi gọi
+    # adjust_in_stock sau cùng: khóa dòng facet xen giữa các dòng Product có thể gây deadlock
+    queryset = Product.objects.filter(pk=product_id)
+    if delta < 0:
+        queryset = queryset.filter(stock__gte=-delta)
+    # updated_at là version của event product.changed (events.py)
+    if not queryset.update(stock=F('stock') + delta, updated_at=timezone.now()):
+        return False
+
+    # update() không gửi signal: tự cập nhật facet "còn hàng", cache của sản phẩm,
+    # và báo cho bản sao ở service khác khi sản phẩm hết hàng/có hàng trở lại
+    stock, category_id, price = Product.objects.filter(pk=product_id).values_list(
+        'stock', 'category_id', 'price').get()
+    change = -1 if delta < 0 and stock == 0 else 1 if delta > 0 and stock == delta else 0
+    if change:
+        key = (category_id, price_bucket(price))
+        if in_stock_deltas is None:
+            adjust_in_stock({key: change})
+        else:
+            in_stock_deltas[key] = in_stock_deltas.get(key, 0) + change
+        publish_on_commit(product_ids=[product_id])
+    product_cache.invalidate(product_cache.product_version(product_id))
+    return True
+
+
+def reserve(items, ttl):
+    quantities = normalize_items(items)
+    in_stock_deltas = {}
+    with transaction.atomic():
+        for product_id, quantity in quantities.items():
+            if not change_stock(product_id, -quantity, in_stock_deltas):
+                raise InsufficientStock(product_id, quantity)
+        adjust_in_stock(in_stock_deltas)
+
+        reservation = StockReservation.objects.create(expires_at=timezone.now() + timedelta(seconds=ttl))
+        StockReservationItem.objects.bulk_create([
+            StockReservationItem(reservation=reservation, product_id=product_id, quantity=quantity)
+            for product_id, quantity in quantities.items()
+        ])
+    return reservation
+
+
+def finish(reservation_id, status, only_expired=False):
+    # Chuyển trạng thái pending -> status bằng UPDATE có điều kiện, nên mỗi reservation
+    # chỉ được commit/release/expire đúng một lần kể cả khi có nhiều request đồng thời
+    with transaction.atomic():
+        pending = StockReservation.objects.filter(reservation_id=reservation_id, status='pending')
+        if only_expired:
+            pending = pending.filter(expires_at__lte=timezone.now())
+        elif status == 'committed':
+            pending = pending.filter(expires_at__gt=timezone.now())
+        changed = pending.update(status=status, updated_at=timezone.now())
+
+        reservation = StockReservation.objects.get(reservation_id=reservation_id)
+        if not changed:
+            raise ReservationNotPending(reservation)
+
+        if status != 'committed':
+            # Sản phẩm đã bị xoá (product_id NULL) thì không còn stock để trả
+            in_stock_deltas = {}
+            for item in reservation.items.filter(product__isnull=False).order_by('product_id'):
+                change_stock(item.product_id, item.quantity, in_stock_deltas)
+            adjust_in_stock(in_stock_deltas)
+    return reservation
+
+
+def commit(reservation_id):
+    try:
+        return finish(reservation_id, 'committed')
+    except ReservationNotPending as error:
+        if error.reservation.status != 'pending':
+            raise
+    # Đã quá hạn nhưng chưa được dọn: trả hàng ngay rồi báo lỗi
+    try:
+        reservation = finish(reservation_id, 'expired', only_expired=True)
+    except ReservationNotPending as error:
+        reservation = error.reservation
+    raise ReservationNotPending(reservation)
+
+
+def release(reservation_id):
+    return finish(reservation_id, 'released')
+
+
+def expire_reservations(limit=500):
+    # Trả hàng của các reservation quá hạn mà chưa commit
+    expired_ids = list(
+        StockReservation.objects.filter(status='pending', expires_at__lte=timezone.now())
+        .order_by('expires_at').values_list('reservation_id', flat=True)[:limit]
+    )
+    expired = 0
+    for reservation_id in expired_ids:
+        try:
+            finish(reservation_id, 'expired', only_expired=True)
+            expired += 1
+        except ReservationNotPending:
+            # Đã được commit/release bởi request khác trong lúc này
+            pass
+    if expired:
+        logger.info(f"Expired {expired} stock reservations")
+    return expired
@@ -0,0 +1,170 @@
+import heapq
+import logging
+import re
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+from rest_framework.pagination import PageNumberPagination
+
+from .models import SEARCH_CONFIG, Product, search_vector
+
+logger = logging.getLogger(__name__)
+
+# Trọng số giống Postgres: A = 1.0 cho name, B = 0.4 cho description
+NAME_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4
+TOKEN_RE = re.compile(r'\w+')
+
+
+def use_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def update_search_vectors(queryset=None, batch_size=5000):
+    # Tính lại search_vector cho các sản phẩm (bulk_create/update không gửi signal)
+    if not use_postgres():
+        search_index.reset()
+        return 0
+    queryset = Product.objects.all() if queryset is None else queryset
+    ids = list(queryset.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), batch_size):
+        Product.objects.filter(id__in=ids[start:start + batch_size]).update(search_vector=search_vector())
+    return len(ids)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+# Inverted index thay cho tsvector khi database không phải Postgres (chạy dev/test bằng SQLite).
+# Mỗi process giữ một bản riêng, được cập nhật qua signal (xem signals.py).
+class InMemorySearchIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.built = False
+            self.postings = defaultdict(dict)
+            self.docs = {}
+
+    def ensure_built(self):
+        if self.built:
+            return
+        rows = Product.objects.values_list('id', 'name', 'description', 'category_id', 'price')
+        with self.lock:
+            if self.built:
+                return
+            for row in rows.iterator(chunk_size=5000):
+                self._add(*row)
+            self.built = True
+            logger.info(f"Built in-memory product search index with {len(self.docs)} products")
+
+    def add(self, product):
+        with self.lock:
+            if self.built:
+                self._remove(product.id)
+                self._add(product.id, product.name, product.description, product.category_id, product.price)
+
+    def remove(self, product_id):
+        with self.lock:
+            if self.built:
+                self._remove(product_id)
+
+    def _add(self, product_id, name, description, category_id, price):
+        scores = defaultdict(float)
+        for token in tokenize(name):
+            scores[token] += NAME_WEIGHT
+        for token in tokenize(description):
+            scores[token] += DESCRIPTION_WEIGHT
+        for token, score in scores.items():
+            self.postings[token][product_id] = score
+        self.docs[product_id] = (category_id, Decimal(price), list(scores))
+
+    def _remove(self, product_id):
+        doc = self.docs.pop(product_id, None)
+        if doc is None:
+            return
+        for token in doc[2]:
+            postings = self.postings.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self.postings[token]
+
+    def search(self, query, category_id=None, min_price=None, max_price=None):
+        # Trả về danh sách id theo rank giảm dần; mọi từ trong query đều phải khớp
+        self.ensure_built()
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return RankedIds({})
+        with self.lock:
+            postings = sorted((self.postings.get(token, {}) for token in tokens), key=len)
+            scores = dict(postings[0])
+            for other in postings[1:]:
+                scores = {pid: score + other[pid] for pid, score in scores.items() if pid in other}
+            if category_id is not None or min_price is not None or max_price is not None:
+                docs = self.docs
+                scores = {
+                    pid: score for pid, score in scores.items()
+                    if (category_id is None or docs[pid][0] == category_id)
+                    and (min_price is None or docs[pid][1] >= min_price)
+                    and (max_price is None or docs[pid][1] <= max_price)
+                }
+        return RankedIds(scores)
+
+
+class RankedIds:
+    # Danh sách id theo rank giảm dần, chỉ sắp xếp phần cần cho trang được yêu cầu (heapq)
+    def __init__(self, scores):
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(len(self.scores))
+        if start >= stop:
+            return []
+        top = heapq.nlargest(stop, zip(self.scores.values(), self.scores.keys()))
+        return [product_id for _, product_id in top[start:stop]]
+
+
+search_index = InMemorySearchIndex()
+
+
+class SearchPagination(PageNumberPagination):
+    # Kết quả xếp theo độ liên quan nên dùng số trang, không dùng con trỏ created_at
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'PAGINATION_PAGE_SIZE', 20)
+        self.max_page_size = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 100)
+
+
+# Postgres: trả về queryset đã xếp theo rank; database khác: danh sách id từ index trong bộ nhớ
+def search_products(queryset, query, category_id=None, min_price=None, max_price=None):
+    if not use_postgres():
+        return search_index.search(query, category_id, min_price, max_price)
+
+    if category_id is not None:
+        queryset = queryset.filter(category_id=category_id)
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+
+    search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+    return (
+        queryset.filter(search_vector=search_query)
+        .annotate(rank=SearchRank(F('search_vector'), search_query))
+        .order_by('-rank', '-id')
+    )
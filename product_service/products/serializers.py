@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Category, Product
+from django.conf import settings
+from .images import variant_urls
+from .models import Category, Product, ProductImportJob, StockReservation, StockReservationItem
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -9,11 +11,67 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class ProductSerializer(serializers.ModelSerializer):
+    # URL ảnh thumbnail/medium/large dạng JPEG và WebP; rỗng cho tới khi worker nền tạo xong
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['search_vector']
+
+    def get_image_variants(self, instance):
+        return variant_urls(instance.image_variants, self.context.get('request'))
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['category'] = CategorySerializer(instance.category).data
-        return representation
\ No newline at end of file
+        representation['category'] = self.category_representation(instance.category)
+        return representation
+
+    def category_representation(self, category):
+        # Chỉ có vài category: serialize mỗi category một lần cho cả danh sách
+        # (cache đặt trên serializer gốc nên dùng chung cho mọi phần tử của many=True)
+        root = self.root
+        if not hasattr(root, '_category_cache'):
+            root._category_cache = {}
+        cache = root._category_cache
+        if category.pk not in cache:
+            cache[category.pk] = CategorySerializer(category).data
+        return cache[category.pk]
+
+
+class ProductBatchSerializer(serializers.ModelSerializer):
+    # Projection cố định cho batch lookup của các service khác
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'price', 'stock', 'image', 'category']
+
+
+class StockReservationItemSerializer(serializers.ModelSerializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = StockReservationItem
+        fields = ['product_id', 'quantity']
+
+
+class StockReservationSerializer(serializers.ModelSerializer):
+    items = StockReservationItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = StockReservation
+        fields = ['reservation_id', 'status', 'expires_at', 'created_at', 'items']
+
+
+class ReserveStockSerializer(serializers.Serializer):
+    items = StockReservationItemSerializer(many=True, allow_empty=False)
+    ttl_seconds = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_ttl_seconds(self, value):
+        return min(value, settings.RESERVATION_MAX_TTL)
+
+
+class ProductImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductImportJob
+        fields = ['job_id', 'file_format', 'status', 'processed', 'created', 'updated', 'failed', 'errors',
+                  'created_at', 'finished_at']
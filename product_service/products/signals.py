@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache as product_cache
+from .events import publish_on_commit
+from .facets import facet_key, move
+from .images import delete_variants, schedule_variants
+from .models import Category, Product
+from .search import search_index, use_postgres
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    # Postgres: search_vector đã được ghi cùng câu lệnh bởi Product.save()
+    if not use_postgres():
+        search_index.add(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    if not use_postgres():
+        search_index.remove(instance.pk)
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_state(sender, instance, **kwargs):
+    # Giá trị cũ trong database: ô facet cũ và ảnh cũ (để biết có cần tạo lại biến thể)
+    previous = None
+    if instance.pk is not None:
+        previous = Product.objects.filter(pk=instance.pk).values_list(
+            'category_id', 'price', 'stock', 'image', 'image_variants').first()
+    instance._previous_facet_key = facet_key(*previous[:3]) if previous else None
+    instance._previous_image = previous[3:] if previous else ('', {})
+
+
+@receiver(post_save, sender=Product)
+def update_facets(sender, instance, **kwargs):
+    move(getattr(instance, '_previous_facet_key', None),
+         facet_key(instance.category_id, instance.price, instance.stock))
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_facets(sender, instance, **kwargs):
+    move(facet_key(instance.category_id, instance.price, instance.stock), None)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    product_cache.invalidate(product_cache.product_version(instance.pk))
+
+
+@receiver(post_save, sender=Product)
+def publish_product_change(sender, instance, **kwargs):
+    publish_on_commit(product_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def publish_product_deletion(sender, instance, **kwargs):
+    publish_on_commit(deleted_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    # Sản phẩm nhúng category nên version category nằm trong key của cả sản phẩm
+    product_cache.invalidate(product_cache.CATEGORY_VERSION)
+
+
+@receiver(post_save, sender=Product)
+def refresh_image_variants(sender, instance, **kwargs):
+    previous_name, previous_variants = getattr(instance, '_previous_image', ('', {}))
+    name = instance.image.name if instance.image else ''
+    if name == (previous_name or ''):
+        return
+    if name:
+        transaction.on_commit(lambda: schedule_variants(instance.pk, name, previous_variants))
+    else:
+        Product.objects.filter(pk=instance.pk).update(image_variants={})
+        transaction.on_commit(lambda: delete_variants(previous_variants))
+
+
+@receiver(post_delete, sender=Product)
+def remove_image_variants(sender, instance, **kwargs):
+    variants = instance.image_variants
+    transaction.on_commit(lambda: delete_variants(variants))
@@ -1,3 +1,624 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import cache as product_cache
+from .bulk import claim_next_import_job, import_products, run_import_jobs
+from .events import version_of
+from .facets import refresh_facets
+from .images import generate_variants, render_variants
+from .models import Category, Product, ProductFacet, ProductImportJob, StockReservation, StockReservationItem
+from .reservations import InsufficientStock, change_stock, expire_reservations, reserve
+from .search import search_index
+
+# Test không có RabbitMQ: tắt event product.changed, ProductEventTests bật lại với publisher giả
+no_product_events = override_settings(PRODUCT_EVENTS_ENABLED=False)
+
+
+def setUpModule():
+    no_product_events.enable()
+
+
+def tearDownModule():
+    no_product_events.disable()
+
+
+class ProductPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.books = Category.objects.create(name='Books')
+        self.toys = Category.objects.create(name='Toys')
+        for i in range(5):
+            Product.objects.create(name=f'Book {i}', description='', price='10.00', category=self.books)
+        Product.objects.create(name='Toy', description='', price='5.00', category=self.toys)
+
+    @override_settings(PAGINATION_PAGE_SIZE=2)
+    def test_walks_every_product_once_newest_first(self):
+        seen = []
+        response = self.client.get('/api/products/')
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        expected = list(Product.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    @override_settings(PAGINATION_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/products/', {'page_size': 50})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_by_category_is_paginated(self):
+        response = self.client.get('/api/products/by_category/', {'category_id': self.toys.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.data['results']], ['Toy'])
+        self.assertIsNone(response.data['next'])
+
+
+class ProductQueryCountTests(TestCase):
+    # Hồi quy N+1: số truy vấn không được tăng theo số sản phẩm
+    def setUp(self):
+        caches['products'].clear()
+        self.client = APIClient()
+        self.categories = [Category.objects.create(name=f'Category {i}') for i in range(3)]
+        for i in range(15):
+            Product.objects.create(name=f'Product {i}', description='', price='1.00',
+                                   category=self.categories[i % 3])
+
+    def test_list_runs_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/', {'page_size': 15})
+        self.assertEqual(len(response.data['results']), 15)
+        self.assertEqual(response.data['results'][0]['category']['name'], 'Category 2')
+
+    def test_by_category_runs_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/by_category/', {'category_id': self.categories[0].id})
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_retrieve_runs_one_query(self):
+        product = Product.objects.first()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/products/{product.id}/')
+        self.assertEqual(response.data['category']['id'], product.category_id)
+
+
+class ProductBatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Books')
+        self.products = [
+            Product.objects.create(name=f'Book {i}', description='', price='10.00', stock=i, category=category)
+            for i in range(3)
+        ]
+
+    def test_get_returns_requested_order_and_missing_ids(self):
+        first, _, third = self.products
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/batch/', {'ids': f'{third.id},999,{first.id},{third.id}'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['products']], [third.id, first.id])
+        self.assertEqual(set(response.data['products'][0]), {'id', 'name', 'price', 'stock', 'image', 'category'})
+        self.assertEqual(response.data['missing'], [999])
+
+    def test_post_accepts_json_list(self):
+        ids = [product.id for product in self.products]
+        response = self.client.post('/api/products/batch/', {'ids': ids}, format='json')
+        self.assertEqual([item['id'] for item in response.data['products']], ids)
+        self.assertEqual(response.data['missing'], [])
+
+    def test_rejects_malformed_ids(self):
+        response = self.client.get('/api/products/batch/', {'ids': '1,abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        search_index.reset()
+        self.client = APIClient()
+        self.books = Category.objects.create(name='Books')
+        self.garden = Category.objects.create(name='Garden')
+        self.novel = Product.objects.create(name='Python novel', description='A story about a snake',
+                                            price='15.00', category=self.books)
+        self.manual = Product.objects.create(name='Garden manual', description='Python care and feeding',
+                                             price='40.00', category=self.books)
+        self.hose = Product.objects.create(name='Garden hose', description='Twenty metres',
+                                           price='25.00', category=self.garden)
+
+    def search(self, **params):
+        response = self.client.get('/api/products/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search(q='python'), [self.novel.id, self.manual.id])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search(q='garden python'), [self.manual.id])
+
+    def test_category_and_price_filters(self):
+        self.assertEqual(self.search(q='garden', category_id=self.garden.id), [self.hose.id])
+        self.assertEqual(self.search(q='python', min_price='20', max_price='50'), [self.manual.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.search(q='python')
+        self.hose.name = 'Python hose'
+        self.hose.save()
+        self.novel.delete()
+        self.assertEqual(self.search(q='python'), [self.hose.id, self.manual.id])
+
+    def test_results_are_paginated(self):
+        response = self.client.get('/api/products/search/', {'q': 'garden', 'page_size': 1})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_requires_query(self):
+        response = self.client.get('/api/products/search/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_vector_is_not_exposed(self):
+        responses = [
+            self.client.get('/api/products/').data['results'],
+            [self.client.get(f'/api/products/{self.novel.id}/').data],
+            self.client.get('/api/products/by_category/', {'category_id': self.books.id}).data['results'],
+            self.client.get('/api/products/search/', {'q': 'python'}).data['results'],
+        ]
+        for items in responses:
+            self.assertTrue(items)
+            for item in items:
+                self.assertNotIn('search_vector', item)
+
+
+class ProductFacetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.books = Category.objects.create(name='Books')
+        self.garden = Category.objects.create(name='Garden')
+        self.cheap = Product.objects.create(name='Cheap book', description='', price='10.00', stock=3,
+                                            category=self.books)
+        self.sold_out = Product.objects.create(name='Rare book', description='', price='120.00', stock=0,
+                                               category=self.books)
+        self.hose = Product.objects.create(name='Hose', description='', price='30.00', stock=1,
+                                           category=self.garden)
+
+    def facets(self, **params):
+        response = self.client.get('/api/products/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counts_per_category_price_bucket_and_stock(self):
+        data = self.facets()
+        self.assertEqual((data['total'], data['in_stock']), (3, 2))
+        self.assertEqual([(c['name'], c['count'], c['in_stock']) for c in data['categories']],
+                         [('Books', 2, 1), ('Garden', 1, 1)])
+        self.assertEqual([b['count'] for b in data['price_buckets']], [1, 1, 0, 1, 0, 0, 0])
+
+        books = self.facets(category_id=self.books.id)
+        self.assertEqual((books['total'], books['in_stock']), (2, 1))
+
+    def test_incremental_updates_match_full_refresh(self):
+        self.cheap.price = '600.00'
+        self.cheap.category = self.garden
+        self.cheap.save()
+        self.sold_out.stock = 5
+        self.sold_out.save()
+        self.hose.delete()
+        incremental = self.facets()
+
+        refresh_facets()
+        self.assertEqual(self.facets(), incremental)
+        self.assertEqual((incremental['total'], incremental['in_stock']), (2, 2))
+
+    def test_deleting_a_category_with_products_leaves_no_facets(self):
+        response = self.client.delete(f'/api/categories/{self.books.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(ProductFacet.objects.filter(category_id=self.books.id).exists())
+        self.assertEqual(self.facets()['total'], 1)
+
+    def test_removal_never_creates_facet_rows(self):
+        ProductFacet.objects.all().delete()
+        self.hose.delete()
+        self.assertFalse(ProductFacet.objects.exists())
+
+    def test_query_count_does_not_depend_on_catalog_size(self):
+        for i in range(20):
+            Product.objects.create(name=f'Extra {i}', description='', price='5.00', category=self.garden)
+        with self.assertNumQueries(2):
+            self.facets()
+
+
+class ProductCacheTests(TestCase):
+    def setUp(self):
+        caches['products'].clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Books')
+        self.product = Product.objects.create(name='Novel', description='', price='10.00', category=self.category)
+        self.url = f'/api/products/{self.product.id}/'
+
+    def test_second_read_is_served_from_cache(self):
+        hits = product_cache.stats.hits
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['name'], 'Novel')
+        self.assertEqual(product_cache.stats.hits, hits + 1)
+
+    def test_product_save_invalidates_after_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Renamed'
+            self.product.save()
+        self.assertEqual(self.client.get(self.url).data['name'], 'Renamed')
+
+    def test_category_change_invalidates_embedded_category(self):
+        self.client.get(self.url)
+        self.client.get('/api/categories/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Fiction'
+            self.category.save()
+        self.assertEqual(self.client.get(self.url).data['category']['name'], 'Fiction')
+        self.assertEqual([c['name'] for c in self.client.get('/api/categories/').data], ['Fiction'])
+
+    def test_missing_product_is_not_cached(self):
+        self.assertEqual(self.client.get('/api/products/999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/products/999/').status_code, 404)
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Books')
+        self.book = Product.objects.create(name='Book', description='', price='10.00', stock=5, category=category)
+        self.pen = Product.objects.create(name='Pen', description='', price='1.00', stock=1, category=category)
+
+    def reserve(self, *items, **extra):
+        return self.client.post('/api/reservations/', {
+            'items': [{'product_id': product.id, 'quantity': quantity} for product, quantity in items],
+            **extra,
+        }, format='json')
+
+    def stock(self, product):
+        product.refresh_from_db()
+        return product.stock
+
+    def test_reserve_then_commit_keeps_stock_taken(self):
+        response = self.reserve((self.book, 2), (self.pen, 1))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((self.stock(self.book), self.stock(self.pen)), (3, 0))
+
+        response = self.client.post(f"/api/reservations/{response.data['reservation_id']}/commit/")
+        self.assertEqual(response.data['status'], 'committed')
+        self.assertEqual(self.stock(self.book), 3)
+
+    def test_multi_item_reservation_is_all_or_nothing(self):
+        response = self.reserve((self.book, 2), (self.pen, 2))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['product_id'], self.pen.id)
+        self.assertEqual((self.stock(self.book), self.stock(self.pen)), (5, 1))
+
+    def test_facets_are_locked_after_every_product_row(self):
+        cup = Product.objects.create(name='Cup', description='', price='1.00', stock=1, category=self.pen.category)
+        with CaptureQueriesContext(connection) as queries:
+            reservation_id = self.reserve((self.pen, 1), (cup, 1)).data['reservation_id']
+        updates = [query['sql'].split()[1].strip('"') for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE')]
+        self.assertEqual(updates, ['products_product', 'products_product', 'products_productfacet'])
+        # Book vẫn còn hàng trong cùng khoảng giá
+        facet = ProductFacet.objects.get(category=self.pen.category, price_bucket=0)
+        self.assertEqual(facet.in_stock_count, 1)
+
+        self.client.post(f'/api/reservations/{reservation_id}/release/')
+        facet.refresh_from_db()
+        self.assertEqual(facet.in_stock_count, 3)
+
+    def test_release_returns_stock_once(self):
+        reservation_id = self.reserve((self.book, 4)).data['reservation_id']
+        self.assertEqual(self.client.post(f'/api/reservations/{reservation_id}/release/').status_code, 200)
+        self.assertEqual(self.client.post(f'/api/reservations/{reservation_id}/release/').status_code, 409)
+        self.assertEqual(self.client.post(f'/api/reservations/{reservation_id}/commit/').status_code, 409)
+        self.assertEqual(self.stock(self.book), 5)
+
+    def test_reserved_product_can_be_deleted(self):
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_authenticate(staff)
+        reservation_id = self.reserve((self.book, 2), (self.pen, 1)).data['reservation_id']
+
+        self.assertEqual(self.client.delete(f'/api/products/{self.book.id}/').status_code, 204)
+        item = StockReservationItem.objects.get(reservation__reservation_id=reservation_id, product__isnull=True)
+        self.assertEqual(item.quantity, 2)
+        self.assertEqual(self.client.post(f'/api/reservations/{reservation_id}/release/').status_code, 200)
+        self.assertEqual(self.stock(self.pen), 1)
+
+    def test_expired_holds_are_returned(self):
+        reservation = reserve([{'product_id': self.book.id, 'quantity': 3}], ttl=60)
+        StockReservation.objects.filter(pk=reservation.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(expire_reservations(), 1)
+        self.assertEqual(self.stock(self.book), 5)
+        response = self.client.post(f'/api/reservations/{reservation.reservation_id}/commit/')
+        self.assertEqual(response.data['status'], 'expired')
+
+    def test_commit_after_expiry_returns_stock(self):
+        reservation = reserve([{'product_id': self.book.id, 'quantity': 3}], ttl=60)
+        StockReservation.objects.filter(pk=reservation.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.client.post(f'/api/reservations/{reservation.reservation_id}/commit/')
+        self.assertEqual((response.status_code, response.data['status']), (409, 'expired'))
+        self.assertEqual(self.stock(self.book), 5)
+
+    def test_stock_changes_update_in_stock_facet(self):
+        refresh_facets()
+        reserve([{'product_id': self.pen.id, 'quantity': 1}], ttl=60)
+        self.assertEqual(self.client.get('/api/products/facets/').data['in_stock'], 1)
+
+
+class StockReservationConcurrencyTests(TransactionTestCase):
+    workers = 8
+    attempts = 25
+
+    def test_parallel_reservers_never_oversell(self):
+        category = Category.objects.create(name='Hot items')
+        products = [
+            Product.objects.create(name=f'Hot {i}', description='', price='5.00', stock=50, category=category)
+            for i in range(3)
+        ]
+        successes = []
+        errors = []
+
+        def reserver(worker):
+            try:
+                for attempt in range(self.attempts):
+                    # Thứ tự item khác nhau giữa các worker; reserve() tự sắp xếp để tránh deadlock
+                    items = [{'product_id': p.id, 'quantity': 1 + (worker + attempt) % 2}
+                             for p in (products if worker % 2 else reversed(products))]
+                    while True:
+                        try:
+                            reserve(items, ttl=60)
+                            successes.append(items[0]['quantity'])
+                        except InsufficientStock:
+                            pass
+                        except OperationalError:
+                            # SQLite khóa cả bảng thay vì từng dòng: transaction đã rollback, thử lại
+                            if connection.vendor != 'sqlite':
+                                raise
+                            time.sleep(0.001)
+                            continue
+                        break
+            except Exception as e:  # noqa: BLE001 - báo lỗi của thread về test
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserver, args=(worker,)) for worker in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        for product in products:
+            product.refresh_from_db()
+            self.assertGreaterEqual(product.stock, 0)
+            self.assertEqual(product.stock + sum(successes), 50)
+
+
+class ProductImportExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', is_staff=True))
+        self.books = Category.objects.create(name='Books')
+        self.existing = Product.objects.create(name='Old name', description='', price='1.00', stock=1,
+                                               category=self.books, sku='BOOK-1')
+
+    def test_upserts_by_sku_and_id_in_batches(self):
+        rows = [
+            {'sku': 'BOOK-1', 'name': 'New name', 'price': '12.50', 'stock': 4, 'category': 'Books'},
+            {'sku': 'TOY-1', 'name': 'Kite', 'price': '8', 'stock': 2, 'category': 'Toys'},
+            {'id': self.existing.id, 'name': 'Newest name', 'price': '13.00', 'stock': 5, 'category': 'Books'},
+            {'sku': 'BAD-1', 'name': 'Broken', 'price': 'free', 'category': 'Books'},
+        ]
+        stream = io.BytesIO('\n'.join(json.dumps(row) for row in rows).encode() + b'\n{oops\n')
+
+        report = import_products(stream, 'jsonl', batch_size=2)
+
+        self.assertEqual((report.processed, report.created, report.updated, report.failed), (5, 1, 2, 2))
+        self.assertEqual([error['line'] for error in report.errors], [4, 5])
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.name, self.existing.stock), ('Newest name', 5))
+        self.assertEqual(Product.objects.get(sku='TOY-1').category.name, 'Toys')
+
+    def test_export_round_trips_through_import(self):
+        response = self.client.get('/api/products/export/', {'file_format': 'csv'})
+        exported = b''.join(response.streaming_content)
+        self.assertTrue(exported.startswith(b'id,sku,name,'))
+
+        Product.objects.filter(pk=self.existing.pk).update(name='Changed')
+        report = import_products(io.BytesIO(exported), 'csv')
+        self.assertEqual((report.created, report.updated, report.failed), (0, 1, 0))
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, 'Old name')
+
+    def test_upload_is_stored_privately_and_run_by_the_worker(self):
+        upload = SimpleUploadedFile('catalog.csv', b'sku,name,price,stock,category\nPEN-1,Pen,1.00,3,Office\n')
+        with tempfile.TemporaryDirectory() as media, tempfile.TemporaryDirectory() as imports, \
+                override_settings(MEDIA_ROOT=media, PRODUCT_IMPORT_ROOT=imports):
+            response = self.client.post('/api/product-imports/', {'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.data['status'], 'pending')
+            self.assertEqual(os.listdir(media), [])
+            self.assertEqual(len(os.listdir(imports)), 1)
+
+            self.assertEqual(run_import_jobs(), 1)
+            self.assertEqual(os.listdir(imports), [])
+
+        job = self.client.get(f"/api/product-imports/{response.data['job_id']}/").data
+        self.assertEqual((job['status'], job['created'], job['failed']), ('completed', 1, 0))
+        self.assertEqual(run_import_jobs(), 0)
+
+    def test_job_abandoned_by_a_stopped_worker_is_marked_failed(self):
+        with tempfile.TemporaryDirectory() as imports, override_settings(PRODUCT_IMPORT_ROOT=imports):
+            job = ProductImportJob.objects.create(file=ContentFile(b'{}', name='catalog.jsonl'), file_format='jsonl')
+            self.assertEqual(claim_next_import_job(), job)
+            ProductImportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+            self.assertEqual(run_import_jobs(), 0)
+            self.assertEqual(os.listdir(imports), [])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job.errors[-1]['error'], 'Import worker stopped before the job finished')
+
+    def test_bulk_endpoints_require_staff(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/products/export/').status_code, 403)
+        self.assertEqual(self.client.get('/api/product-imports/').status_code, 403)
+
+
+class ProductImageVariantTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Photos')
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=self.media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def upload(self, name, size=(1200, 800)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def create_with_variants(self, name='camera.png'):
+        # Worker nền chạy ngay trong test; connection.close() sẽ làm hỏng transaction của TestCase
+        with mock.patch('products.signals.schedule_variants', side_effect=generate_variants), \
+                mock.patch('products.images.connection'), \
+                self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(name='Camera', description='', price='99.00',
+                                          category=self.category, image=self.upload(name))
+
+    def test_upload_generates_variants_exposed_by_serializer(self):
+        product = self.create_with_variants()
+        product.refresh_from_db()
+        self.assertEqual(set(product.image_variants), {'thumb', 'medium', 'large'})
+
+        thumb = product.image_variants['thumb']['webp']
+        self.assertTrue(thumb.endswith('__thumb.webp'))
+        with Image.open(os.path.join(self.media.name, thumb)) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (150, 100)))
+
+        data = self.client.get(f'/api/products/{product.id}/').data
+        self.assertTrue(data['image_variants']['medium']['jpg'].endswith('__medium.jpg'))
+        self.assertNotIn('search_vector', data)
+
+    def test_removing_image_deletes_variants(self):
+        product = self.create_with_variants()
+        product.refresh_from_db()
+        files = [name for formats in product.image_variants.values() for name in formats.values()]
+
+        product.image = None
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants, {})
+        self.assertFalse(any(os.path.exists(os.path.join(self.media.name, name)) for name in files))
+
+    def test_variant_names_depend_on_source_content(self):
+        for name, color in (('products/abc.png', (10, 10, 10)), ('products/abc.jpg', (250, 250, 250))):
+            buffer = io.BytesIO()
+            Image.new('RGB', (300, 200), color).save(buffer, 'PNG')
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+
+        png, jpg = render_variants('products/abc.png'), render_variants('products/abc.jpg')
+        self.assertNotEqual(png['thumb']['webp'], jpg['thumb']['webp'])
+        self.assertRegex(png['thumb']['webp'], r'^products/abc\.[0-9a-f]{12}__thumb\.webp$')
+        self.assertEqual(render_variants('products/abc.png'), png)
+
+    def test_stale_variants_are_discarded_when_image_changes(self):
+        product = self.create_with_variants()
+        original = product.image.name
+        Product.objects.filter(pk=product.pk).update(image='products/other.png', image_variants={})
+
+        with mock.patch('products.images.connection'):
+            generate_variants(product.id, original)
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants, {})
+
+
+@override_settings(PRODUCT_EVENTS_ENABLED=True)
+class ProductEventTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Kitchen')
+        publisher = mock.patch('products.events.publish_messages')
+        self.publish = publisher.start()
+        self.addCleanup(publisher.stop)
+
+    def published(self):
+        return [message for call in self.publish.call_args_list for message in call.args[2]]
+
+    def test_save_publishes_current_state_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Kettle', description='', price='30.00', stock=2,
+                                             category=self.category)
+        self.assertEqual(self.published(), [{'products': [{
+            'id': product.id, 'name': 'Kettle', 'price': '30.00', 'in_stock': True, 'image': '',
+            'version': version_of(product.updated_at),
+        }], 'deleted': []}])
+
+    def test_stock_running_out_publishes_newer_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Pan', description='', price='20.00', stock=2,
+                                             category=self.category)
+        first = self.published()[0]['products'][0]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change_stock(product.id, -1)
+        self.assertEqual(len(self.published()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            change_stock(product.id, -1)
+
+        last = self.published()[-1]['products'][0]
+        self.assertFalse(last['in_stock'])
+        self.assertGreater(last['version'], first['version'])
+
+    def test_delete_publishes_tombstone(self):
+        product = Product.objects.create(name='Cup', description='', price='3.00', category=self.category)
+        with self.captureOnCommitCallbacks(execute=True):
+            product_id = product.id
+            product.delete()
+        self.assertEqual(self.published()[-1]['deleted'][0]['id'], product_id)
+
+    def test_replica_endpoint_pages_by_id(self):
+        products = [Product.objects.create(name=f'Item {i}', description='', price='1.00', category=self.category)
+                    for i in range(3)]
+        first = self.client.get('/api/products/replica/', {'limit': 2}).data
+        self.assertEqual([row['id'] for row in first['products']], [p.id for p in products[:2]])
+
+        rest = self.client.get('/api/products/replica/', {'after_id': first['next_after_id'], 'limit': 2}).data
+        self.assertEqual([row['id'] for row in rest['products']], [products[2].id])
+        self.assertIsNone(rest['next_after_id'])
@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, ProductViewSet
+from .views import CategoryViewSet, ProductImportJobViewSet, ProductViewSet, StockReservationViewSet
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
 router.register(r'products', ProductViewSet)
+router.register(r'reservations', StockReservationViewSet)
+router.register(r'product-imports', ProductImportJobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
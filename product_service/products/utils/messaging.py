@@ -0,0 +1,49 @@
+import pika
+import json
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_connection():
+    credentials = pika.PlainCredentials(
+        settings.RABBITMQ_USER,
+        settings.RABBITMQ_PASS
+    )
+    parameters = pika.ConnectionParameters(
+        host=settings.RABBITMQ_HOST,
+        port=settings.RABBITMQ_PORT,
+        credentials=credentials
+    )
+    return pika.BlockingConnection(parameters)
+
+
+def publish_messages(exchange_name, routing_key, message_bodies):
+    # Nhiều message trên cùng một kết nối (import hàng loạt gửi một message mỗi chunk)
+    try:
+        connection = get_connection()
+        channel = connection.channel()
+
+        # Create the exchange if it doesn't exist
+        channel.exchange_declare(exchange=exchange_name, exchange_type='topic', durable=True)
+
+        for message_body in message_bodies:
+            channel.basic_publish(
+                exchange=exchange_name,
+                routing_key=routing_key,
+                body=json.dumps(message_body),
+                properties=pika.BasicProperties(
+                    delivery_mode=2,  # make message persistent
+                    content_type='application/json'
+                )
+            )
+
+        connection.close()
+        logger.info(f"Published {len(message_bodies)} messages: {routing_key}")
+    except Exception as e:
+        logger.error(f"Failed to publish message: {e}")
+
+
+def publish_message(exchange_name, routing_key, message_body):
+    publish_messages(exchange_name, routing_key, [message_body])
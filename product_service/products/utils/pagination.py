@@ -0,0 +1,15 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+# Phân trang theo con trỏ (keyset) trên cặp (created_at, id).
+# Mỗi trang chỉ là một truy vấn "WHERE created_at < <con trỏ> ORDER BY created_at DESC, id DESC LIMIT n"
+# trên cột có index, nên trang thứ 10.000 nhanh như trang đầu tiên (không dùng OFFSET).
+# File này được dùng chung, giữ giống hệt nhau ở product, order và payment service.
+class KeysetPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'PAGINATION_PAGE_SIZE', 20)
+        self.max_page_size = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 100)
@@ -1,24 +1,224 @@
-from rest_framework import viewsets
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from .models import Category, Product
-from .serializers import CategorySerializer, ProductSerializer
+from .models import Category, Product, ProductImportJob, StockReservation
+from .serializers import (
+    CategorySerializer, ProductBatchSerializer, ProductImportJobSerializer, ProductSerializer,
+    ReserveStockSerializer, StockReservationSerializer,
+)
+from . import cache as product_cache
+from . import bulk, reservations
+from .events import replica_rows
+from .facets import facet_summary
+from .search import SearchPagination, search_products
+from .utils.pagination import KeysetPagination
+
+MAX_BATCH_IDS = 1000
+MAX_REPLICA_PAGE = 5000
+
+
+def parse_ids(raw):
+    # "1,2,3" (query string) hoặc [1, 2, 3] (JSON body); giữ thứ tự, bỏ trùng
+    if isinstance(raw, str):
+        raw = [part for part in raw.split(',') if part.strip()]
+    if not isinstance(raw, list):
+        raise ValueError('ids must be a list')
+    return list(dict.fromkeys(int(value) for value in raw))
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
+    def list(self, request, *args, **kwargs):
+        data = product_cache.read_through(
+            request, 'categories', [product_cache.CATEGORY_VERSION],
+            lambda: super(CategoryViewSet, self).list(request, *args, **kwargs).data,
+        )
+        return Response(data)
+
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+    queryset = Product.objects.select_related('category').defer('search_vector')
     serializer_class = ProductSerializer
+    pagination_class = KeysetPagination
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            product_id = int(kwargs[self.lookup_field])
+        except ValueError:
+            return super().retrieve(request, *args, **kwargs)
+        data = product_cache.read_through(
+            request, f'product:{product_id}',
+            [product_cache.product_version(product_id), product_cache.CATEGORY_VERSION],
+            lambda: self.get_serializer(self.get_object()).data,
+        )
+        return Response(data)
 
     @action(detail=False, methods=['get'])
     def by_category(self, request):
         category_id = request.query_params.get('category_id')
         if category_id:
-            products = Product.objects.filter(category_id=category_id)
-            serializer = self.get_serializer(products, many=True)
-            return Response(serializer.data)
-        return Response({"error": "Category ID is required"}, status=400)
\ No newline at end of file
+            products = self.get_queryset().filter(category_id=category_id)
+            page = self.paginate_queryset(products)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return Response({"error": "Category ID is required"}, status=400)
+
+    @action(detail=False, methods=['get', 'post'])
+    def batch(self, request):
+        # Lấy nhiều sản phẩm trong một truy vấn; GET ?ids=1,2,3 hoặc POST {"ids": [...]}
+        source = request.query_params if request.method == 'GET' else request.data
+        try:
+            ids = parse_ids(source.get('ids', ''))
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be a comma separated list of integers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > MAX_BATCH_IDS:
+            return Response({"error": f"At most {MAX_BATCH_IDS} ids per request"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fields = ProductBatchSerializer.Meta.fields
+        products = {
+            product.id: product
+            for product in Product.objects.filter(id__in=ids).only(*fields)
+        }
+        found = [products[product_id] for product_id in ids if product_id in products]
+        return Response({
+            'products': ProductBatchSerializer(found, many=True, context=self.get_serializer_context()).data,
+            'missing': [product_id for product_id in ids if product_id not in products],
+        })
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        # ?q=...&category_id=&min_price=&max_price=&page=&page_size=
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            category_id = request.query_params.get('category_id')
+            category_id = int(category_id) if category_id else None
+            min_price = request.query_params.get('min_price')
+            min_price = Decimal(min_price) if min_price else None
+            max_price = request.query_params.get('max_price')
+            max_price = Decimal(max_price) if max_price else None
+        except (ValueError, InvalidOperation):
+            return Response({"error": "category_id, min_price and max_price must be numbers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = search_products(self.get_queryset(), query, category_id, min_price, max_price)
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(results, request, view=self)
+        if page and not isinstance(page[0], Product):
+            # Index trong bộ nhớ trả về id: lấy sản phẩm của trang hiện tại và giữ thứ tự rank
+            products = self.get_queryset().in_bulk(page)
+            page = [products[product_id] for product_id in page if product_id in products]
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        # Số sản phẩm theo category, khoảng giá và còn hàng, đọc từ bảng ProductFacet
+        category_id = request.query_params.get('category_id')
+        try:
+            category_id = int(category_id) if category_id else None
+        except ValueError:
+            return Response({"error": "category_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(facet_summary(category_id))
+
+    @action(detail=False, methods=['get'])
+    def replica(self, request):
+        # Đồng bộ ban đầu cho bản sao sản phẩm ở service khác: ?after_id=&limit=, theo id tăng dần,
+        # cùng định dạng với event product.changed
+        try:
+            after_id = int(request.query_params.get('after_id', 0))
+            limit = min(int(request.query_params.get('limit', 1000)), MAX_REPLICA_PAGE)
+        except ValueError:
+            return Response({"error": "after_id and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if limit <= 0:
+            return Response({"error": "limit must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = replica_rows(Product.objects.filter(id__gt=after_id).order_by('id')[:limit])
+        return Response({
+            'products': rows,
+            'next_after_id': rows[-1]['id'] if len(rows) == limit else None,
+        })
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        return Response(product_cache.stats.as_dict())
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        # ?file_format=csv|jsonl (DRF dành tham số "format" cho renderer)
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in bulk.FORMATS:
+            return Response({"error": "file_format must be csv or jsonl"}, status=status.HTTP_400_BAD_REQUEST)
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(bulk.export_products(file_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+        return response
+
+
+class StockReservationViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    # POST /reservations/ giữ hàng, sau đó /commit/ khi đặt hàng thành công hoặc /release/ khi hủy;
+    # reservation không được commit sẽ hết hạn (manage.py expire_reservations)
+    queryset = StockReservation.objects.prefetch_related('items')
+    serializer_class = StockReservationSerializer
+    lookup_field = 'reservation_id'
+
+    def create(self, request):
+        serializer = ReserveStockSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ttl = serializer.validated_data.get('ttl_seconds', settings.RESERVATION_DEFAULT_TTL)
+        try:
+            reservation = reservations.reserve(serializer.validated_data['items'], ttl)
+        except reservations.InsufficientStock as e:
+            return Response(
+                {"error": str(e), "product_id": e.product_id, "requested": e.requested},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(self.get_serializer(reservation).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def commit(self, request, reservation_id=None):
+        return self.finish(reservations.commit, self.get_object())
+
+    @action(detail=True, methods=['post'])
+    def release(self, request, reservation_id=None):
+        return self.finish(reservations.release, self.get_object())
+
+    def finish(self, operation, reservation):
+        try:
+            reservation = operation(reservation.reservation_id)
+        except reservations.ReservationNotPending as e:
+            return Response({"error": str(e), "status": e.reservation.status}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(reservation).data)
+
+
+class ProductImportJobViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    # Upload file CSV/JSONL (field "file"); worker `manage.py run_import_jobs` chạy import,
+    # theo dõi tiến độ qua GET /product-imports/{job_id}/
+    queryset = ProductImportJob.objects.order_by('-created_at')
+    serializer_class = ProductImportJobSerializer
+    permission_classes = [IsAdminUser]
+    lookup_field = 'job_id'
+
+    def create(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            file_format = request.data.get('file_format') or bulk.detect_format(upload.name)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if file_format not in bulk.FORMATS:
+            return Response({"error": "file_format must be csv or jsonl"}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = ProductImportJob.objects.create(file=upload, file_format=file_format)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
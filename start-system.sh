@@ -18,6 +18,8 @@ docker compose exec product-service python manage.py makemigrations products
 docker compose exec product-service python manage.py migrate
 
 docker compose exec cart-service python manage.py makemigrations cart
+# Gộp các dòng trùng (cart, product_id) trước khi migrate thêm unique_together
+docker compose exec cart-service python manage.py merge_duplicate_cart_items
 docker compose exec cart-service python manage.py migrate
 
 docker compose exec order-service python manage.py makemigrations orders
@@ -26,6 +28,15 @@ docker compose exec order-service python manage.py migrate
 docker compose exec payment-service python manage.py makemigrations payments
 docker compose exec payment-service python manage.py migrate
 
+echo "Backfilling derived data for existing rows..."
+docker compose exec product-service python manage.py refresh_facets
+# search_vector còn NULL với sản phẩm có từ trước khi thêm cột
+docker compose exec product-service python manage.py rebuild_search_index
+# File import cũ từng nằm trong MEDIA_ROOT (nginx phục vụ công khai)
+docker compose exec product-service rm -rf /app/media/imports
+# Cart.item_count/total mặc định 0 cho các giỏ có từ trước khi thêm cột
+docker compose exec cart-service python manage.py reconcile_cart_totals
+
 echo "Creating sample data..."
 docker compose exec product-service python manage.py create_sample_data
 
@@ -94,6 +94,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.GatewayUserAuthentication',
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
@@ -105,6 +106,11 @@ REST_FRAMEWORK = {
 # Custom user model
 AUTH_USER_MODEL = 'users.CustomUser'
 
+# Shared with the API gateway: requests carrying it may assert the user in X-User-Id
+GATEWAY_SHARED_SECRET = os.getenv('GATEWAY_SHARED_SECRET', '')
+# Only the gateway's own token introspection call carries it; introspection is refused when empty
+GATEWAY_INTROSPECTION_SECRET = os.getenv('GATEWAY_INTROSPECTION_SECRET', '')
+
 # Cấu hình CORS
 CORS_ALLOW_ALL_ORIGINS = True  # Cho phép tất cả các nguồn gốc (chỉ sử dụng trong môi trường phát triển)
 
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.crypto import constant_time_compare
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+
+User = get_user_model()
+
+
+def is_gateway_request(request):
+    secret = settings.GATEWAY_SHARED_SECRET
+    return bool(secret) and constant_time_compare(request.META.get('HTTP_X_GATEWAY_SECRET', ''), secret)
+
+
+def is_introspection_request(request):
+    secret = settings.GATEWAY_INTROSPECTION_SECRET
+    return bool(secret) and constant_time_compare(request.META.get('HTTP_X_INTROSPECTION_SECRET', ''), secret)
+
+
+class GatewayUserAuthentication(BaseAuthentication):
+    """Trust the user the API gateway already resolved from the token.
+
+    Only active when GATEWAY_SHARED_SECRET is set and the request carries it,
+    otherwise the next authentication class (TokenAuthentication) is used.
+    """
+
+    def authenticate(self, request):
+        user_id = request.META.get('HTTP_X_USER_ID')
+        if not user_id or not is_gateway_request(request):
+            return None
+        try:
+            user = User.objects.get(pk=user_id, is_active=True)
+        except (User.DoesNotExist, ValueError):
+            raise exceptions.AuthenticationFailed('Unknown user forwarded by gateway.')
+        return (user, None)
+
+    def authenticate_header(self, request):
+        # Keep answering 401 + WWW-Authenticate for clients, as TokenAuthentication did
+        return 'Token'
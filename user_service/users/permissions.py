@@ -0,0 +1,9 @@
+from rest_framework.permissions import BasePermission
+
+from .authentication import is_introspection_request
+
+
+class IsGateway(BasePermission):
+    # Only the gateway's introspection call; denied to everyone when no secret is configured
+    def has_permission(self, request, view):
+        return is_introspection_request(request)
@@ -1,3 +1,70 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(GATEWAY_SHARED_SECRET='s3cret', GATEWAY_INTROSPECTION_SECRET='i-s3cret')
+class TokenIntrospectionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_X_INTROSPECTION_SECRET='i-s3cret')
+        self.alice = User.objects.create_user(username='alice', password='pw-alice-123')
+        self.bob = User.objects.create_user(username='bob', password='pw-bob-123', is_active=False)
+        self.alice_token = Token.objects.create(user=self.alice)
+        self.bob_token = Token.objects.create(user=self.bob)
+
+    def test_resolves_valid_tokens_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/users/introspect/', {
+                'tokens': [self.alice_token.key, self.bob_token.key, 'unknown'],
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['users'], {
+            self.alice_token.key: {'id': self.alice.id, 'username': 'alice', 'is_staff': False},
+        })
+
+    def test_rejects_non_list_payload(self):
+        response = self.client.post('/api/users/introspect/', {'tokens': 'abc'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_introspection_secret(self):
+        payload = {'tokens': [self.alice_token.key]}
+        self.client.credentials()
+        response = self.client.post('/api/users/introspect/', payload, format='json')
+        self.assertEqual(response.status_code, 403)
+
+        # Proxied client requests carry the identity secret: it must not open introspection
+        response = self.client.post('/api/users/introspect/', payload, format='json',
+                                    HTTP_X_GATEWAY_SECRET='s3cret', HTTP_X_USER_ID=str(self.alice.id))
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.post('/api/users/introspect/', payload, format='json',
+                                    HTTP_X_INTROSPECTION_SECRET='i-s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.alice_token.key, response.data['users'])
+
+    @override_settings(GATEWAY_INTROSPECTION_SECRET='')
+    def test_denied_when_no_secret_is_configured(self):
+        response = self.client.post('/api/users/introspect/', {'tokens': [self.alice_token.key]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(GATEWAY_SHARED_SECRET='s3cret')
+class GatewayUserAuthenticationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.alice = User.objects.create_user(username='alice', password='pw-alice-123')
+
+    def test_trusts_forwarded_user_with_secret(self):
+        response = self.client.get('/api/users/me/', HTTP_X_USER_ID=str(self.alice.id),
+                                   HTTP_X_GATEWAY_SECRET='s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'alice')
+
+    def test_ignores_forwarded_user_without_secret(self):
+        response = self.client.get('/api/users/me/', HTTP_X_USER_ID=str(self.alice.id))
+        self.assertEqual(response.status_code, 401)
@@ -4,11 +4,14 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
+from .permissions import IsGateway
 from .serializers import UserSerializer, UserRegistrationSerializer
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+MAX_INTROSPECT_TOKENS = 1000
+
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -17,6 +20,8 @@ class UserViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action == 'create':
             return [AllowAny()]
+        if self.action == 'introspect':
+            return [IsGateway()]
         return [IsAuthenticated()]
 
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
@@ -48,4 +53,26 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def me(self, request):
         serializer = UserSerializer(request.user)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsGateway], authentication_classes=[])
+    def introspect(self, request):
+        # Batched token lookup for the API gateway: one query for many tokens
+        keys = request.data.get('tokens')
+        if not isinstance(keys, list) or len(keys) > MAX_INTROSPECT_TOKENS:
+            return Response(
+                {'error': f'tokens must be a list of at most {MAX_INTROSPECT_TOKENS} keys'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        tokens = Token.objects.filter(key__in=keys, user__is_active=True).select_related('user')
+        return Response({
+            'users': {
+                token.key: {
+                    'id': token.user.id,
+                    'username': token.user.username,
+                    'is_staff': token.user.is_staff,
+                }
+                for token in tokens
+            }
+        })